@@ -0,0 +1,357 @@
+"""Query backends for bq.py: BigQuery, or a local DuckDB database over Parquet files.
+
+The local backend runs the same SQL as BigQuery on a laptop-sized sample with no network round trips. Tables are
+Parquet files under a root directory, one directory per dataset (``<root>/gcp_cset_lexisnexis/raw_news.parquet``,
+``<root>/rhetorical_frames/frame_membership.parquet``, ...), and writing a table writes its file. BigQuery SQL is
+translated to DuckDB's dialect first; :func:`translate` covers the constructs the queries in `./data` and `main.py`
+use:
+
+- raw (``r'...'``) and double-quoted strings, and backslash escapes in strings
+- backquoted, project-qualified table names
+- ``REGEXP_CONTAINS``, which is ``regexp_matches`` (both RE2)
+- ``CROSS JOIN UNNEST(array) AS x`` and ``FROM t, UNNEST(array) AS x``, where ``x`` is the element
+- ``INT64`` and ``FLOAT64`` types
+- ``HLL_COUNT`` sketch functions, where a local sketch is the exact list of distinct values
+- ``CREATE OR REPLACE TABLE ... AS SELECT``
+
+``COUNT(DISTINCT ...)``, ``SUM(...) OVER ()``, ``EXTRACT(year FROM ...)`` and nested field access work unchanged.
+Use :func:`bq.set_backend` to switch backends, and :func:`compare` to check a query gives the same result on both.
+"""
+import argparse
+import os
+import re
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple, Union
+
+import pyarrow as pa
+
+from query_metrics import MetricsLog
+from settings import DATASET_ID, LOCAL_DATA_DIR, METRICS_LOG, PROJECT_ID
+
+# Strings, comments and backquoted names, which translate() handles as units
+_TOKEN_RE = re.compile(r"""
+    (?P<comment>--[^\n]*|/\*.*?\*/)
+  | (?P<raw>\b[rR])(?P<raw_quote>['"])(?P<raw_body>(?:(?!(?P=raw_quote)).)*)(?P=raw_quote)
+  | (?P<quote>['"])(?P<body>(?:\\.|(?!(?P=quote)).)*)(?P=quote)
+  | `(?P<name>[^`]*)`
+""", re.VERBOSE | re.DOTALL)
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "\\": "\\", "'": "'", '"': '"', "`": "`"}
+_ESCAPE_RE = re.compile(r"\\(.)", re.DOTALL)
+_PLACEHOLDER_RE = re.compile("\x00(\\d+)\x00")
+_UNNEST_RE = re.compile(r"\bUNNEST\s*\(", re.IGNORECASE)
+_ARRAY_CONCAT_RE = re.compile(r"\bARRAY_CONCAT\s*\(", re.IGNORECASE)
+_ALIAS_RE = re.compile(r"\s+(?:AS\s+)?(?!(?:ON|WHERE|CROSS|INNER|LEFT|JOIN|GROUP|ORDER|WITH)\b)(\w+)", re.IGNORECASE)
+_FUNCTIONS = [
+    (re.compile(r"\bREGEXP_CONTAINS\s*\(", re.IGNORECASE), "regexp_matches("),
+    (re.compile(r"\bINT64\b", re.IGNORECASE), "BIGINT"),
+    (re.compile(r"\bFLOAT64\b", re.IGNORECASE), "DOUBLE"),
+    (re.compile(r"\bHLL_COUNT\s*\.\s*(INIT|MERGE_PARTIAL|MERGE|EXTRACT)\s*\(", re.IGNORECASE),
+     lambda m: f"hll_count_{m.group(1).lower()}("),
+]
+# Stand-ins for BigQuery's HyperLogLog++ functions. Local tables are small, so a sketch is just the distinct values
+# and counts from it are exact.
+_SKETCH_MACROS = [
+    # Overloads, since DuckDB 1.2 can't pass a parameter with a default positionally
+    "CREATE MACRO hll_count_init(x) AS list(DISTINCT x) FILTER (WHERE x IS NOT NULL), "
+    "(x, p) AS list(DISTINCT x) FILTER (WHERE x IS NOT NULL)",
+    "CREATE MACRO hll_count_merge_partial(sketch) AS list_distinct(flatten(list(sketch)))",
+    "CREATE MACRO hll_count_merge(sketch) AS len(list_distinct(flatten(list(sketch))))",
+    "CREATE MACRO hll_count_extract(sketch) AS len(sketch)",
+]
+_CREATE_TABLE_RE = re.compile(r"^\s*create\s+or\s+replace\s+table\s+(\S+)\s+as\s+(.*)$", re.IGNORECASE | re.DOTALL)
+
+
+class Backend:
+    """Runs queries for bq.py."""
+    # Whether tables can be written a year-partition at a time, for bq.make_table_incremental
+    supports_partitions = False
+
+    def read_query(self, sql: str, use_cache: Optional[bool] = None, step: Optional[str] = None,
+                   **config_kw) -> pa.Table:
+        raise NotImplementedError
+
+    def read_batches(self, sql: str, batch_rows: int, use_cache: Optional[bool] = None, step: Optional[str] = None,
+                     **config_kw) -> Iterator[pa.RecordBatch]:
+        """
+        Run a query and yield its result a batch of at most ``batch_rows`` rows at a time. An empty result is one empty
+        batch, so the result's columns are known either way.
+        """
+        raise NotImplementedError
+
+    def write_query(self, sql: str, table: str, dataset=DATASET_ID, clobber=False, use_cache: Optional[bool] = None,
+                    **config_kw):
+        raise NotImplementedError
+
+    def table_modified(self, table_id: str) -> Optional[str]:
+        """Last-modified time of a table as an ISO string, or ``None`` if unknown."""
+        raise NotImplementedError
+
+
+class BigQueryBackend(Backend):
+    """The BigQuery implementation in bq.py."""
+    supports_partitions = True
+
+    def read_query(self, sql: str, use_cache: Optional[bool] = None, step: Optional[str] = None,
+                   **config_kw) -> pa.Table:
+        from bq import _read_bigquery
+        return _read_bigquery(sql, use_cache, step, **config_kw)
+
+    def read_batches(self, sql: str, batch_rows: int, use_cache: Optional[bool] = None, step: Optional[str] = None,
+                     **config_kw) -> Iterator[pa.RecordBatch]:
+        from bq import _read_bigquery_batches
+        return _read_bigquery_batches(sql, batch_rows, use_cache, step, **config_kw)
+
+    def write_query(self, sql: str, table: str, dataset=DATASET_ID, clobber=False, use_cache: Optional[bool] = None,
+                    **config_kw):
+        from bq import _write_bigquery
+        return _write_bigquery(sql, table, dataset, clobber, use_cache, **config_kw)
+
+    def table_modified(self, table_id: str) -> Optional[str]:
+        from bq import create_client
+        modified = create_client().get_table(table_id).modified
+        return modified.isoformat() if modified is not None else None
+
+
+class LocalBackend(Backend):
+    """An in-process DuckDB database whose tables are Parquet files."""
+
+    def __init__(self, root: Union[str, Path] = LOCAL_DATA_DIR, metrics_log: Optional[Union[str, Path]] = METRICS_LOG):
+        """
+        :param root: Directory with a subdirectory of ``<table>.parquet`` files per dataset.
+        :param metrics_log: Where to record query times. If ``None``, don't record them.
+        """
+        import duckdb
+        self.root = Path(root)
+        self.connection = duckdb.connect()
+        # EXTRACT(year FROM publishedDate) is in UTC in BigQuery
+        self.connection.execute("SET TimeZone = 'UTC'")
+        for macro in _SKETCH_MACROS:
+            self.connection.execute(macro)
+        self.metrics = MetricsLog(metrics_log)
+        for path in sorted(self.root.glob("*/*.parquet")):
+            self._register(path.parent.name, path.stem)
+
+    def read_query(self, sql: str, use_cache: Optional[bool] = None, step: Optional[str] = None,
+                   **config_kw) -> pa.Table:
+        start = time.perf_counter()
+        sql = translate(sql)
+        ddl = _CREATE_TABLE_RE.match(_strip_leading_comments(sql))
+        if ddl:
+            dataset, table = _split_table_name(ddl.group(1))
+            self._write(ddl.group(2), table, dataset)
+            result = pa.table({})
+        else:
+            # A cursor per call, so queries can run from several threads
+            result = self.connection.cursor().execute(sql).fetch_arrow_table()
+        self.metrics.record(step or "query", "read", time.perf_counter() - start, backend="local")
+        return result
+
+    def read_batches(self, sql: str, batch_rows: int, use_cache: Optional[bool] = None, step: Optional[str] = None,
+                     **config_kw) -> Iterator[pa.RecordBatch]:
+        start = time.perf_counter()
+        # DuckDB streams the result, producing each batch as it's read
+        reader = self.connection.cursor().execute(translate(sql)).fetch_record_batch(batch_rows)
+        self.metrics.record(step or "query", "read", time.perf_counter() - start, backend="local", streamed=True)
+        empty = True
+        for batch in reader:
+            empty = False
+            yield batch
+        if empty:
+            yield empty_batch(reader.schema)
+
+    def write_query(self, sql: str, table: str, dataset=DATASET_ID, clobber=False, use_cache: Optional[bool] = None,
+                    **config_kw):
+        start = time.perf_counter()
+        if self._path(table, dataset).exists() and not clobber:
+            raise FileExistsError(f"{dataset}.{table} already exists")
+        print(f'Writing {dataset}.{table}')
+        sql = translate(sql)
+        clustering = config_kw.get("clustering_fields")
+        if clustering:
+            # Sorted Parquet row groups each cover a narrow range of the clustering columns, so DuckDB can skip them
+            sql = f"SELECT * FROM ({sql}) ORDER BY {', '.join(clustering)}"
+        self._write(sql, table, dataset)
+        self.metrics.record(f"{dataset}.{table}", "write", time.perf_counter() - start, backend="local")
+
+    def table_modified(self, table_id: str) -> Optional[str]:
+        dataset, table = _split_table_name(table_id)
+        try:
+            mtime = self._path(table, dataset).stat().st_mtime
+        except FileNotFoundError:
+            return None
+        return datetime.fromtimestamp(mtime, timezone.utc).isoformat()
+
+    def _write(self, sql: str, table: str, dataset: str):
+        path = self._path(table, dataset)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write next to the table and swap it in, since the query may read the table it replaces
+        with tempfile.NamedTemporaryFile(dir=path.parent, suffix=".tmp", delete=False) as f:
+            temp_path = f.name
+        try:
+            self.connection.cursor().execute(f"COPY ({sql}) TO '{temp_path}' (FORMAT PARQUET)")
+            os.replace(temp_path, path)
+        finally:
+            Path(temp_path).unlink(missing_ok=True)
+        self._register(dataset, table)
+
+    def _register(self, dataset: str, table: str):
+        path = str(self._path(table, dataset)).replace("'", "''")
+        # Tables can be written from several threads, each with its own cursor
+        cursor = self.connection.cursor()
+        cursor.execute(f'CREATE SCHEMA IF NOT EXISTS "{dataset}"')
+        cursor.execute(f'CREATE OR REPLACE VIEW "{dataset}"."{table}" AS SELECT * FROM read_parquet(\'{path}\')')
+
+    def _path(self, table: str, dataset: str) -> Path:
+        return self.root / dataset / f"{table}.parquet"
+
+
+def empty_batch(schema: pa.Schema) -> pa.RecordBatch:
+    """A record batch with no rows, for an empty result."""
+    return pa.RecordBatch.from_arrays([pa.array([], type=field.type) for field in schema], schema=schema)
+
+
+def translate(sql: str) -> str:
+    """
+    Translate BigQuery standard SQL to DuckDB's dialect.
+    :param sql: BigQuery SQL.
+    :return: DuckDB SQL.
+    """
+    literals = []
+
+    def hold(match: re.Match) -> str:
+        if match.group("comment"):
+            literals.append(match.group("comment"))
+        elif match.group("raw"):
+            literals.append(_quote(match.group("raw_body")))
+        elif match.group("quote"):
+            literals.append(_quote(_ESCAPE_RE.sub(lambda m: _ESCAPES.get(m.group(1), m.group(1)),
+                                                  match.group("body"))))
+        else:
+            literals.append(_quote_name(match.group("name")))
+        return f"\x00{len(literals) - 1}\x00"
+
+    code = _TOKEN_RE.sub(hold, sql)
+    code = _alias_unnest_columns(code)
+    code = _flatten_array_concat(code)
+    for pattern, replacement in _FUNCTIONS:
+        code = pattern.sub(replacement, code)
+    return _PLACEHOLDER_RE.sub(lambda m: literals[int(m.group(1))], code)
+
+
+def _alias_unnest_columns(code: str) -> str:
+    # The alias of an UNNEST names its elements in BigQuery, but the table in DuckDB, so give the column the same name
+    pieces = []
+    position = 0
+    for match in _UNNEST_RE.finditer(code):
+        if match.start() < position:
+            continue
+        end = _closing_paren(code, match.end() - 1)
+        alias = _ALIAS_RE.match(code, end + 1)
+        if alias is None:
+            continue
+        pieces.append(code[position:end + 1] + f" AS {alias.group(1)}({alias.group(1)})")
+        position = alias.end()
+    return "".join(pieces) + code[position:]
+
+
+def _flatten_array_concat(code: str) -> str:
+    # ARRAY_CONCAT takes any number of arrays, but DuckDB's array_concat (before 1.3) only two
+    match = _ARRAY_CONCAT_RE.search(code)
+    if match is None:
+        return code
+    end = _closing_paren(code, match.end() - 1)
+    arrays = _flatten_array_concat(code[match.end():end])
+    return code[:match.start()] + f"flatten([{arrays}])" + _flatten_array_concat(code[end + 1:])
+
+
+def _closing_paren(code: str, start: int) -> int:
+    # Position of the parenthesis closing the one at start
+    depth = 0
+    end = start
+    for end in range(start, len(code)):
+        depth += {"(": 1, ")": -1}.get(code[end], 0)
+        if depth == 0:
+            break
+    return end
+
+
+def compare(sql: str, local: LocalBackend, bigquery: Optional[Backend] = None) -> Tuple[bool, List[str]]:
+    """
+    Run a query on both backends and compare the results, ignoring row order.
+    :param sql: BigQuery SQL.
+    :param local: Local backend.
+    :param bigquery: BigQuery backend. Defaults to a new :class:`BigQueryBackend`.
+    :return: Whether the results match, and a description of each difference.
+    """
+    import pandas as pd
+    bigquery = bigquery or BigQueryBackend()
+    expected = bigquery.read_query(sql).to_pandas()
+    actual = local.read_query(sql).to_pandas()
+    if list(expected.columns) != list(actual.columns):
+        return False, [f"columns differ: {list(expected.columns)} vs {list(actual.columns)}"]
+    differences = []
+    if len(expected) != len(actual):
+        differences.append(f"{len(expected)} rows in BigQuery, {len(actual)} locally")
+    columns = list(expected.columns)
+    merged = pd.merge(_comparable(expected), _comparable(actual), on=columns, how="outer", indicator=True)
+    for side, label in (("left_only", "only in BigQuery"), ("right_only", "only local")):
+        rows = merged[merged["_merge"] == side]
+        if len(rows):
+            differences.append(f"{len(rows)} rows {label}, e.g. {rows[columns].head(3).to_dict('records')}")
+    return not differences, differences
+
+
+def _comparable(df):
+    # Floats to a fixed precision and everything else as text, so types that differ between engines still match
+    return df.apply(lambda column: column.round(9) if column.dtype.kind == "f" else column).astype(str)
+
+
+def _quote(text: str) -> str:
+    return "'" + text.replace("'", "''") + "'"
+
+
+def _quote_name(name: str) -> str:
+    parts = name.split(".")
+    # DuckDB has no projects: `project.dataset.table` is dataset.table
+    if len(parts) == 3 and parts[0] == PROJECT_ID:
+        parts = parts[1:]
+    return ".".join(f'"{part}"' for part in parts)
+
+
+def _split_table_name(name: str) -> Tuple[str, str]:
+    parts = [part.strip('"`') for part in name.split(".")]
+    if len(parts) == 3:
+        parts = parts[1:]
+    if len(parts) == 1:
+        parts = [DATASET_ID, parts[0]]
+    return parts[0], parts[1]
+
+
+def _strip_leading_comments(sql: str) -> str:
+    return re.sub(r"^(\s*--[^\n]*\n)*", "", sql)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sql", type=str, help="A SQL file to run.")
+    parser.add_argument("--local-dir", type=str, default=str(LOCAL_DATA_DIR), help="Root of the local Parquet tables.")
+    parser.add_argument("--compare", action="store_true", help="Also run it in BigQuery and compare the results.")
+    parser.add_argument("--translate", action="store_true", help="Just print the DuckDB translation.")
+    args = parser.parse_args()
+    sql = Path(args.sql).read_text()
+    if args.translate:
+        print(translate(sql))
+        return
+    local = LocalBackend(args.local_dir, metrics_log=None)
+    if args.compare:
+        same, differences = compare(sql, local)
+        print("Results match" if same else "\n".join(differences))
+    else:
+        print(local.read_query(sql).to_pandas())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""End-to-end benchmarks on synthetic data, without BigQuery.
+
+Each stage runs on a synthetic raw_news extract (see synthetic.py) of each requested size:
+
+- ``generate``: write the extract as Parquet
+- ``matcher``: match every frame against it with frame_matcher.py
+- ``summaries``: compute every summary of every frame in memory with summary_engine.py
+- ``authors``: clean and count the author field with authors.py
+- ``charts``: render the by-year and frame count charts
+
+Every stage runs in a fresh process, so its peak memory (including any worker processes) is its own. Results are
+written as JSON, and ``--compare`` checks a run against an earlier one:
+
+    python3 benchmark.py --sizes 10k 1m --compare benchmarks/<earlier run>.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from settings import BENCHMARK_DIR, PROJECT_DIR
+
+STAGES = ["generate", "matcher", "summaries", "authors", "charts"]
+SIZE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+# A stage is a regression if it got this much slower
+DEFAULT_TOLERANCE = 0.2
+
+
+def parse_size(size: str) -> int:
+    """Parse a size like ``10k`` or ``1m``."""
+    size = size.lower()
+    if size[-1] in SIZE_SUFFIXES:
+        return int(float(size[:-1]) * SIZE_SUFFIXES[size[-1]])
+    return int(size)
+
+
+def run(sizes: List[int], stages: Optional[List[str]] = None, seed=0, workers: Optional[int] = None,
+        work_dir: Optional[Path] = None) -> dict:
+    """
+    Run the benchmarks.
+    :param sizes: Numbers of synthetic articles.
+    :param stages: Stages to run, from :data:`STAGES`. Stages need the output of the ones before them, so running a
+        later stage alone needs a ``work_dir`` where the earlier ones already ran.
+    :param seed: Random seed for the synthetic data.
+    :param workers: Worker processes for generating and matching. Defaults to the number of CPUs.
+    :param work_dir: Where to keep synthetic data and stage outputs. Defaults to a temporary directory.
+    :return: Run metadata and a result per stage and size.
+    """
+    stages = stages or STAGES
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(work_dir or tmp)
+        for size in sizes:
+            directory = work_dir / str(size)
+            directory.mkdir(parents=True, exist_ok=True)
+            for stage in stages:
+                # A fresh process per stage, so ru_maxrss is this stage's peak
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                    result = executor.submit(_run_stage, stage, size, str(directory), seed, workers).result()
+                print(f"{stage:>10} {size:>10} articles: {result['seconds']:8.2f}s, "
+                      f"{result['articles_per_second']:>12,.0f} articles/s, {result['peak_memory_mb']:8.1f} MB")
+                results.append(result)
+    return {"run": _environment(seed, workers), "results": results}
+
+
+def compare(current: dict, baseline: dict, tolerance=DEFAULT_TOLERANCE) -> pd.DataFrame:
+    """
+    Compare two runs stage by stage.
+    :param current: Results from :func:`run`.
+    :param baseline: Earlier results.
+    :param tolerance: Slowdown, as a fraction, above which a stage counts as a regression.
+    :return: ``stage``, ``articles``, seconds and peak memory of both runs, their ratio, and ``regression``.
+    """
+    key = ["stage", "articles"]
+    columns = key + ["seconds", "peak_memory_mb"]
+    df = pd.DataFrame(current["results"])[columns].merge(pd.DataFrame(baseline["results"])[columns],
+                                                           on=key, suffixes=("", "_baseline"))
+    df["time_ratio"] = df["seconds"] / df["seconds_baseline"]
+    df["memory_ratio"] = df["peak_memory_mb"] / df["peak_memory_mb_baseline"]
+    df["regression"] = df["time_ratio"] > 1 + tolerance
+    return df
+
+
+def _run_stage(stage: str, size: int, directory: str, seed: int, workers: Optional[int]) -> dict:
+    directory = Path(directory)
+    start = time.perf_counter()
+    items = STAGE_FUNCTIONS[stage](size, directory, seed, workers)
+    seconds = time.perf_counter() - start
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in kB on Linux and bytes on macOS
+    peak_bytes = peak if sys.platform == "darwin" else peak * 1024
+    return {
+        "stage": stage,
+        "articles": size,
+        "items": items,
+        "seconds": round(seconds, 4),
+        "articles_per_second": size / seconds if seconds else None,
+        "peak_memory_mb": round(peak_bytes / 1024 ** 2, 1),
+    }
+
+
+def _generate(size: int, directory: Path, seed: int, workers: Optional[int]) -> int:
+    from synthetic import write_articles
+    write_articles(directory / "raw_news.parquet", size, seed, workers=workers or 1)
+    return size
+
+
+def _match(size: int, directory: Path, seed: int, workers: Optional[int]) -> int:
+    from frame_matcher import match_file
+    counts = match_file(directory / "raw_news.parquet", directory / "matched", workers=workers,
+                        output_format="parquet")
+    return sum(counts.values())
+
+
+def _summarize(size: int, directory: Path, seed: int, workers: Optional[int]) -> int:
+    from frame_matcher import ENTITY_TABLE
+    from frames import FIRST_YEAR, LAST_YEAR, load_frames
+    from org_aliases import write_index
+    from summary_engine import FrameExtract
+    from synthetic import ORGANIZATION_ALIASES
+
+    matched = directory / "matched"
+    alias_index = write_index(pd.DataFrame(ORGANIZATION_ALIASES, columns=["alias", "name"]),
+                              directory / "alias_index", "synthetic")
+    entities = pd.read_parquet(matched / f"{ENTITY_TABLE}.parquet")
+    frames = {name: pd.read_parquet(matched / f"{name}.parquet") for name in load_frames()}
+    # Stand-in for the artificial_intelligence table: every article in any frame
+    ai_counts = (pd.concat(frames.values()).groupby("year")["duplicateGroupId"].nunique()
+                 .rename("ai_count").reset_index())
+    by_year_dir = directory / "by_year"
+    by_year_dir.mkdir(exist_ok=True)
+    items = 0
+    for name, articles in frames.items():
+        mentions = _mentions(entities[entities["id"].isin(articles["id"])])
+        extract = FrameExtract(articles[["duplicateGroupId", "year", "source_name", "author"]], mentions, ai_counts,
+                               alias_index)
+        summaries = extract.summaries()
+        items += len(articles) + len(mentions)
+        # Every year, so the charts line up
+        by_year = summaries["by_year"].set_index("year").reindex(range(FIRST_YEAR, LAST_YEAR + 1), fill_value=0)
+        by_year.reset_index().to_csv(by_year_dir / f"{name}-by_year.csv", index=False)
+    return items
+
+
+def _mentions(entities: pd.DataFrame) -> pd.DataFrame:
+    rows = []
+    for group, semantic_info in zip(entities["duplicateGroupId"], entities["semantic_info"]):
+        properties = {p["name"]: p["value"] for p in semantic_info}
+        if properties.get("type") in ("Person", "Organization", "Company"):
+            rows.append((group, properties["type"], properties.get("value")))
+    return pd.DataFrame(rows, columns=["duplicateGroupId", "entity_type", "value"]).drop_duplicates()
+
+
+def _count_authors(size: int, directory: Path, seed: int, workers: Optional[int]) -> int:
+    import pyarrow.parquet as pq
+    from authors import count_authors
+    authors = pq.read_table(directory / "raw_news.parquet", columns=["author"]).column("author").to_pandas()
+    names = pd.Series([a["name"] if a is not None else None for a in authors], dtype=object).str.lower()
+    counts = names.value_counts(dropna=False, sort=False)
+    df = count_authors(counts.index.where(counts.index.notna(), None), counts.to_numpy())
+    return len(df)
+
+
+def _render_charts(size: int, directory: Path, seed: int, workers: Optional[int]) -> int:
+    import matplotlib
+    matplotlib.use("Agg")
+    import frame_by_year
+    import frame_counts
+
+    font_path = str(Path(matplotlib.get_data_path(), "fonts", "ttf", "DejaVuSans.ttf"))
+    by_year_dir = directory / "by_year"
+    csvs = sorted(by_year_dir.glob("*-by_year.csv"), key=lambda p: frame_by_year.frames[p.name.split("-")[0]])
+    all_y, frame_data, totals = [], [], []
+    for path in csvs:
+        x, y, frame = frame_by_year.read_data(str(path), False)
+        all_y.append(y)
+        frame_data.append(frame)
+        totals.append(sum(y))
+    frame_by_year.plot_data(x, all_y, False, frame_data, font_path, str(directory / "by_year.png"), show=False)
+    frame_counts.make_chart(frame_data, totals, False, font_path, str(directory / "counts.png"), show=False)
+    return 2
+
+
+STAGE_FUNCTIONS = {
+    "generate": _generate,
+    "matcher": _match,
+    "summaries": _summarize,
+    "authors": _count_authors,
+    "charts": _render_charts,
+}
+
+
+def _environment(seed: int, workers: Optional[int]) -> Dict[str, object]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=PROJECT_DIR, capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "time": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "seed": seed,
+        "workers": workers,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", default=["10k"], help="Numbers of articles, e.g. 10k 1m 10m.")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, help="Stages to run. Defaults to all of them.")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="Random seed for the synthetic data.")
+    parser.add_argument("-w", "--workers", type=int, help="Worker processes. Defaults to the CPU count.")
+    parser.add_argument("--work-dir", type=str, help="Keep synthetic data and outputs here instead of a temp dir.")
+    parser.add_argument("-o", "--output", type=str, help="Results file. Defaults to a new file in benchmarks/.")
+    parser.add_argument("--compare", type=str, help="Earlier results file to compare against.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Slowdown, as a fraction, that counts as a regression.")
+    args = parser.parse_args()
+    results = run([parse_size(size) for size in args.sizes], args.stages, args.seed, args.workers,
+                  Path(args.work_dir) if args.work_dir else None)
+    output = Path(args.output) if args.output else BENCHMARK_DIR / f"{datetime.now():%Y-%m-%dT%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"Wrote {output}")
+    if args.compare:
+        df = compare(results, json.loads(Path(args.compare).read_text()), args.tolerance)
+        with pd.option_context("display.width", 200):
+            print(df)
+        if df["regression"].any():
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
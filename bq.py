@@ -1,19 +1,96 @@
 """Some wrappers around the BQ client for Python.
 Reference: https://googleapis.dev/python/bigquery/latest/index.html
 """
+import hashlib
+import re
+import threading
+import time
 import warnings
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Union, Optional
+from typing import Callable, Dict, Iterator, List, Tuple, Union, Optional
 
 import google.auth
-from google.cloud import bigquery
+import pyarrow as pa
+from google.api_core.exceptions import NotFound
+from google.cloud import bigquery, bigquery_storage
 from google.cloud.bigquery.job import QueryJob
 from google.oauth2 import service_account
 
-from settings import PROJECT_ID, SQL_DIR, DATASET_ID
+from backends import Backend, BigQueryBackend, empty_batch
+from frames import FIRST_YEAR, LAST_YEAR
+from query_cache import QueryCache, normalize_sql
+from query_metrics import BudgetExceeded, MetricsLog
+from settings import PROJECT_ID, SQL_DIR, DATASET_ID, QUERY_BUDGET_BYTES
 
 _client = None
+_bqstorage_client = None
 _credentials = None
+# Whether set_client() supplied the clients, in which case none are created
+_clients_set = False
+_cache = QueryCache()
+_cache_enabled = True
+_metrics = MetricsLog()
+_budget_bytes = QUERY_BUDGET_BYTES
+_backend: Backend = BigQueryBackend()
+_watermark_lock = threading.Lock()
+
+# Tables built by make_table_incremental() get one partition per year
+YEAR_PARTITIONING = bigquery.RangePartitioning(field="year",
+                                               range_=bigquery.PartitionRange(start=2000, end=2100, interval=1))
+# Per table and year, the signature of the inputs each partition was built from
+WATERMARK_TABLE = "build_watermarks"
+# Marks a predicate where a table's query reads its inputs, which make_table_incremental() narrows to the year it's
+# rebuilding, so the other years' inputs aren't read or matched. As written it's TRUE and the query runs as is:
+# "/* year: extract(year from publishedDate) */ TRUE" becomes "(extract(year from publishedDate)) = 2019".
+YEAR_FILTER_RE = re.compile(r"/\*\s*year:\s*(.+?)\s*\*/\s*TRUE\b", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class TableLayout:
+    """How a table's storage is laid out, so queries filtering or grouping on some columns read less of it."""
+    # Whether the table has one partition per year (YEAR_PARTITIONING)
+    partition_by_year: bool = True
+    # Columns to cluster on, coarsest first; BigQuery allows up to four
+    clustering: Tuple[str, ...] = ()
+
+
+# The summaries group frame tables by year and source and count distinct duplicateGroupIds. Named entities, the
+# heaviest column, are already kept out of frame tables, in article_entities.
+FRAME_TABLE_LAYOUT = TableLayout(clustering=("source_name", "duplicateGroupId"))
+# Layouts of the tables the pipeline builds, applied whenever one is written. See register_layout().
+TABLE_LAYOUTS: Dict[str, TableLayout] = {
+    "frame_membership": FRAME_TABLE_LAYOUT,
+    "artificial_intelligence": FRAME_TABLE_LAYOUT,
+    # Joined to frame tables on id
+    "article_entities": TableLayout(clustering=("id",)),
+    # Each mention summary reads one or two entity types, joined to a frame table on id
+    "entity_mentions": TableLayout(clustering=("entity_type", "id")),
+    "ai_denominators": TableLayout(clustering=("breakdown", "source_category", "source_name")),
+    "frame_sketches": TableLayout(clustering=("frame", "source_name")),
+}
+# Rows per batch for read_query_batches()
+STREAM_BATCH_ROWS = 100_000
+
+# Signature of each year of raw_news in the analytic corpus: its article count and a hash of every column the tables
+# built from it read, so an article edited in place (its text, entities, source or duplicate group) marks its year
+# stale, not just an article added or removed. This reads as many bytes as a frame_membership build, but runs no
+# regexes. Years outside the corpus have no rows in the frame tables, so they're left out rather than rebuilt (as
+# empty) whenever their articles change.
+RAW_NEWS_SIGNATURE_SQL = f"""\
+SELECT
+  EXTRACT(year FROM publishedDate) AS year,
+  FORMAT("%d:%d", COUNT(*), BIT_XOR(FARM_FINGERPRINT(TO_JSON_STRING(STRUCT(
+    id, duplicateGroupId, publishedDate, title, subTitle, content, url, language, author.name AS author,
+    source.name AS source_name, source.category AS source_category, source.editorialRank AS editorial_rank,
+    source.location.country AS country, semantics.entities AS entities))))) AS signature
+FROM
+  gcp_cset_lexisnexis.raw_news
+WHERE
+  EXTRACT(year FROM publishedDate) BETWEEN {FIRST_YEAR} AND {LAST_YEAR}
+GROUP BY
+  year
+"""
 
 
 def create_client(key_path: Optional[str] = None) -> bigquery.Client:
@@ -21,6 +98,8 @@ def create_client(key_path: Optional[str] = None) -> bigquery.Client:
     :return: BQ API Client.
     """
     global _client, _credentials
+    if _client is not None and key_path is None:
+        return _client
     with warnings.catch_warnings():
         warnings.filterwarnings('ignore', message='Your application has authenticated using end user credentials')
         if key_path is not None:
@@ -34,32 +113,249 @@ def create_client(key_path: Optional[str] = None) -> bigquery.Client:
     return _client
 
 
+def create_bqstorage_client() -> bigquery_storage.BigQueryReadClient:
+    """Create BQ Storage read API client, for downloading query results in Arrow format.
+    :return: BQ Storage read API client, sharing credentials with :func:`create_client`.
+    """
+    global _bqstorage_client
+    if _bqstorage_client is None and not _clients_set:
+        create_client()
+        _bqstorage_client = bigquery_storage.BigQueryReadClient(credentials=_credentials)
+    return _bqstorage_client
+
+
+def set_client(client, bqstorage_client=None):
+    """Use the given clients for every query, e.g. fakes in tests.
+    :param client: BQ API Client, or an object with the same ``query()`` and ``get_table()`` methods.
+    :param bqstorage_client: BQ Storage read API client. If ``None``, results are downloaded with ``client``.
+    """
+    global _client, _bqstorage_client, _clients_set
+    _client = client
+    _bqstorage_client = bqstorage_client
+    _clients_set = True
+
+
+def register_layout(table: str, layout: TableLayout):
+    """Lay out a table this way whenever it's built, e.g. a new frame table.
+    :param table: Table name.
+    :param layout: Partitioning and clustering.
+    """
+    TABLE_LAYOUTS[table] = layout
+
+
+def table_layout(table: str) -> Optional[TableLayout]:
+    """The registered layout of a table, or of the table a partition (``table$year``) belongs to."""
+    return TABLE_LAYOUTS.get(table.split("$")[0])
+
+
+def set_backend(backend: Backend):
+    """Run every query on the given backend, e.g. a :class:`backends.LocalBackend` over a local sample.
+    :param backend: Query backend.
+    """
+    global _backend
+    _backend = backend
+
+
+def get_backend() -> Backend:
+    """The backend queries run on."""
+    return _backend
+
+
+def using_bigquery() -> bool:
+    """Whether queries run in BigQuery, so the BQ clients are needed."""
+    return isinstance(_backend, BigQueryBackend)
+
+
+def set_budget(max_bytes: Optional[int]):
+    """Refuse to run queries that would process more than ``max_bytes``, going by a dry run of each query first.
+    :param max_bytes: Bytes budget per query. If ``None``, run queries without a dry run.
+    """
+    global _budget_bytes
+    _budget_bytes = max_bytes
+
+
+def set_metrics_log(path: Optional[Union[str, Path]]):
+    """Record query metrics to a different JSONL file.
+    :param path: Metrics log. If ``None``, don't record metrics.
+    """
+    global _metrics
+    _metrics = MetricsLog(path)
+
+
+def estimate_bytes(sql: Union[str, Path], **config_kw) -> int:
+    """Estimate the bytes a query would process, with a (free) dry run.
+    :param sql: Query SQL as text or a :class:`pathlib.Path` to a SQL file.
+    :param config_kw: Passed to :class:`bigquery.QueryJobConfig`.
+    :return: Bytes processed.
+    """
+    if isinstance(sql, Path):
+        sql = sql.read_text()
+    config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False, use_legacy_sql=False, **config_kw)
+    job = create_client().query(sql, job_config=config)
+    return getattr(job, "total_bytes_processed", None) or 0
+
+
+def set_cache_enabled(enabled: bool):
+    """Turn the local query result cache on or off for every query.
+    :param enabled: If ``False``, always run queries.
+    """
+    global _cache_enabled
+    _cache_enabled = enabled
+
+
+def clear_cache(sql: Optional[Union[str, Path]] = None, **config_kw):
+    """Drop cached query results.
+    :param sql: Query whose results to drop, with the ``config_kw`` it was run with. If ``None``, drop everything.
+    """
+    if sql is None:
+        _cache.clear()
+        return
+    if isinstance(sql, Path):
+        sql = sql.read_text()
+    _cache.invalidate(_cache.key(create_client(), sql, **config_kw))
+
+
+def read_query(sql: Union[str, Path],
+               use_cache: Optional[bool] = None,
+               step: Optional[str] = None,
+               **config_kw) -> pa.Table:
+    """Run a query and download the result through the BQ Storage read API, or on the backend from
+    :func:`set_backend`.
+    The clients are shared, so this can be called from several threads to run queries concurrently.
+    :param sql: Query SQL as text or a :class:`pathlib.Path` to a SQL file.
+    :param use_cache: If ``False``, run the query even if its result is in the local cache. Defaults to the setting
+        from :func:`set_cache_enabled`.
+    :param step: Name for the query in the metrics log, e.g. the summary it computes.
+    :param config_kw: Passed to :class:`bigquery.QueryJobConfig`.
+    :return: Query result.
+    :raises: :class:`google.api_core.exceptions.GoogleAPICallError` if the request is unsuccessful .
+    :raises: :class:`query_metrics.BudgetExceeded` if the query would process more than the budget.
+    """
+    if isinstance(sql, Path):
+        sql = sql.read_text()
+    return _backend.read_query(sql, use_cache, step, **config_kw)
+
+
+def _read_bigquery(sql: str, use_cache: Optional[bool], step: Optional[str], **config_kw) -> pa.Table:
+    _client = create_client()
+    step = step or "query"
+    start = time.perf_counter()
+    key = _cache.key(_client, sql, **config_kw) if _use_cache(use_cache) else None
+    if key is not None:
+        result = _cache.get(key)
+        if result is not None:
+            _metrics.record(step, "read", time.perf_counter() - start, local_cache_hit=True)
+            return result
+    config = bigquery.QueryJobConfig(use_legacy_sql=False, **config_kw)
+    _, result = _run_query(sql, config, step, "read",
+                           fetch=lambda job: job.result().to_arrow(bqstorage_client=create_bqstorage_client()))
+    if key is not None:
+        _cache.put(key, result)
+    return result
+
+
+def read_query_batches(sql: Union[str, Path],
+                       batch_rows: int = STREAM_BATCH_ROWS,
+                       step: Optional[str] = None,
+                       use_cache: Optional[bool] = None,
+                       **config_kw) -> Iterator[pa.RecordBatch]:
+    """Run a query and download the result a batch at a time, so only one batch is held in memory.
+    The query runs when the first batch is requested. A cached result is read from the local cache, but streamed
+    results aren't added to it.
+    :param sql: Query SQL as text or a :class:`pathlib.Path` to a SQL file.
+    :param batch_rows: Maximum rows per batch.
+    :param step: Name for the query in the metrics log.
+    :param use_cache: If ``False``, run the query even if its result is in the local cache. Defaults to the setting
+        from :func:`set_cache_enabled`.
+    :param config_kw: Passed to :class:`bigquery.QueryJobConfig`.
+    :return: Record batches of the result.
+    :raises: :class:`google.api_core.exceptions.GoogleAPICallError` if the request is unsuccessful .
+    :raises: :class:`query_metrics.BudgetExceeded` if the query would process more than the budget.
+    """
+    if isinstance(sql, Path):
+        sql = sql.read_text()
+    return _backend.read_batches(sql, batch_rows, use_cache, step, **config_kw)
+
+
+def _read_bigquery_batches(sql: str, batch_rows: int, use_cache: Optional[bool], step: Optional[str],
+                           **config_kw) -> Iterator[pa.RecordBatch]:
+    _client = create_client()
+    step = step or "query"
+    start = time.perf_counter()
+    key = _cache.key(_client, sql, **config_kw) if _use_cache(use_cache) else None
+    if key is not None:
+        batches = _cache.get_batches(key, batch_rows)
+        if batches is not None:
+            _metrics.record(step, "read", time.perf_counter() - start, local_cache_hit=True, streamed=True)
+            yield from batches
+            return
+    config = bigquery.QueryJobConfig(use_legacy_sql=False, **config_kw)
+    _, rows = _run_query(sql, config, step, "read", fetch=lambda job: job.result(page_size=batch_rows),
+                         streamed=True)
+    schema = None
+    empty = True
+    # Each frame is a page or Storage API message, so this holds about one of them at a time
+    for df in rows.to_dataframe_iterable(bqstorage_client=create_bqstorage_client()):
+        table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+        schema = table.schema
+        for batch in table.to_batches(max_chunksize=batch_rows):
+            empty = False
+            yield batch
+    if empty:
+        # No rows, but the result's columns, so an export still has its header
+        if schema is None:
+            from google.cloud.bigquery._pandas_helpers import bq_to_arrow_schema
+            schema = bq_to_arrow_schema(rows.schema)
+        yield empty_batch(schema)
+
+
 def write_query(sql: Union[str, Path],
                 table: str,
                 dataset=DATASET_ID,
                 clobber=False,
+                use_cache: Optional[bool] = None,
                 **config_kw) -> QueryJob:
-    """Run a query and write the result to a BigQuery table.
+    """Run a query and write the result to a BigQuery table, or a table of the backend from :func:`set_backend`.
     :param sql: Query SQL as text or a :class:`pathlib.Path` to a SQL file.
     :param table: Destination table.
     :param dataset: Destination dataset.
     :param clobber: If ``True``, overwrite the destination table if it exists.
-    :param config_kw: Passed to :class:`bigquery.QueryJobConfig`.
-    :return: Completed QueryJob.
+    :param use_cache: If ``False``, run the query even if the destination was written by the same query from the
+        same inputs and hasn't changed since. Defaults to the setting from :func:`set_cache_enabled`.
+    :param config_kw: Passed to :class:`bigquery.QueryJobConfig`. The partitioning and clustering of the table's
+        layout in :data:`TABLE_LAYOUTS` are added unless given here.
+    :return: Completed QueryJob, or ``None`` from a local backend.
     :raises: :class:`google.api_core.exceptions.GoogleAPICallError` if the request is unsuccessful .
+    :raises: :class:`query_metrics.BudgetExceeded` if the query would process more than the budget.
     """
     if isinstance(sql, Path):
         sql = sql.read_text()
+    config_kw = {**_layout_config(table_layout(table)), **config_kw}
+    return _backend.write_query(sql, table, dataset, clobber, use_cache, **config_kw)
+
+
+def _write_bigquery(sql: str, table: str, dataset: str, clobber: bool, use_cache: Optional[bool],
+                    **config_kw) -> QueryJob:
     _client = create_client()
+    step = f'{dataset}.{table}'
+    start = time.perf_counter()
     destination_id = f'{PROJECT_ID}.{dataset}.{table}'
+    key = _cache.key(_client, sql, destination=destination_id, **config_kw) if _use_cache(use_cache) else None
+    if key is not None:
+        job = _cache.get_job(_client, key)
+        if job is not None:
+            print(f'{dataset}.{table} is up to date')
+            _metrics.record(step, "write", time.perf_counter() - start, local_cache_hit=True)
+            return job
     print(f'Writing {dataset}.{table}')
     config = bigquery.QueryJobConfig(destination=destination_id,
                                      write_disposition='WRITE_TRUNCATE' if clobber else 'WRITE_EMPTY',
                                      use_legacy_sql=False,
                                      **config_kw)
-    job = _client.query(sql, job_config=config)
     # Wait for job to finish, or raise an error if unsuccessful
-    _ = job.result()
+    job, _ = _run_query(sql, config, step, "write")
+    if key is not None:
+        _cache.put_job(_client, key, job)
     return job
 
 
@@ -83,3 +379,222 @@ def make_table(table: str, clobber=False, **kw) -> QueryJob:
     """
     job = write_query(read_sql(table), table, clobber=clobber, **kw)
     return job
+
+
+def partition_signature_sql(table: str, dataset=DATASET_ID) -> str:
+    """
+    Signature query for inputs that are themselves year-partitioned tables, e.g. built by
+    :func:`make_table_incremental`: each year's signature is the last-modified time of its partition.
+    :param table: Source table.
+    :param dataset: Source dataset.
+    :return: Query SQL returning ``year`` and ``signature`` columns.
+    """
+    return f"""\
+    SELECT
+      CAST(partition_id AS INT64) AS year,
+      CAST(last_modified_time AS STRING) AS signature
+    FROM
+      `{PROJECT_ID}.{dataset}.INFORMATION_SCHEMA.PARTITIONS`
+    WHERE
+      table_name = '{table}'
+      AND REGEXP_CONTAINS(partition_id, r"^[0-9]+$")
+    """
+
+
+def make_table_incremental(table: str,
+                           signature_sql: str,
+                           sql: Optional[str] = None,
+                           dataset=DATASET_ID,
+                           **kw) -> List[int]:
+    """
+    Build a table with a ``year`` column one year-partition at a time, rebuilding only years whose inputs changed.
+
+    ``signature_sql`` returns a signature of the inputs for each year (see :data:`RAW_NEWS_SIGNATURE_SQL` and
+    :func:`partition_signature_sql`). The signature each partition was built from is kept in the
+    :data:`WATERMARK_TABLE` table; a year is rebuilt if its signature or the table's SQL changed since, or its partition
+    is missing. Each rebuild overwrites exactly one partition, so re-running after a failure is safe, and reads only
+    that year's inputs if the query marks where it reads them (see :func:`year_sql`). When every year is stale, the
+    whole table is built in one query instead. A backend without partitions builds the whole table every
+    time.
+    :param table: Table name.
+    :param signature_sql: Query returning ``year`` and ``signature`` columns.
+    :param sql: Query SQL. Defaults to the SQL file of the same name as the table.
+    :param dataset: Destination dataset.
+    :param kw: Passed to :func:`write_query`.
+    :return: Years that were (re)built.
+    """
+    if sql is None:
+        sql = read_sql(table)
+    if not _backend.supports_partitions:
+        # No partitions or watermarks to go by, so build the whole table
+        write_query(sql, table, dataset=dataset, clobber=True, use_cache=False)
+        years = read_query(f"SELECT DISTINCT year FROM {dataset}.{table} WHERE year IS NOT NULL",
+                           step=f'{dataset}.{table} years')
+        return sorted(years.column("year").to_pylist())
+    _client = create_client()
+    # Editing the query invalidates every year
+    sql_hash = hashlib.sha256(normalize_sql(sql).encode()).hexdigest()[:16]
+    _, rows = _run_query(signature_sql, bigquery.QueryJobConfig(), f'{dataset}.{table} signature', "query")
+    signatures = {row["year"]: f'{sql_hash}:{row["signature"]}' for row in rows if row["year"] is not None}
+    table_id = f'{PROJECT_ID}.{dataset}.{table}'
+    layout = table_layout(table) or TableLayout()
+    kw = {**_layout_config(layout), "range_partitioning": YEAR_PARTITIONING, **kw}
+    try:
+        existing_table = _client.get_table(table_id)
+        laid_out = (existing_table.range_partitioning is not None
+                    and list(existing_table.clustering_fields or []) == list(layout.clustering))
+    except NotFound:
+        laid_out = None
+    if laid_out:
+        built = _read_watermarks(table, dataset)
+        _, rows = _run_query(partition_signature_sql(table, dataset), bigquery.QueryJobConfig(),
+                             f'{dataset}.{table} partitions', "query")
+        existing = {row["year"] for row in rows}
+        years = sorted(year for year, signature in signatures.items()
+                       if built.get(year) != signature or year not in existing)
+    else:
+        years = sorted(signatures)
+    if laid_out and (not years or len(years) < len(signatures)):
+        for year in years:
+            write_query(year_sql(sql, year), f"{table}${year}", dataset=dataset, clobber=True, use_cache=False, **kw)
+        # Years that no longer have any input
+        for year in sorted(existing - set(signatures)):
+            print(f'Dropping {dataset}.{table}${year}')
+            _client.delete_table(f"{table_id}${year}")
+    elif years or not laid_out:
+        # Each year's rebuild reads the whole of the query's inputs, so when every year is stale (e.g. the SQL
+        # changed) building the table in one query costs one scan instead of one per year
+        if laid_out is False:
+            # Partitioning can't be added to an existing table, and new clustering would only apply to new rows
+            print(f'Rebuilding {dataset}.{table} with its declared layout')
+            _client.delete_table(table_id)
+        write_query(sql, table, dataset=dataset, clobber=True, use_cache=False, **kw)
+    if not years:
+        print(f'{dataset}.{table} is up to date')
+    _write_watermarks(table, {year: signatures[year] for year in years}, dataset)
+    return years
+
+
+def year_sql(sql: str, year: int) -> str:
+    """
+    A table's query narrowed to one year of the table.
+    :param sql: Query with a ``year`` column.
+    :param year: Year.
+    :return: The query with its year filters (see :data:`YEAR_FILTER_RE`) set to the year, or if it has none, its
+        result filtered to the year.
+    """
+    if YEAR_FILTER_RE.search(sql):
+        return YEAR_FILTER_RE.sub(lambda match: f"({match.group(1)}) = {year}", sql)
+    return f"SELECT * FROM (\n{sql}\n) WHERE year = {year}"
+
+
+def _layout_config(layout: Optional[TableLayout]) -> dict:
+    # QueryJobConfig arguments for writing a table with this layout
+    if layout is None:
+        return {}
+    config = {"range_partitioning": YEAR_PARTITIONING} if layout.partition_by_year else {}
+    if layout.clustering:
+        config["clustering_fields"] = list(layout.clustering)
+    return config
+
+
+def _read_watermarks(table: str, dataset=DATASET_ID) -> Dict[int, str]:
+    sql = f"""\
+    SELECT
+      year,
+      signature
+    FROM
+      `{PROJECT_ID}.{dataset}.{WATERMARK_TABLE}`
+    WHERE
+      table_name = @table_name
+    """
+    config = bigquery.QueryJobConfig(query_parameters=[bigquery.ScalarQueryParameter("table_name", "STRING", table)])
+    try:
+        _, rows = _run_query(sql, config, f'{dataset}.{WATERMARK_TABLE} read', "query")
+    except NotFound:
+        return {}
+    return {row["year"]: row["signature"] for row in rows}
+
+
+def _write_watermarks(table: str, signatures: Dict[int, str], dataset=DATASET_ID):
+    if not signatures:
+        return
+    # Concurrent MERGEs into one table can fail to serialize, so tables built in parallel take turns
+    with _watermark_lock:
+        _merge_watermarks(table, signatures, dataset)
+
+
+def _merge_watermarks(table: str, signatures: Dict[int, str], dataset: str):
+    _client = create_client()
+    watermark_id = f'{PROJECT_ID}.{dataset}.{WATERMARK_TABLE}'
+    schema = [
+        bigquery.SchemaField("table_name", "STRING"),
+        bigquery.SchemaField("year", "INT64"),
+        bigquery.SchemaField("signature", "STRING"),
+        bigquery.SchemaField("built_at", "TIMESTAMP"),
+    ]
+    _client.create_table(bigquery.Table(watermark_id, schema=schema), exists_ok=True)
+    sql = f"""\
+    MERGE
+      `{watermark_id}` AS watermarks
+    USING
+      UNNEST(@builds) AS build
+    ON
+      watermarks.table_name = @table_name
+      AND watermarks.year = build.year
+    WHEN MATCHED THEN
+      UPDATE SET signature = build.signature, built_at = CURRENT_TIMESTAMP()
+    WHEN NOT MATCHED THEN
+      INSERT (table_name, year, signature, built_at) VALUES (@table_name, build.year, build.signature, CURRENT_TIMESTAMP())
+    """
+    builds = [bigquery.StructQueryParameter(None,
+                                            bigquery.ScalarQueryParameter("year", "INT64", year),
+                                            bigquery.ScalarQueryParameter("signature", "STRING", signature))
+              for year, signature in signatures.items()]
+    config = bigquery.QueryJobConfig(query_parameters=[
+        bigquery.ScalarQueryParameter("table_name", "STRING", table),
+        bigquery.ArrayQueryParameter("builds", "STRUCT", builds),
+    ])
+    _run_query(sql, config, f'{dataset}.{WATERMARK_TABLE}', "write")
+
+
+def _run_query(sql: str,
+               config: bigquery.QueryJobConfig,
+               step: str,
+               kind: str,
+               fetch: Optional[Callable] = None,
+               **fields):
+    """Check a query against the budget, run it, and record its metrics.
+    :param fetch: Gets the result from the job. Defaults to waiting for ``job.result()``.
+    :param fields: Passed to :meth:`query_metrics.MetricsLog.record`.
+    :return: The job and its result.
+    """
+    _client = create_client()
+    estimated_bytes = _check_budget(_client, sql, config, step)
+    start = time.perf_counter()
+    job = None
+    try:
+        job = _client.query(sql, job_config=config)
+        result = job.result() if fetch is None else fetch(job)
+    except Exception as e:
+        _metrics.record(step, kind, time.perf_counter() - start, job, estimated_bytes=estimated_bytes,
+                        error=type(e).__name__, **fields)
+        raise
+    _metrics.record(step, kind, time.perf_counter() - start, job, estimated_bytes=estimated_bytes, **fields)
+    return job, result
+
+
+def _check_budget(_client, sql: str, config: bigquery.QueryJobConfig, step: str) -> Optional[int]:
+    if _budget_bytes is None:
+        return None
+    dry_run_config = bigquery.QueryJobConfig(dry_run=True, use_query_cache=False, use_legacy_sql=False,
+                                             query_parameters=config.query_parameters)
+    estimated_bytes = getattr(_client.query(sql, job_config=dry_run_config), "total_bytes_processed", None) or 0
+    if estimated_bytes > _budget_bytes:
+        _metrics.record(step, "refused", 0, estimated_bytes=estimated_bytes, budget_bytes=_budget_bytes)
+        raise BudgetExceeded(step, estimated_bytes, _budget_bytes)
+    return estimated_bytes
+
+
+def _use_cache(use_cache: Optional[bool]) -> bool:
+    return _cache_enabled if use_cache is None else use_cache
@@ -1,16 +1,17 @@
 import argparse
 from collections import Counter
-from google.cloud import bigquery
 import csv
 
+from authors import count_authors
+from bq import read_query
+
 
 def clean_authors(frame):
     """
     Cleaning the authors field from Lexis Nexis for a particular set of articles selected based on its rhetorical frame.
     :param frame: the rhetorical frame
-    :return:
+    :return: Counter of articles by cleaned author name
     """
-    author_counts = Counter()
     query = f"""SELECT
                   LOWER(author) as author,
                   COUNT(DISTINCT duplicateGroupId) AS count
@@ -20,26 +21,10 @@ def clean_authors(frame):
                   author
                 ORDER BY
                   2 DESC"""
-    # Pass the project ID here in case it isn't set via environment variable
-    client = bigquery.Client(project='gcp-cset-projects')
-    query_job = client.query(query)
-    authors = query_job.result()
-    for author_pair in authors:
-        if author_pair["author"] is None:
-            author_counts.update({"No author information": author_pair["count"]})
-            # we don't want to deal with Nones in any other situations
-            continue
-        temp_author = author_pair["author"].replace(", cnn", "").replace(", inc", "").replace(" and ", "; ")
-        temp_author = temp_author.replace(", ", "; ").replace("by ", "").replace(" staff writer", "")
-        temp_author = temp_author.replace(" staff", "").replace(" correspondent", "")
-        temp_author = temp_author.replace("- with contributions ", "").replace("(", "").replace(")", "")
-        temp_author = temp_author.replace("forbes councils member", "")
-        if "; " in temp_author:
-            new_authors = temp_author.split(";")
-            author_counts.update({i.strip(): author_pair["count"] for i in new_authors})
-        else:
-            author_counts.update({temp_author.strip(): author_pair["count"]})
-    return author_counts
+    authors = read_query(query).to_pandas()
+    df = count_authors(authors["author"], authors["count"])
+    # Counter keeps the insertion order, so most_common() still breaks ties in query order
+    return Counter(dict(zip(df["author"], df["count"])))
 
 
 def main():
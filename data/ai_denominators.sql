@@ -0,0 +1,48 @@
+-- Distinct AI articles by year, by year and source category, and by year and source: the denominators of every
+-- percent-of-AI summary, so they're counted once rather than once per frame. Build rhetorical_frames.frame_membership
+-- first; every row of it is an AI article.
+-- Distinct counts don't add up across groups (an article can be published by several sources), so each breakdown has
+-- its own rows, labeled by the breakdown column. bq.make_table_incremental() narrows the year filters to the year it
+-- rebuilds.
+SELECT
+  year,
+  "year" AS breakdown,
+  CAST(NULL AS STRING) AS source_category,
+  CAST(NULL AS STRING) AS source_name,
+  -- Want to count duplicateGroupIds to distinct articles correctly
+  COUNT(DISTINCT duplicateGroupId) AS ai_count
+FROM
+  `gcp-cset-projects.rhetorical_frames.frame_membership`
+WHERE
+  /* year: year */ TRUE
+GROUP BY
+  year
+UNION ALL
+SELECT
+  year,
+  "category" AS breakdown,
+  source_category,
+  CAST(NULL AS STRING) AS source_name,
+  COUNT(DISTINCT duplicateGroupId) AS ai_count
+FROM
+  `gcp-cset-projects.rhetorical_frames.frame_membership`
+WHERE
+  /* year: year */ TRUE
+GROUP BY
+  year,
+  source_category
+UNION ALL
+SELECT
+  year,
+  "source" AS breakdown,
+  source_category,
+  source_name,
+  COUNT(DISTINCT duplicateGroupId) AS ai_count
+FROM
+  `gcp-cset-projects.rhetorical_frames.frame_membership`
+WHERE
+  /* year: year */ TRUE
+GROUP BY
+  year,
+  source_category,
+  source_name
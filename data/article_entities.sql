@@ -0,0 +1,18 @@
+-- One row per named entity in each AI article, keyed by the article's id and duplicateGroupId.
+-- The frame tables are one row per article; join them to this on id for entity mentions.
+-- Build rhetorical_frames.frame_membership from frame_membership.sql first
+select
+  frame_membership.id,
+  frame_membership.duplicateGroupId,
+  -- For building a year at a time
+  frame_membership.year,
+  -- NER info
+  entities.properties as semantic_info
+from rhetorical_frames.frame_membership
+-- Only the id and semantics columns of raw_news are read here, not the article text
+inner join gcp_cset_lexisnexis.raw_news
+  on raw_news.id = frame_membership.id
+cross join unnest(raw_news.semantics.entities) as entities
+-- bq.make_table_incremental() narrows these to the year it rebuilds
+where /* year: frame_membership.year */ TRUE
+  and /* year: extract(year from raw_news.publishedDate) */ TRUE
@@ -1,11 +1,12 @@
   -- Getting counts of articles by year for all AI articles
   -- We want the year and the count of every distinct article in that year
+  -- These are the denominators of the percent-of-AI summaries, kept in ai_denominators.sql
 SELECT
   year,
-  COUNT(DISTINCT duplicateGroupId) AS count
+  ai_count AS count
 FROM
-  `gcp-cset-projects.rhetorical_frames.artificial_intelligence`
-GROUP BY
-  year
+  `gcp-cset-projects.rhetorical_frames.ai_denominators`
+WHERE
+  breakdown = "year"
 ORDER BY
   year ASC
\ No newline at end of file
@@ -33,21 +33,21 @@ keywords as (
     matchingKeywords,
     year,
     source_name,
-    REGEXP_CONTAINS(LOWER(text), r'(14.?trillion.?boost)') AS num_trillion_boost,
-    REGEXP_CONTAINS(LOWER(text), r'(fourteen.?trillion.?boost)') AS fourteen_trillion_boost,
-    REGEXP_CONTAINS(LOWER(text), r'(transform.?economy)') AS transform_economy,
-    REGEXP_CONTAINS(LOWER(text), r'(biggest.?commercial.?opportunity)') AS biggest_commercial_opportunity,
-    REGEXP_CONTAINS(LOWER(text), r'(ai.?revolution)') AS ai_revolution,
-    REGEXP_CONTAINS(LOWER(text), r'(total.?economic.?gains?)') AS total_economic_gains,
-    REGEXP_CONTAINS(LOWER(text), r'(golden.?opportunity)') AS golden_opportunity,
-    REGEXP_CONTAINS(LOWER(text), r'(cumulative.?gdp)') AS cumulative_gdp,
-    REGEXP_CONTAINS(LOWER(text), r'(global.?economic.?activity)') AS global_economic_activity,
-    REGEXP_CONTAINS(LOWER(text), r'(higher.?productivity.?growth)') AS higher_productivity_growth,
-    REGEXP_CONTAINS(LOWER(text), r'(productivity.?dividend)') AS productivity_dividend,
-    REGEXP_CONTAINS(LOWER(text), r'(positive.?contribution)') AS positive_contribution,
-    REGEXP_CONTAINS(LOWER(text), r'(productivity.?leap)') AS productivity_leap,
-    REGEXP_CONTAINS(LOWER(text), r'(labor.?productivity.?improvement)') AS labor_prod_improvement,
-    REGEXP_CONTAINS(LOWER(text), r'(opportunity.{0,20}\bai\b)') AS opportunity_ai,
+    REGEXP_CONTAINS(text, r'(14.?trillion.?boost)') AS num_trillion_boost,
+    REGEXP_CONTAINS(text, r'(fourteen.?trillion.?boost)') AS fourteen_trillion_boost,
+    REGEXP_CONTAINS(text, r'(transform.?economy)') AS transform_economy,
+    REGEXP_CONTAINS(text, r'(biggest.?commercial.?opportunity)') AS biggest_commercial_opportunity,
+    REGEXP_CONTAINS(text, r'(ai.?revolution)') AS ai_revolution,
+    REGEXP_CONTAINS(text, r'(total.?economic.?gains?)') AS total_economic_gains,
+    REGEXP_CONTAINS(text, r'(golden.?opportunity)') AS golden_opportunity,
+    REGEXP_CONTAINS(text, r'(cumulative.?gdp)') AS cumulative_gdp,
+    REGEXP_CONTAINS(text, r'(global.?economic.?activity)') AS global_economic_activity,
+    REGEXP_CONTAINS(text, r'(higher.?productivity.?growth)') AS higher_productivity_growth,
+    REGEXP_CONTAINS(text, r'(productivity.?dividend)') AS productivity_dividend,
+    REGEXP_CONTAINS(text, r'(positive.?contribution)') AS positive_contribution,
+    REGEXP_CONTAINS(text, r'(productivity.?leap)') AS productivity_leap,
+    REGEXP_CONTAINS(text, r'(labor.?productivity.?improvement)') AS labor_prod_improvement,
+    REGEXP_CONTAINS(text, r'(opportunity.{0,20}\bai\b)') AS opportunity_ai,
     text
   from ln
   -- Require a mention of AI somewhere
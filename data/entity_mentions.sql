@@ -0,0 +1,30 @@
+-- One row per named entity mentioned in each AI article: the entity's type and the name it's mentioned by.
+-- Mention counts are plain group-bys over this, rather than each unnesting every entity's properties twice.
+-- Build rhetorical_frames.article_entities from article_entities.sql first
+with typed_entities as (
+  select
+    id,
+    duplicateGroupId,
+    -- For building a year at a time
+    year,
+    semantic_info,
+    -- The entity's type is the property holding one of the types the summaries count. To count another, add it here
+    -- and rebuild. An entity has one type, so this reads its properties once rather than pairing each with the rest.
+    (select max(property.value)
+     from unnest(semantic_info) as property
+     where property.value in ("Person", "Organization", "Company")) as entity_type
+  from rhetorical_frames.article_entities
+  -- bq.make_table_incremental() narrows this to the year it rebuilds
+  where /* year: year */ TRUE
+)
+select distinct
+  typed_entities.id,
+  typed_entities.duplicateGroupId,
+  typed_entities.year,
+  typed_entities.entity_type,
+  mention.value
+from typed_entities
+-- The property named "value" holds the name the entity is mentioned by
+cross join unnest(typed_entities.semantic_info) as mention
+where mention.name = "value"
+  and typed_entities.entity_type is not null
@@ -0,0 +1,240 @@
+-- Generated by frame_compiler.py from frames.yaml: edit that and run `python3 frame_compiler.py`, not this file.
+-- One row per AI article in the analytic corpus, with its text and a boolean column per frame saying whether the
+-- article is in it. This reads raw_news once for every frame, and matches each article's text once rather than once
+-- per named entity. The frame tables and the artificial_intelligence table are projections of it (see the
+-- saving_*_data.sql scripts, or main.frame_projection_sql); named entities go in article_entities.sql.
+with ln as (
+  -- Select analytic corpus
+  select
+    id,
+    -- This lets us deduplicate articles that are almost identical but published multiple places etc.
+    duplicateGroupId,
+    title,
+    url,
+    -- Author data
+    author.name as author,
+    extract(year from publishedDate) as year,
+    -- The publisher/source
+    source.name as source_name,
+    source.category as source_category,
+    -- Trimming only matters to competition's "text not like '...%'" exclusions; no pattern depends on edge whitespace
+    trim(lower(coalesce(title, "") || " " || coalesce(subTitle, "") || " " || coalesce(content, ""))) as text
+  from gcp_cset_lexisnexis.raw_news
+  where
+    extract(year from publishedDate) >= 2012
+    and extract(year from publishedDate) <= 2020
+    -- bq.make_table_incremental() narrows this to the year it rebuilds
+    and /* year: extract(year from publishedDate) */ TRUE
+    and (source.category = 'Press Wire'
+       or source.category = 'National'
+       or source.category = 'Trade')
+    -- I excluded rank 3 here in an attempt to cut down on low-quality hits
+    and source.editorialRank in (1, 2)
+    and language = 'English'
+    and source.location.country = 'United States'
+    -- The original frame queries cross joined semantics.entities, which dropped articles without named entities
+    and array_length(semantics.entities) > 0
+),
+ai as (
+  -- Require a mention of AI somewhere, as for the artificial_intelligence table
+  select *
+  from ln
+  where regexp_contains(text, r'\bai\b|artificial intelligence\b')
+),
+frames as (
+  -- Keywords that the hit conditions OR together are matched as one regex, after a check for the literal text any
+  -- match must contain
+  select
+    id,
+    duplicateGroupId,
+    title,
+    url,
+    author,
+    year,
+    source_name,
+    source_category,
+    text,
+    -- Economic gold rush
+    if(strpos(text, 'contribution') > 0
+        or strpos(text, 'cumulative') > 0
+        or strpos(text, 'economic') > 0
+        or strpos(text, 'fourteen') > 0
+        or strpos(text, 'opportunity') > 0
+        or strpos(text, 'productivity') > 0
+        or strpos(text, 'revolution') > 0
+        or strpos(text, 'transform') > 0
+        or strpos(text, 'trillion') > 0,
+      regexp_contains(text, r'(?:14.?trillion.?boost)|(?:fourteen.?trillion.?boost)|(?:transform.?economy)|(?:biggest.?commercial.?opportunity)|(?:ai.?revolution)|(?:total.?economic.?gains?)|(?:golden.?opportunity)|(?:cumulative.?gdp)|(?:global.?economic.?activity)|(?:higher.?productivity.?growth)|(?:productivity.?dividend)|(?:positive.?contribution)|(?:productivity.?leap)|(?:labor.?productivity.?improvement)|(?:opportunity.{0,20}\bai\b)'),
+      false) as economic_gold_rush,
+    -- World without work
+    (if(strpos(text, 'global useless class') > 0
+          or strpos(text, 'job killer') > 0
+          or strpos(text, 'our job') > 0
+          or strpos(text, 'polarization') > 0,
+        regexp_contains(text, r'(?:global useless class)|(?:employment.?polarization)|(?:take y?our job)|(?:job killer)'),
+        false)
+      or (if(strpos(text, 'automate') > 0
+            or strpos(text, 'automation') > 0
+            or strpos(text, 'coming for ') > 0
+            or strpos(text, 'displace') > 0
+            or strpos(text, 'eliminated') > 0
+            or strpos(text, 'extinct') > 0
+            or strpos(text, 'mass joblessness') > 0
+            or strpos(text, 'obsolete') > 0
+            or strpos(text, 'out of a job') > 0
+            or strpos(text, 'recovery') > 0
+            or strpos(text, 'replace') > 0
+            or strpos(text, 'steal') > 0
+            or strpos(text, 'threaten') > 0
+            or strpos(text, 'unemploy') > 0,
+          regexp_contains(text, r'(?:displace.{0,20}job.{0,20}\bai\b)|(?:\bai\b.{0,20}displace.*job)|(?:replace.{0,20}job.{0,20}\bai\b)|(?:\bai\b.{0,20}replace.{0,20}job)|(?:obsolete.{0,20}\bai\b)|(?:\bai\b.{0,20}obsolete)|(?:automation.{0,20}job)|(?:automate.{0,20}job)|(?:job.{0,20}automation)|(?:job.{0,20}automate)|(?:mass joblessness)|(?:out of a job)|(?:unemploy)|(?:jobless.?recovery)|(?:jobs.?eliminated)|(?:steal.?jobs?)|(?:threaten.{0,20}jobs?)|(?:job.{0,20}extinct)|(?:coming for y?our job)'),
+          false)
+        and if(strpos(text, 'collar') > 0
+            or strpos(text, 'compensation') > 0
+            or strpos(text, 'industrial') > 0
+            or strpos(text, 'livelihoods') > 0
+            or strpos(text, 'reskill') > 0
+            or strpos(text, 'robot apocalypse') > 0
+            or strpos(text, 'winners and losers') > 0,
+          regexp_contains(text, r'(?:livelihoods)|(?:compensation)|(?:robot apocalypse)|(?:fourth.?industrial.?revolution)|(?:reskill)|(?:winners and losers)|(?:blue.?collar)|(?:white.?collar)'),
+          false))) as world_without_work,
+    -- Killer robots
+    if(strpos(text, 'autonomous') > 0
+        or strpos(text, 'convention on conventional weapons') > 0
+        or strpos(text, 'dod directive 3000') > 0
+        or strpos(text, 'existential') > 0
+        or strpos(text, 'humanity') > 0
+        or strpos(text, 'international') > 0
+        or strpos(text, 'killer') > 0
+        or strpos(text, 'law') > 0
+        or strpos(text, 'martens clause') > 0
+        or strpos(text, 'meaningful') > 0
+        or strpos(text, 'retaining') > 0
+        or strpos(text, 'slaughterbot') > 0,
+      regexp_contains(text, r'(?:lethal.?autonomous.?weapons?)|(?:fully.?autonomous.?weapons?)|(?:slaughterbots?)|(?:international.?humanitarian.?law)|(?:laws?.?of.?war)|(?:killer.?robots?)|(?:meaningful.?human.?control)|(?:retaining.?human.?control)|(?:campaign to stop killer robots?)|(?:international committee for robot arms control)|(?:threat.?to.?humanity)|(?:martens clause)|(?:convention on conventional weapons)|(?:autonomous.?weapons?)|(?:dod directive 3000.?09)|(?:existential.?risk)'),
+      false) as killer_robots,
+    -- Competition
+    if(source_name not like '%Publisher\'s Weekly%'
+      and text not like '%indiebound.org%'
+      and text not like 'defense innovation unit selects google cloud to help u.s. military health system with predictive cancer diagnoses%'
+      and text not like 'in ucraina si torna a sparare%'
+      and source_name != 'CQ Congressional Testimony'
+      and source_name != 'International Business Times Italy',
+      if(regexp_contains(text, r'\b(ai|artificial intelligence)\b'),
+        if(strpos(text, 'arms race') > 0
+            or strpos(text, 'battl') > 0
+            or strpos(text, 'compet') > 0
+            or strpos(text, 'conflict') > 0
+            or strpos(text, 'dominance') > 0
+            or strpos(text, 'domination') > 0
+            or strpos(text, 'foreign adversar') > 0
+            or strpos(text, 'outpac') > 0
+            or strpos(text, 'overtak') > 0
+            or strpos(text, 'rival') > 0
+            or strpos(text, 'sputnik') > 0
+            or strpos(text, 'strategic advantage') > 0
+            or strpos(text, 'superiority') > 0
+            or strpos(text, 'supremacy') > 0
+            or strpos(text, 'war') > 0,
+          regexp_contains(text, r'(?:\bsputnik\b)|(?:\bforeign adversar\w*\b)|(?:\b(ai|artificial intelligence).{0,20}arms race\b)|(?:\barms race.{0,20}\b(ai|artificial intelligence)\b)|(?:\b(ai|artificial intelligence)\b.{0,20}(battl\w*|compet\w*|conflict|rival\w*|war)\b)|(?:\b(battl\w*|compet\w*|conflict|rival\w*|war).{0,20}\b(ai|artificial intelligence)\b)|(?:\b(ai|artificial intelligence)\b.{0,20}(dominance|domination|supremacy|superiority)\b)|(?:\b(dominance|domination|supremacy|superiority).{0,20}\b(ai|artificial intelligence)\b)|(?:\b(ai|artificial intelligence)\b.{0,20}strategic advantage\b)|(?:\bstrategic advantage.{0,20}\b(ai|artificial intelligence)\b)|(?:\b(ai|artificial intelligence)\b.{0,20}(outpac\w*|overtak\w*)\b)|(?:\b(outpac\w*|overtak\w*).{0,20}\b(ai|artificial intelligence)\b)'),
+          false),
+        false),
+      false) as competition
+  from ai
+)
+select
+  id,
+  duplicateGroupId,
+  title,
+  url,
+  author,
+  year,
+  source_name,
+  source_category,
+  text,
+  economic_gold_rush, world_without_work, killer_robots, competition,
+  -- The keywords that each frame's articles matched, as <frame prefix>_<keyword>
+  array_concat(
+    if(economic_gold_rush, array_concat(
+      if(regexp_contains(text, r'14.?trillion.?boost'), ['egr_num_trillion_boost'], []),
+      if(regexp_contains(text, r'fourteen.?trillion.?boost'), ['egr_fourteen_trillion_boost'], []),
+      if(regexp_contains(text, r'transform.?economy'), ['egr_transform_economy'], []),
+      if(regexp_contains(text, r'biggest.?commercial.?opportunity'), ['egr_biggest_commercial_opportunity'], []),
+      if(regexp_contains(text, r'ai.?revolution'), ['egr_ai_revolution'], []),
+      if(regexp_contains(text, r'total.?economic.?gains?'), ['egr_total_economic_gains'], []),
+      if(regexp_contains(text, r'golden.?opportunity'), ['egr_golden_opportunity'], []),
+      if(regexp_contains(text, r'cumulative.?gdp'), ['egr_cumulative_gdp'], []),
+      if(regexp_contains(text, r'global.?economic.?activity'), ['egr_global_economic_activity'], []),
+      if(regexp_contains(text, r'higher.?productivity.?growth'), ['egr_higher_productivity_growth'], []),
+      if(regexp_contains(text, r'productivity.?dividend'), ['egr_productivity_dividend'], []),
+      if(regexp_contains(text, r'positive.?contribution'), ['egr_positive_contribution'], []),
+      if(regexp_contains(text, r'productivity.?leap'), ['egr_productivity_leap'], []),
+      if(regexp_contains(text, r'labor.?productivity.?improvement'), ['egr_labor_prod_improvement'], []),
+      if(regexp_contains(text, r'opportunity.{0,20}\bai\b'), ['egr_opportunity_ai'], [])), []),
+    if(world_without_work, array_concat(
+      if(regexp_contains(text, r'displace.{0,20}job.{0,20}\bai\b'), ['www_displace_job_ai'], []),
+      if(regexp_contains(text, r'\bai\b.{0,20}displace.*job'), ['www_ai_displace_job'], []),
+      if(regexp_contains(text, r'replace.{0,20}job.{0,20}\bai\b'), ['www_replace_job_ai'], []),
+      if(regexp_contains(text, r'\bai\b.{0,20}replace.{0,20}job'), ['www_ai_replace_job'], []),
+      if(regexp_contains(text, r'obsolete.{0,20}\bai\b'), ['www_obsolete_ai'], []),
+      if(regexp_contains(text, r'\bai\b.{0,20}obsolete'), ['www_ai_obsolete'], []),
+      if(regexp_contains(text, r'automation.{0,20}job'), ['www_automation_job'], []),
+      if(regexp_contains(text, r'automate.{0,20}job'), ['www_automate_job'], []),
+      if(regexp_contains(text, r'job.{0,20}automation'), ['www_job_automation'], []),
+      if(regexp_contains(text, r'job.{0,20}automate'), ['www_job_automate'], []),
+      if(regexp_contains(text, r'global useless class'), ['www_global_useless_class'], []),
+      if(regexp_contains(text, r'employment.?polarization'), ['www_employment_polarization'], []),
+      if(regexp_contains(text, r'livelihoods'), ['www_livelihoods'], []),
+      if(regexp_contains(text, r'compensation'), ['www_compensation'], []),
+      if(regexp_contains(text, r'mass joblessness'), ['www_mass_joblessness'], []),
+      if(regexp_contains(text, r'out of a job'), ['www_out_of_job'], []),
+      if(regexp_contains(text, r'robot apocalypse'), ['www_robot_apocalypse'], []),
+      if(regexp_contains(text, r'unemploy'), ['www_unemploy'], []),
+      if(regexp_contains(text, r'fourth.?industrial.?revolution'), ['www_fourth_industrial_revolution'], []),
+      if(regexp_contains(text, r'unions?'), ['www_unions'], []),
+      if(regexp_contains(text, r'jobless.?recovery'), ['www_jobless_recovery'], []),
+      if(regexp_contains(text, r'reskill'), ['www_reskill'], []),
+      if(regexp_contains(text, r'winners and losers'), ['www_winners_losers'], []),
+      if(regexp_contains(text, r'blue.?collar'), ['www_blue_collar'], []),
+      if(regexp_contains(text, r'white.?collar'), ['www_white_collar'], []),
+      if(regexp_contains(text, r'jobs.?eliminated'), ['www_jobs_eliminated'], []),
+      if(regexp_contains(text, r'steal.?jobs?'), ['www_steal_jobs'], []),
+      if(regexp_contains(text, r'coming for y?our job'), ['www_coming_for_job'], []),
+      if(regexp_contains(text, r'take y?our job'), ['www_take_job'], []),
+      if(regexp_contains(text, r'job killer'), ['www_job_killer'], []),
+      if(regexp_contains(text, r'threaten.{0,20}jobs?'), ['www_threaten_jobs'], []),
+      if(regexp_contains(text, r'job.{0,20}extinct'), ['www_job_extinct'], [])), []),
+    if(killer_robots, array_concat(
+      if(regexp_contains(text, r'lethal.?autonomous.?weapons?'), ['kr_lethal_aut_weapons'], []),
+      if(regexp_contains(text, r'fully.?autonomous.?weapons?'), ['kr_fully_aut_weapons'], []),
+      if(regexp_contains(text, r'slaughterbots?'), ['kr_slaughterbots'], []),
+      if(regexp_contains(text, r'international.?humanitarian.?law'), ['kr_intl_human_law'], []),
+      if(regexp_contains(text, r'laws?.?of.?war'), ['kr_laws_of_war'], []),
+      if(regexp_contains(text, r'killer.?robots?'), ['kr_killer_robots'], []),
+      if(regexp_contains(text, r'meaningful.?human.?control'), ['kr_meaningful_human_control'], []),
+      if(regexp_contains(text, r'retaining.?human.?control'), ['kr_retaining_human_control'], []),
+      if(regexp_contains(text, r'campaign to stop killer robots?'), ['kr_campaign_stop_killer_bots'], []),
+      if(regexp_contains(text, r'international committee for robot arms control'), ['kr_intl_committee_robot_arms_cntl'], []),
+      if(regexp_contains(text, r'threat.?to.?humanity'), ['kr_threat_to_human'], []),
+      if(regexp_contains(text, r'martens clause'), ['kr_martens_clause'], []),
+      if(regexp_contains(text, r'convention on conventional weapons'), ['kr_convent_con_weapons'], []),
+      if(regexp_contains(text, r'autonomy'), ['kr_autonomy'], []),
+      if(regexp_contains(text, r'semi.?autonomous weapons?.?systems'), ['kr_semi_aut_weapons'], []),
+      if(regexp_contains(text, r'autonomous.?weapons?'), ['kr_aut_weapon'], []),
+      if(regexp_contains(text, r'dod directive 3000.?09'), ['kr_dod_directive'], []),
+      if(regexp_contains(text, r'existential.?risk'), ['kr_existential_risk'], []),
+      if(regexp_contains(text, r'prohibition.{0,20}\bai\b'), ['kr_prohibition_ai'], []),
+      if(regexp_contains(text, r'\bai\b.{0,20}prohibition'), ['kr_ai_prohibition'], []),
+      if(regexp_contains(text, r'\bban\b.{0,20}\bai\b'), ['kr_ban_ai'], []),
+      if(regexp_contains(text, r'\bai\b.{0,20}\bban\b'), ['kr_ai_ban'], [])), []),
+    if(competition, array_concat(
+      if(regexp_contains(text, r'\bsputnik\b'), ['c_sputnik'], []),
+      if(regexp_contains(text, r'\bforeign adversar\w*\b'), ['c_foreign_adversary'], []),
+      if(regexp_contains(text, r'(?:\b(ai|artificial intelligence).{0,20}arms race\b)|(?:\barms race.{0,20}\b(ai|artificial intelligence)\b)'), ['c_arms_race'], []),
+      if(regexp_contains(text, r'(?:\b(ai|artificial intelligence)\b.{0,20}(battl\w*|compet\w*|conflict|rival\w*|war)\b)|(?:\b(battl\w*|compet\w*|conflict|rival\w*|war).{0,20}\b(ai|artificial intelligence)\b)'), ['c_conflict'], []),
+      if(regexp_contains(text, r'(?:\b(ai|artificial intelligence)\b.{0,20}(dominance|domination|supremacy|superiority)\b)|(?:\b(dominance|domination|supremacy|superiority).{0,20}\b(ai|artificial intelligence)\b)'), ['c_dominance'], []),
+      if(regexp_contains(text, r'(?:\b(ai|artificial intelligence)\b.{0,20}strategic advantage\b)|(?:\bstrategic advantage.{0,20}\b(ai|artificial intelligence)\b)'), ['c_strategic_advantage'], []),
+      if(regexp_contains(text, r'(?:\b(ai|artificial intelligence)\b.{0,20}(outpac\w*|overtak\w*)\b)|(?:\b(outpac\w*|overtak\w*).{0,20}\b(ai|artificial intelligence)\b)'), ['c_outpace'], []),
+      if(regexp_contains(text, r'\b(america|united states|u\.s\.|usa|china|chinese|beijing|taiwan|taiwanese|korea|russia|moscow|india|pakistan|iran|ally|allies|nato)\b'), ['c_has_country_reference'], [])), [])
+  ) as matched_keywords
+from frames
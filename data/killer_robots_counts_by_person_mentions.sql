@@ -1,20 +1,19 @@
 -- Getting counts of how many distinct articles mention different people for the killer robots frame
 SELECT
--- Semantic.value contains the names of the person mentioned
-  temp_semantic.value,
+  -- The names of the people mentioned
+  mentions.value,
   -- Counting distinct articles containing mentions
-  COUNT(DISTINCT duplicateGroupId) AS count
+  COUNT(DISTINCT frame.duplicateGroupId) AS count
 FROM
-  `gcp-cset-projects.rhetorical_frames.killer_robots`,
-  -- We want to unnest the semantic info array so we have every row of it and can get the row with the "value" name in it
-  UNNEST(semantic_info) AS temp_semantic
-  -- We also want to cross join so we can specifically pull in only the semantic info arrays that have "Person" values
-CROSS JOIN
-  UNNEST(semantic_info) AS semantic
+  `gcp-cset-projects.rhetorical_frames.killer_robots` AS frame
+  -- Named entity mentions are kept in a side table, one row per entity and type (entity_mentions.sql)
+INNER JOIN
+  `gcp-cset-projects.rhetorical_frames.entity_mentions` AS mentions
+ON
+  mentions.id = frame.id
 WHERE
-  semantic.value = "Person"
-  AND temp_semantic.name = "value"
+  mentions.entity_type = "Person"
 GROUP BY
-  temp_semantic.value
+  mentions.value
 ORDER BY
   2 DESC
\ No newline at end of file
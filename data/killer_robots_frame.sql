@@ -33,28 +33,28 @@ keywords as (
     matchingKeywords,
     year,
     source_name,
-    REGEXP_CONTAINS(LOWER(text), r'(lethal.?autonomous.?weapons?)') AS lethal_aut_weapons,
-    REGEXP_CONTAINS(LOWER(text), r'(fully.?autonomous.?weapons?)') AS fully_aut_weapons,
-    REGEXP_CONTAINS(LOWER(text), r'(slaughterbots?)') AS slaughterbots,
-    REGEXP_CONTAINS(LOWER(text), r'(international.?humanitarian.?law)') AS intl_human_law,
-    REGEXP_CONTAINS(LOWER(text), r'(laws?.?of.?war)') AS laws_of_war,
-    REGEXP_CONTAINS(LOWER(text), r'(killer.?robots?)') AS killer_robots,
-    REGEXP_CONTAINS(LOWER(text), r'(meaningful.?human.?control)') AS meaningful_human_control,
-    REGEXP_CONTAINS(LOWER(text), r'(retaining.?human.?control)') AS retaining_human_control,
-    REGEXP_CONTAINS(LOWER(text), r'(campaign to stop killer robots?)') AS campaign_stop_killer_bots,
-    REGEXP_CONTAINS(LOWER(text), r'(international committee for robot arms control)') AS intl_committee_robot_arms_cntl,
-    REGEXP_CONTAINS(LOWER(text), r'(threat.?to.?humanity)') AS threat_to_human,
-    REGEXP_CONTAINS(LOWER(text), r'(martens clause)') AS martens_clause,
-    REGEXP_CONTAINS(LOWER(text), r'(convention on conventional weapons)') AS convent_con_weapons,
-    REGEXP_CONTAINS(LOWER(text), r'(autonomy)') AS autonomy,
-    REGEXP_CONTAINS(LOWER(text), r'(semi.?autonomous weapons?.?systems)') AS semi_aut_weapons,
-    REGEXP_CONTAINS(LOWER(text), r'(autonomous.?weapons?)') AS aut_weapon,
-    REGEXP_CONTAINS(LOWER(text), r'(dod directive 3000.?09)') AS dod_directive,
-    REGEXP_CONTAINS(LOWER(text), r'(existential.?risk)') AS existential_risk,
-    REGEXP_CONTAINS(LOWER(text), r'(prohibition.{0,20}\bai\b)') AS prohibition_ai,
-    REGEXP_CONTAINS(LOWER(text), r'(\bai\b.{0,20}prohibition)') AS ai_prohibition,
-    REGEXP_CONTAINS(LOWER(text), r'(\bban\b.{0,20}\bai\b)') AS ban_ai,
-    REGEXP_CONTAINS(LOWER(text), r'(\bai\b.{0,20}\bban\b)') AS ai_ban,
+    REGEXP_CONTAINS(text, r'(lethal.?autonomous.?weapons?)') AS lethal_aut_weapons,
+    REGEXP_CONTAINS(text, r'(fully.?autonomous.?weapons?)') AS fully_aut_weapons,
+    REGEXP_CONTAINS(text, r'(slaughterbots?)') AS slaughterbots,
+    REGEXP_CONTAINS(text, r'(international.?humanitarian.?law)') AS intl_human_law,
+    REGEXP_CONTAINS(text, r'(laws?.?of.?war)') AS laws_of_war,
+    REGEXP_CONTAINS(text, r'(killer.?robots?)') AS killer_robots,
+    REGEXP_CONTAINS(text, r'(meaningful.?human.?control)') AS meaningful_human_control,
+    REGEXP_CONTAINS(text, r'(retaining.?human.?control)') AS retaining_human_control,
+    REGEXP_CONTAINS(text, r'(campaign to stop killer robots?)') AS campaign_stop_killer_bots,
+    REGEXP_CONTAINS(text, r'(international committee for robot arms control)') AS intl_committee_robot_arms_cntl,
+    REGEXP_CONTAINS(text, r'(threat.?to.?humanity)') AS threat_to_human,
+    REGEXP_CONTAINS(text, r'(martens clause)') AS martens_clause,
+    REGEXP_CONTAINS(text, r'(convention on conventional weapons)') AS convent_con_weapons,
+    REGEXP_CONTAINS(text, r'(autonomy)') AS autonomy,
+    REGEXP_CONTAINS(text, r'(semi.?autonomous weapons?.?systems)') AS semi_aut_weapons,
+    REGEXP_CONTAINS(text, r'(autonomous.?weapons?)') AS aut_weapon,
+    REGEXP_CONTAINS(text, r'(dod directive 3000.?09)') AS dod_directive,
+    REGEXP_CONTAINS(text, r'(existential.?risk)') AS existential_risk,
+    REGEXP_CONTAINS(text, r'(prohibition.{0,20}\bai\b)') AS prohibition_ai,
+    REGEXP_CONTAINS(text, r'(\bai\b.{0,20}prohibition)') AS ai_prohibition,
+    REGEXP_CONTAINS(text, r'(\bban\b.{0,20}\bai\b)') AS ban_ai,
+    REGEXP_CONTAINS(text, r'(\bai\b.{0,20}\bban\b)') AS ai_ban,
     text
   from ln
   -- Require a mention of AI somewhere
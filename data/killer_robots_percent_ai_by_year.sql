@@ -14,17 +14,14 @@ WITH
   ORDER BY
     year ASC),
   ai_counter AS (
-  -- Get the count of all AI articles
+  -- Get the count of all AI articles, counted once for every frame in ai_denominators.sql
   SELECT
     year,
-    -- Want to count duplicateGroupIds to distinct articles correctly
-    COUNT(DISTINCT duplicateGroupId) AS ai_count
+    ai_count
   FROM
-    `gcp-cset-projects.rhetorical_frames.artificial_intelligence`
-  GROUP BY
-    year
-  ORDER BY
-    year ASC)
+    `gcp-cset-projects.rhetorical_frames.ai_denominators`
+  WHERE
+    breakdown = "year")
 SELECT
   killer_robots_counter.year,
   -- We just divide rather than multiplying by 100 -- it's easier to manipulate later
@@ -1,61 +1,17 @@
 -- Creating a new table with all artificial intelligence articles and the columns of interest
+-- Build rhetorical_frames.frame_membership from frame_membership.sql first; it matches every frame in one pass
+-- Every row of frame_membership is an AI article, so this is all of it
 create or replace table rhetorical_frames.artificial_intelligence as
-with ln as (
-  -- Select analytic corpus
-  select
-    id,
-    -- This lets us deduplicate articles that are almost identical but published multiple places etc.
-    duplicateGroupId,
-    title,
-    subTitle,
-    content,
-    matchingKeywords,
-    -- NER info
-    entities.properties as semantic_info,
-    -- Author data
-    author.name as author,
-    extract(year from publishedDate) as year,
-    -- The publisher/source
-    source.name as source_name,
-    url,
-    lower(coalesce(title, "") || " " || coalesce(subTitle, "") || " " || coalesce(content, "")) as text
-  from gcp_cset_lexisnexis.raw_news, UNNEST(semantics.entities) as entities
-  where
-    extract(year from publishedDate) >= 2012
-    and extract(year from publishedDate) <= 2020
-    and (source.category = 'Press Wire'
-       or source.category = 'National'
-       or source.category = 'Trade')
-    -- I excluded rank 3 here in an attempt to cut down on low-quality hits
-    and source.editorialRank in (1, 2)
-    and language = 'English'
-    and source.location.country = 'United States'
-),
-keywords as (
-  -- Filter only articles containing AI or artificial intelligence
-  select
-    id,
-    duplicateGroupId,
-    title,
-    url,
-    author,
-    matchingKeywords,
-    semantic_info,
-    year,
-    source_name,
-    text
-  from ln
-  -- Require a mention of AI somewhere
-  where regexp_contains(ln.text, r"\bai\b|artificial intelligence\b")
-)
 select
- -- Save off the results
   id,
+  -- This lets us deduplicate articles that are almost identical but published multiple places etc.
   duplicateGroupId,
   title,
   url,
   year,
+  -- The publisher/source
   source_name,
-  author,
-  semantic_info
-from keywords
\ No newline at end of file
+  -- Author data
+  author
+-- One row per article: named entities are in rhetorical_frames.article_entities, keyed by id
+from rhetorical_frames.frame_membership
@@ -3,22 +3,20 @@
 WITH
   orgs AS (
   SELECT
-    -- Semantic.value contains the names of the organizations mentioned
-    LOWER(temp_semantic.value) AS organization,
+    -- The names of the organizations mentioned
+    LOWER(mentions.value) AS organization,
     -- Counting distinct articles containing mentions
-    COUNT(DISTINCT duplicateGroupId) AS count
+    COUNT(DISTINCT frame.duplicateGroupId) AS count
   FROM
-    `gcp-cset-projects.rhetorical_frames.world_without_work`,
-    -- We want to unnest the semantic info array so we have every row of it and can get the row with the "value" name in it
-    UNNEST(semantic_info) AS temp_semantic
-    -- We also want to cross join so we can specifically pull in only the semantic info arrays that have "Organization" values
-  CROSS JOIN
-    UNNEST(semantic_info) AS semantic
+    `gcp-cset-projects.rhetorical_frames.world_without_work` AS frame
+    -- Named entity mentions are kept in a side table, one row per entity and type (entity_mentions.sql)
+  INNER JOIN
+    `gcp-cset-projects.rhetorical_frames.entity_mentions` AS mentions
+  ON
+    mentions.id = frame.id
   WHERE
     -- Using both company and organization
-    (semantic.value = "Organization"
-      OR semantic.value = "Company")
-    AND temp_semantic.name = "value"
+    mentions.entity_type IN ("Organization", "Company")
   GROUP BY
     1)
 SELECT
@@ -33,38 +33,38 @@ keywords as (
     matchingKeywords,
     year,
     source_name,
-    REGEXP_CONTAINS(LOWER(text), r'(displace.{0,20}job.{0,20}\bai\b)') AS displace_job_ai,
-    REGEXP_CONTAINS(LOWER(text), r'(\bai\b.{0,20}displace.*job)') AS ai_displace_job,
-    REGEXP_CONTAINS(LOWER(text), r'(replace.{0,20}job.{0,20}\bai\b)') AS replace_job_ai,
-    REGEXP_CONTAINS(LOWER(text), r'(\bai\b.{0,20}replace.{0,20}job)') AS ai_replace_job,
-    REGEXP_CONTAINS(LOWER(text), r'(obsolete.{0,20}\bai\b)') AS obsolete_ai,
-    REGEXP_CONTAINS(LOWER(text), r'(\bai\b.{0,20}obsolete)') AS ai_obsolete,
-    REGEXP_CONTAINS(LOWER(text), r'(automation.{0,20}job)') AS automation_job,
-    REGEXP_CONTAINS(LOWER(text), r'(automate.{0,20}job)') AS automate_job,
-    REGEXP_CONTAINS(LOWER(text), r'(job.{0,20}automation)') AS job_automation,
-    REGEXP_CONTAINS(LOWER(text), r'(job.{0,20}automate)') AS job_automate,
-    REGEXP_CONTAINS(LOWER(text), r'(global useless class)') AS global_useless_class,
-    REGEXP_CONTAINS(LOWER(text), r'(employment.?polarization)') AS employment_polarization,
-    REGEXP_CONTAINS(LOWER(text), r'(livelihoods)') AS livelihoods,
-    REGEXP_CONTAINS(LOWER(text), r'(compensation)') AS compensation,
-    REGEXP_CONTAINS(LOWER(text), r'(mass joblessness)') AS mass_joblessness,
-    REGEXP_CONTAINS(LOWER(text), r'(out of a job)') AS out_of_job,
-    REGEXP_CONTAINS(LOWER(text), r'(robot apocalypse)') AS robot_apocalypse,
-    REGEXP_CONTAINS(LOWER(text), r'(unemploy)') AS unemploy,
-    REGEXP_CONTAINS(LOWER(text), r'(fourth.?industrial.?revolution)') AS fourth_industrial_revolution,
-    REGEXP_CONTAINS(LOWER(text), r'(unions?)') AS unions,
-    REGEXP_CONTAINS(LOWER(text), r'(jobless.?recovery)') AS jobless_recovery,
-    REGEXP_CONTAINS(LOWER(text), r'(reskill)') AS reskill,
-    REGEXP_CONTAINS(LOWER(text), r'(winners and losers)') AS winners_losers,
-    REGEXP_CONTAINS(LOWER(text), r'(blue.?collar)') AS blue_collar,
-    REGEXP_CONTAINS(LOWER(text), r'(white.?collar)') AS white_collar,
-    REGEXP_CONTAINS(LOWER(text), r'(jobs.?eliminated)') AS jobs_eliminated,
-    REGEXP_CONTAINS(LOWER(text), r'(steal.?jobs?)') AS steal_jobs,
-    REGEXP_CONTAINS(LOWER(text), r'(coming for y?our job)') AS coming_for_job,
-    REGEXP_CONTAINS(LOWER(text), r'(take y?our job)') AS take_job,
-    REGEXP_CONTAINS(LOWER(text), r'(job killer)') AS job_killer,
-    REGEXP_CONTAINS(LOWER(text), r'(threaten.{0,20}jobs?)') AS threaten_jobs,
-    REGEXP_CONTAINS(LOWER(text), r'(job.{0,20}extinct)') AS job_extinct,
+    REGEXP_CONTAINS(text, r'(displace.{0,20}job.{0,20}\bai\b)') AS displace_job_ai,
+    REGEXP_CONTAINS(text, r'(\bai\b.{0,20}displace.*job)') AS ai_displace_job,
+    REGEXP_CONTAINS(text, r'(replace.{0,20}job.{0,20}\bai\b)') AS replace_job_ai,
+    REGEXP_CONTAINS(text, r'(\bai\b.{0,20}replace.{0,20}job)') AS ai_replace_job,
+    REGEXP_CONTAINS(text, r'(obsolete.{0,20}\bai\b)') AS obsolete_ai,
+    REGEXP_CONTAINS(text, r'(\bai\b.{0,20}obsolete)') AS ai_obsolete,
+    REGEXP_CONTAINS(text, r'(automation.{0,20}job)') AS automation_job,
+    REGEXP_CONTAINS(text, r'(automate.{0,20}job)') AS automate_job,
+    REGEXP_CONTAINS(text, r'(job.{0,20}automation)') AS job_automation,
+    REGEXP_CONTAINS(text, r'(job.{0,20}automate)') AS job_automate,
+    REGEXP_CONTAINS(text, r'(global useless class)') AS global_useless_class,
+    REGEXP_CONTAINS(text, r'(employment.?polarization)') AS employment_polarization,
+    REGEXP_CONTAINS(text, r'(livelihoods)') AS livelihoods,
+    REGEXP_CONTAINS(text, r'(compensation)') AS compensation,
+    REGEXP_CONTAINS(text, r'(mass joblessness)') AS mass_joblessness,
+    REGEXP_CONTAINS(text, r'(out of a job)') AS out_of_job,
+    REGEXP_CONTAINS(text, r'(robot apocalypse)') AS robot_apocalypse,
+    REGEXP_CONTAINS(text, r'(unemploy)') AS unemploy,
+    REGEXP_CONTAINS(text, r'(fourth.?industrial.?revolution)') AS fourth_industrial_revolution,
+    REGEXP_CONTAINS(text, r'(unions?)') AS unions,
+    REGEXP_CONTAINS(text, r'(jobless.?recovery)') AS jobless_recovery,
+    REGEXP_CONTAINS(text, r'(reskill)') AS reskill,
+    REGEXP_CONTAINS(text, r'(winners and losers)') AS winners_losers,
+    REGEXP_CONTAINS(text, r'(blue.?collar)') AS blue_collar,
+    REGEXP_CONTAINS(text, r'(white.?collar)') AS white_collar,
+    REGEXP_CONTAINS(text, r'(jobs.?eliminated)') AS jobs_eliminated,
+    REGEXP_CONTAINS(text, r'(steal.?jobs?)') AS steal_jobs,
+    REGEXP_CONTAINS(text, r'(coming for y?our job)') AS coming_for_job,
+    REGEXP_CONTAINS(text, r'(take y?our job)') AS take_job,
+    REGEXP_CONTAINS(text, r'(job killer)') AS job_killer,
+    REGEXP_CONTAINS(text, r'(threaten.{0,20}jobs?)') AS threaten_jobs,
+    REGEXP_CONTAINS(text, r'(job.{0,20}extinct)') AS job_extinct,
     text
   from ln
   -- Require a mention of AI somewhere
@@ -0,0 +1,269 @@
+"""Write query results to CSV or zstd-compressed Parquet a batch at a time, so memory use doesn't grow with the result.
+
+:func:`export_query` pages the result out of the query with :func:`bq.read_query_batches` and appends each batch to
+the file, so at most one Parquet row group (:data:`ROW_GROUP_ROWS` rows) is held at once, however many rows the
+result has. The file is written next to its destination and moved into place when complete. CSVs have the same
+format as ``DataFrame.to_csv(index=False)``, which main.save_summary writes.
+
+    python3 export.py data/killer_robots_counts_by_person_mentions.sql people.parquet
+"""
+import argparse
+import heapq
+import os
+import tempfile
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from backends import empty_batch
+from bq import read_query_batches
+from query_cache import iter_parquet_batches
+
+FORMATS = ("csv", "parquet")
+# Rows fetched from the query at a time
+BATCH_ROWS = 100_000
+# Rows per Parquet row group: the most rows held in memory while writing
+ROW_GROUP_ROWS = 500_000
+PARQUET_COMPRESSION = "zstd"
+# Rows read from each sorted run at a time while merging them in sum_by_key()
+MERGE_ROWS = 10_000
+
+_streaming = False
+_format = "csv"
+
+
+def set_streaming(enabled: bool, export_format: str = "csv"):
+    """Have main.py stream its summaries to files in the given format, and return lazy iterators rather than
+    DataFrames."""
+    global _streaming, _format
+    _format = _check_format(export_format)
+    _streaming = enabled
+
+
+def streaming_enabled() -> bool:
+    return _streaming
+
+
+def export_format() -> str:
+    return _format
+
+
+def export_query(sql: Union[str, Path], path: Union[str, Path], export_format: Optional[str] = None,
+                 step: Optional[str] = None, lazy=False, batch_rows: int = BATCH_ROWS,
+                 row_group_rows: int = ROW_GROUP_ROWS) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
+    """
+    Stream a query's result to a file.
+    :param sql: Query SQL as text or a :class:`pathlib.Path` to a SQL file.
+    :param path: Output file.
+    :param export_format: ``"csv"`` or ``"parquet"``. Defaults to the file's extension.
+    :param step: Name for the query in the metrics log.
+    :param lazy: If ``True``, return an iterator over the written file's rows a batch at a time, rather than reading
+        the whole file back.
+    :param batch_rows: Rows fetched from the query at a time.
+    :param row_group_rows: Rows per Parquet row group.
+    :return: The result, as a DataFrame or a lazy iterator of DataFrames.
+    """
+    path = Path(path)
+    export_format = _check_format(export_format or path.suffix.lstrip("."))
+    write_batches(read_query_batches(sql, batch_rows, step=step), path, export_format, row_group_rows)
+    if lazy:
+        return iter_file(path, export_format, batch_rows)
+    return pd.read_parquet(path) if export_format == "parquet" else pd.read_csv(path)
+
+
+def write_batches(batches: Iterable[pa.RecordBatch], path: Union[str, Path], export_format: str = "csv",
+                  row_group_rows: int = ROW_GROUP_ROWS) -> int:
+    """
+    Write record batches to a file, holding at most one row group of them at a time.
+    :param batches: Record batches with the same schema.
+    :param path: Output file, replaced once every batch is written.
+    :param export_format: ``"csv"`` or ``"parquet"``.
+    :param row_group_rows: Rows per Parquet row group.
+    :return: Rows written.
+    """
+    path = Path(path)
+    _check_format(export_format)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=path.parent, suffix=".tmp", delete=False) as f:
+        temp_path = f.name
+    try:
+        if export_format == "parquet":
+            rows = _write_parquet(batches, temp_path, row_group_rows)
+        else:
+            rows = _write_csv(batches, temp_path)
+        os.replace(temp_path, path)
+    finally:
+        Path(temp_path).unlink(missing_ok=True)
+    return rows
+
+
+def iter_file(path: Union[str, Path], export_format: Optional[str] = None,
+              batch_rows: int = BATCH_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Read an exported file back a batch at a time.
+    :param path: File written by :func:`export_query`.
+    :param export_format: ``"csv"`` or ``"parquet"``. Defaults to the file's extension.
+    :param batch_rows: Most rows per DataFrame.
+    :return: Lazy iterator of DataFrames.
+    """
+    path = Path(path)
+    if _check_format(export_format or path.suffix.lstrip(".")) == "parquet":
+        for batch in iter_parquet_batches(pq.ParquetFile(path), batch_rows):
+            yield batch.to_pandas()
+    else:
+        with pd.read_csv(path, chunksize=batch_rows) as reader:
+            yield from reader
+
+
+def sum_by_key(frames: Iterable[pd.DataFrame], key: str, value: str,
+               batch_rows: int = BATCH_ROWS) -> Iterator[pa.RecordBatch]:
+    """
+    Sum a column by key over more DataFrames than fit in memory at once, largest sum first.
+
+    This is an external sort. Each DataFrame's sums are written to a temporary file sorted by key. The files are merged
+    to add up each key's sums, and the totals are sorted ``batch_rows`` rows at a time and merged again by sum. At
+    most one DataFrame, ``batch_rows`` totals, and :data:`MERGE_ROWS` rows of each temporary file are held at once.
+    :param frames: DataFrames with ``key`` and ``value`` columns.
+    :param key: Column to group by. Equal sums are ordered by it, NULL last.
+    :param value: Column to sum.
+    :param batch_rows: Rows per batch.
+    :return: Lazy iterator of record batches with ``key`` and ``value`` columns.
+    """
+    schema = None
+    with tempfile.TemporaryDirectory() as directory:
+        by_key = []
+        for df in frames:
+            sums = df.groupby(key, dropna=False, sort=False, as_index=False)[value].sum()
+            sums = sums.sort_values(key, na_position="last", kind="mergesort")
+            table = pa.Table.from_pandas(sums, schema=schema, preserve_index=False)
+            schema = table.schema
+            by_key.append(_write_run(table, Path(directory, f"by_key_{len(by_key)}.parquet")))
+        totals = _sum_adjacent(heapq.merge(*map(_read_run, by_key), key=lambda row: _key_order(row[0])))
+        by_value = []
+        for chunk in _chunks(totals, batch_rows):
+            chunk.sort(key=_value_order)
+            table = pa.Table.from_pandas(pd.DataFrame(chunk, columns=[key, value]), schema=schema,
+                                         preserve_index=False)
+            by_value.append(_write_run(table, Path(directory, f"by_value_{len(by_value)}.parquet")))
+        empty = True
+        for chunk in _chunks(heapq.merge(*map(_read_run, by_value), key=_value_order), batch_rows):
+            empty = False
+            yield pa.RecordBatch.from_pandas(pd.DataFrame(chunk, columns=[key, value]), schema=schema,
+                                             preserve_index=False)
+        if empty:
+            yield empty_batch(schema or pa.schema([(key, pa.string()), (value, pa.int64())]))
+
+
+def _write_parquet(batches: Iterable[pa.RecordBatch], path: str, row_group_rows: int) -> int:
+    writer = None
+    pending = []
+    pending_rows = rows = 0
+    try:
+        for batch in batches:
+            if writer is None:
+                writer = pq.ParquetWriter(path, batch.schema, compression=PARQUET_COMPRESSION)
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            rows += batch.num_rows
+            if pending_rows >= row_group_rows:
+                table = pa.Table.from_batches(pending)
+                # Full row groups now; the remainder waits for the next batches
+                full_rows = pending_rows - pending_rows % row_group_rows
+                writer.write_table(table.slice(0, full_rows), row_group_size=row_group_rows)
+                pending = table.slice(full_rows).to_batches()
+                pending_rows -= full_rows
+        if writer is None:
+            # No batches: an empty file with no columns
+            writer = pq.ParquetWriter(path, pa.schema([]), compression=PARQUET_COMPRESSION)
+        if pending_rows:
+            writer.write_table(pa.Table.from_batches(pending), row_group_size=row_group_rows)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def _write_csv(batches: Iterable[pa.RecordBatch], path: str) -> int:
+    rows = 0
+    header = True
+    with open(path, "w", newline="") as f:
+        for batch in batches:
+            batch.to_pandas().to_csv(f, index=False, header=header)
+            header = False
+            rows += batch.num_rows
+    return rows
+
+
+def _write_run(table: pa.Table, path: Path) -> Path:
+    # Small row groups, so merging reads a run a little at a time
+    pq.write_table(table, str(path), row_group_size=MERGE_ROWS)
+    return path
+
+
+def _read_run(path: Path) -> Iterator[tuple]:
+    for batch in iter_parquet_batches(pq.ParquetFile(path), MERGE_ROWS):
+        yield from zip(*batch.to_pydict().values())
+
+
+def _sum_adjacent(rows: Iterable[tuple]) -> Iterator[tuple]:
+    # Rows sorted by key, with each key's sums added up
+    current = None
+    for row in rows:
+        if current is not None and current[0] == row[0]:
+            current = (current[0], current[1] + row[1])
+            continue
+        if current is not None:
+            yield current
+        current = row
+    if current is not None:
+        yield current
+
+
+def _chunks(rows: Iterable[tuple], size: int) -> Iterator[List[tuple]]:
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _key_order(key) -> tuple:
+    # NULL keys last, as sort_values(na_position="last") puts them
+    return (key is None, "" if key is None else key)
+
+
+def _value_order(row: tuple) -> tuple:
+    return (-row[1], *_key_order(row[0]))
+
+
+def _check_format(export_format: str) -> str:
+    if export_format not in FORMATS:
+        raise ValueError(f"Unsupported export format {export_format!r}; use {' or '.join(FORMATS)}")
+    return export_format
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sql", type=str, help="SQL file to run.")
+    parser.add_argument("output", type=str, help="Output .csv or .parquet file.")
+    parser.add_argument("--format", choices=FORMATS, help="Output format. Defaults to the output file's extension.")
+    parser.add_argument("--row-group-rows", type=int, default=ROW_GROUP_ROWS, help="Rows per Parquet row group.")
+    parser.add_argument("--local", type=str, help="Query the local Parquet tables in this directory.")
+    args = parser.parse_args()
+    if args.local is not None:
+        from backends import LocalBackend
+        from bq import set_backend
+        set_backend(LocalBackend(args.local))
+    export_format = args.format or Path(args.output).suffix.lstrip(".")
+    rows = write_batches(read_query_batches(Path(args.sql), step=Path(args.sql).stem), args.output, export_format,
+                         args.row_group_rows)
+    print(f"Wrote {rows} rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
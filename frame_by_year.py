@@ -6,6 +6,10 @@ import argparse
 import matplotlib.font_manager as font_manager
 from matplotlib.ticker import PercentFormatter
 import numpy as np
+from functools import lru_cache
+
+# CSET standard colors, then CSET grey for labels
+COLORS = ["#003DA6", "#7AC4A5", "#B53A6D", "#F17F4C", "#0B1F41", "#63676B"]
 
 frames = {"economic_gold_rush": 0,
           "world_without_work": 1,
@@ -33,7 +37,45 @@ def read_data(input_csv, percent):
     return x, y, frame
 
 
-def plot_data(x, all_y, percent, frame_data, font_path, output_file):
+@lru_cache(maxsize=None)
+def font_properties(font_path, size):
+    """
+    Font properties for a font file, loaded once per process and size
+    :param font_path: The path to the font file
+    :param size: The font size
+    :return: FontProperties. Text copies them, so they can be shared between charts
+    """
+    return font_manager.FontProperties(fname=font_path, size=size)
+
+
+def year_ticks(years, max_ticks=5):
+    """
+    X ticks spanning the years in the data, with every other tick labelled so the labels can be big
+    :param years: The years in the data
+    :param max_ticks: The most ticks to show
+    :return: The ticks and their labels, None for an unlabelled tick. No ticks if there are no years
+    """
+    if len(years) == 0:
+        return np.array([], dtype=int), []
+    first, last = min(years), max(years)
+    # Every two years for 2012 through 2020
+    step = max(1, -(-(last - first) // (max_ticks - 1)))
+    ticks = np.arange(first, last + 1, step)
+    labels = [tick if index % 2 == 0 else None for index, tick in enumerate(ticks)]
+    return ticks, labels
+
+
+def frame_color(frame, index):
+    """
+    The CSET color of a frame, so a frame has the same color in every chart
+    :param frame: The frame name
+    :param index: The frame's position in the chart, for frames without a color of their own
+    :return: The color
+    """
+    return COLORS[frames.get(frame, index) % (len(COLORS) - 1)]
+
+
+def plot_data(x, all_y, percent, frame_data, font_path, output_file, show=True):
     """
     Plotting the data! We are making subplots over time
     :param x: The time values
@@ -42,39 +84,37 @@ def plot_data(x, all_y, percent, frame_data, font_path, output_file):
     :param frame_data: Each frame, in order
     :param font_path: The path to the Roboto font on your system
     :param output_file: The name of the file to store the chart in
-    :return:
+    :param show: Flag for also showing the chart in a window, which blocks until it's closed
+    :return: The figure
     """
-    # CSET standard colors
-    print(font_path)
-    colors = ["#003DA6", "#7AC4A5", "#B53A6D", "#F17F4C", "0B1F41", "#63676B"]
     # We have to reference Roboto in a weird way in Python
-    # We install it on our system and then into our venv. Anyoneax.xaxis.set_major_locator(MaxNLocator(nbins=4, integer=True)) who runs this will have to provide their own font_path
-    prop = font_manager.FontProperties(fname=font_path, size=15)
-    # Making subplots
-    fig, axs = plt.subplots(1, len(all_y), sharey=True, figsize=(13, 9))
+    # We install it on our system and then into our venv. Anyone who runs this will have to provide their own font_path
+    prop = font_properties(font_path, 15)
+    # Making subplots. squeeze=False keeps axs a grid even with one frame
+    fig, axs = plt.subplots(1, len(all_y), sharey=True, figsize=(13, 9), squeeze=False)
     frame_names = [" ".join(i.split("_")).upper() for i in frame_data]
+    # The years the data covers, with alternating years showing/being hidden
+    # While still showing the grid and showing the years we want
+    # Which is what we need if we want to make the font big enough
+    ticks, tick_labels = year_ticks(x)
     # Setting up our subplots
-    for index, ax in enumerate(axs):
+    for index, ax in enumerate(axs[0]):
         # Plotting our lines in the correct colors
-        ax.plot(x, all_y[index], color=colors[frames[frame_data[index]]], marker="o")
+        ax.plot(x, all_y[index], color=frame_color(frame_data[index], index), marker="o")
         ax.grid(which="major")
-        # We're specifying the years, which is not great
-        # But it's the only way I know to get this alternating year showing/being hidden
-        # While still showing the grid and showing the exact years we want
-        # Which is what we need if we want to make the font big enough
-        ax.set_xticks(np.arange(2012, 2021, 2))
-        ax.set_xticklabels([2012, None, 2016, None, 2020], fontdict={'fontsize': 14})
-        ax.set_yticklabels(all_y[index], fontsize=14)
+        ax.set_xticks(ticks)
+        ax.set_xticklabels(tick_labels, fontdict={'fontsize': 14})
+        ax.tick_params(axis='y', labelsize=14)
         # Set labels CSET grey
-        ax.xaxis.label.set_color(colors[5])
-        ax.yaxis.label.set_color(colors[5])
+        ax.xaxis.label.set_color(COLORS[-1])
+        ax.yaxis.label.set_color(COLORS[-1])
         # We only want left ticks for the first chart
         if index != 0:
-            ax.tick_params(axis='x', colors=colors[5], size=14, left=False)
-            ax.tick_params(axis='y', colors=colors[5], size=14, left=False)
+            ax.tick_params(axis='x', colors=COLORS[-1], size=14, left=False)
+            ax.tick_params(axis='y', colors=COLORS[-1], size=14, left=False)
         else:
-            ax.tick_params(axis='x', colors=colors[5], size=16)
-            ax.tick_params(axis='y', colors=colors[5], size=16)
+            ax.tick_params(axis='x', colors=COLORS[-1], size=16)
+            ax.tick_params(axis='y', colors=COLORS[-1], size=16)
         # Each x axis gets a label
         ax.set_xlabel(frame_names[index], size=13)
         # Set the y values to percentages if we're doing that
@@ -85,15 +125,17 @@ def plot_data(x, all_y, percent, frame_data, font_path, output_file):
     # This is kind of a hack, but we also want a major x-axis label and we want it centered
     # So we're going to make a full-sized subplot and hide everything on it but the label!
     ax = fig.add_subplot(111, frameon=False)
-    ax.set_xlabel("YEAR", labelpad=32, fontproperties=prop, color=colors[5], size=18)
+    ax.set_xlabel("YEAR", labelpad=32, fontproperties=prop, color=COLORS[-1], size=18)
     plt.tick_params(labelcolor='none', top=False, bottom=False, left=False, right=False)
     if percent:
         ax.yaxis.set_major_formatter(PercentFormatter())
-        ax.set_ylabel("PERCENT OF AI ARTICLES", labelpad=26, fontproperties=prop, color=colors[5], size=18)
+        ax.set_ylabel("PERCENT OF AI ARTICLES", labelpad=26, fontproperties=prop, color=COLORS[-1], size=18)
     else:
-        ax.set_ylabel("ARTICLE COUNT", labelpad=26, fontproperties=prop, color=colors[5], size=18)
+        ax.set_ylabel("ARTICLE COUNT", labelpad=26, fontproperties=prop, color=COLORS[-1], size=18)
     plt.savefig(output_file)
-    plt.show()
+    if show:
+        plt.show()
+    return fig
 
 
 def main():
@@ -103,6 +145,7 @@ def main():
     parser.add_argument("font_path", type=str, help="The path on your system to the Roboto font.")
     parser.add_argument("-p", "--percent", action="store_true",
                         help="If percent rather than raw counts, use this flag.")
+    parser.add_argument("--no-show", action="store_true", help="Just save the chart, without showing it.")
     args = parser.parse_args()
     csvs = os.listdir(args.input_dir)
     # reorder csvs so our charts are all in the same order
@@ -120,7 +163,7 @@ def main():
         frame_data.append(frame)
     # Note: suggested font_path looks like:
     # "...../rhetorical-frame-queries/venv/lib/python3.<version>/site-packages/matplotlib/mpl-data/fonts/ttf/Roboto-Regular.ttf"
-    plot_data(x, all_y, args.percent, frame_data, args.font_path, args.output_file)
+    plot_data(x, all_y, args.percent, frame_data, args.font_path, args.output_file, show=not args.no_show)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,354 @@
+"""Generate frame_membership.sql from the frame spec in `./data/frames.yaml`.
+
+The hand-written frame queries run one ``REGEXP_CONTAINS`` per keyword per article. The generated query instead:
+
+- merges the keywords that the hit condition ORs together into one alternation, so each group costs one regex scan
+- guards each alternation with ``STRPOS`` checks for literal substrings every match must contain, e.g. ``trillion`` in
+  ``14.?trillion.?boost``, so most articles are ruled out without running a regex at all
+- evaluates the per-keyword regexes only for articles that are in a frame, to record which keywords they matched
+
+``IF`` only evaluates the branch it returns, which is what makes the guards skip work in BigQuery. Run this after
+editing the spec:
+
+    python3 frame_compiler.py [--check]
+"""
+import argparse
+import ast
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from frames import (AI_GATE, COUNTRY, EDITORIAL_RANKS, FIRST_YEAR, FRAME_SPEC, LANGUAGE, LAST_YEAR, SOURCE_CATEGORIES,
+                    Frame, load_spec)
+from settings import SQL_DIR
+
+MEMBERSHIP_SQL = SQL_DIR / "frame_membership.sql"
+# Shorter literals than this match too many articles to be worth checking first
+MIN_PREFILTER_LITERAL = 3
+
+_ZERO_WIDTH_ESCAPES = set("bBAz")
+_CLASS_ESCAPES = set("wWdDsS")
+
+
+class _Unsupported(Exception):
+    pass
+
+
+def required_literals(pattern: str) -> Optional[Set[str]]:
+    """
+    Literal substrings one of which every match of a regex contains.
+    :param pattern: RE2 regex.
+    :return: The literals, or ``None`` if there's no such set, or the regex uses syntax this doesn't analyze.
+    """
+    try:
+        literals, end = _parse_alternation(pattern, 0)
+    except _Unsupported:
+        return None
+    return literals if end == len(pattern) else None
+
+
+def prefilter_literals(patterns: List[str]) -> Optional[List[str]]:
+    """
+    Literals to check for before running any of the regexes.
+    :param patterns: Regexes.
+    :return: Literals, one of which is in any text that matches one of the regexes, or ``None`` if some regex has no
+        literal of at least :data:`MIN_PREFILTER_LITERAL` characters.
+    """
+    literals = set()
+    for pattern in patterns:
+        required = required_literals(pattern)
+        if not required or min(len(literal) for literal in required) < MIN_PREFILTER_LITERAL:
+            return None
+        literals |= required
+    # A literal containing another one is redundant
+    return sorted(literal for literal in literals
+                  if not any(other != literal and other in literal for other in literals))
+
+
+def membership_sql(frames: Dict[str, Frame]) -> str:
+    """
+    Generate the frame_membership query.
+    :param frames: Frame name -> definition.
+    :return: Query SQL.
+    """
+    frame_columns = ",\n".join(f"    -- {name.replace('_', ' ').capitalize()}\n"
+                               f"    {_indent(_frame_sql(frame), 4)} as {name}"
+                               for name, frame in frames.items())
+    keyword_arrays = ",\n".join(f"    {_indent(_keywords_sql(name, frame), 4)}" for name, frame in frames.items())
+    categories = "\n       or ".join(f"source.category = {_string(category)}" for category in SOURCE_CATEGORIES)
+    return f"""\
+-- Generated by frame_compiler.py from frames.yaml: edit that and run `python3 frame_compiler.py`, not this file.
+-- One row per AI article in the analytic corpus, with its text and a boolean column per frame saying whether the
+-- article is in it. This reads raw_news once for every frame, and matches each article's text once rather than once
+-- per named entity. The frame tables and the artificial_intelligence table are projections of it (see the
+-- saving_*_data.sql scripts, or main.frame_projection_sql); named entities go in article_entities.sql.
+with ln as (
+  -- Select analytic corpus
+  select
+    id,
+    -- This lets us deduplicate articles that are almost identical but published multiple places etc.
+    duplicateGroupId,
+    title,
+    url,
+    -- Author data
+    author.name as author,
+    extract(year from publishedDate) as year,
+    -- The publisher/source
+    source.name as source_name,
+    source.category as source_category,
+    -- Trimming only matters to competition's "text not like '...%'" exclusions; no pattern depends on edge whitespace
+    trim(lower(coalesce(title, "") || " " || coalesce(subTitle, "") || " " || coalesce(content, ""))) as text
+  from gcp_cset_lexisnexis.raw_news
+  where
+    extract(year from publishedDate) >= {FIRST_YEAR}
+    and extract(year from publishedDate) <= {LAST_YEAR}
+    -- bq.make_table_incremental() narrows this to the year it rebuilds
+    and /* year: extract(year from publishedDate) */ TRUE
+    and ({categories})
+    -- I excluded rank 3 here in an attempt to cut down on low-quality hits
+    and source.editorialRank in ({", ".join(str(rank) for rank in EDITORIAL_RANKS)})
+    and language = {_string(LANGUAGE)}
+    and source.location.country = {_string(COUNTRY)}
+    -- The original frame queries cross joined semantics.entities, which dropped articles without named entities
+    and array_length(semantics.entities) > 0
+),
+ai as (
+  -- Require a mention of AI somewhere, as for the artificial_intelligence table
+  select *
+  from ln
+  where regexp_contains(text, {_regex(AI_GATE)})
+),
+frames as (
+  -- Keywords that the hit conditions OR together are matched as one regex, after a check for the literal text any
+  -- match must contain
+  select
+    id,
+    duplicateGroupId,
+    title,
+    url,
+    author,
+    year,
+    source_name,
+    source_category,
+    text,
+{frame_columns}
+  from ai
+)
+select
+  id,
+  duplicateGroupId,
+  title,
+  url,
+  author,
+  year,
+  source_name,
+  source_category,
+  text,
+  {", ".join(frames)},
+  -- The keywords that each frame's articles matched, as <frame prefix>_<keyword>
+  array_concat(
+{keyword_arrays}
+  ) as matched_keywords
+from frames
+"""
+
+
+def write_membership_sql(path: Path = MEMBERSHIP_SQL, spec: Path = FRAME_SPEC) -> bool:
+    """
+    Regenerate frame_membership.sql from the frame spec.
+    :param path: Where to write the query.
+    :param spec: Frame spec.
+    :return: Whether the file changed.
+    """
+    sql = membership_sql(load_spec(spec))
+    if path.exists() and path.read_text() == sql:
+        return False
+    path.write_text(sql)
+    return True
+
+
+def _frame_sql(frame: Frame) -> str:
+    hits = _condition_sql(frame.compile().condition, frame)
+    if frame.gate != AI_GATE:
+        hits = f"if(regexp_contains(text, {_regex(frame.gate)}),\n  {_indent(hits, 2)},\n  false)"
+    if frame.exclusions:
+        # A NULL column fails the exclusions, and IF treats a NULL condition as false, as WHERE does
+        exclusions = "\n  and ".join(f"{column} {op} {_string(value)}" for column, op, value in frame.exclusions)
+        hits = f"if({exclusions},\n  {_indent(hits, 2)},\n  false)"
+    return hits
+
+
+def _condition_sql(node: ast.expr, frame: Frame) -> str:
+    if isinstance(node, ast.Name):
+        return _group_sql([node.id], frame)
+    if isinstance(node.op, ast.And):
+        return "(" + "\n  and ".join(_indent(_condition_sql(value, frame), 2) for value in node.values) + ")"
+    # Any of the keywords ORed together directly is one regex
+    names = [value.id for value in node.values if isinstance(value, ast.Name)]
+    parts = [_group_sql(names, frame)] if names else []
+    parts += [_condition_sql(value, frame) for value in node.values if not isinstance(value, ast.Name)]
+    return "(" + "\n  or ".join(_indent(part, 2) for part in parts) + ")" if len(parts) > 1 else parts[0]
+
+
+def _group_sql(names: List[str], frame: Frame) -> str:
+    patterns = [pattern for name in names for pattern in frame.keywords[name]]
+    match = f"regexp_contains(text, {_regex(_alternation(patterns))})"
+    literals = prefilter_literals(patterns)
+    if literals is None:
+        return match
+    prefilter = "\n    or ".join(f"strpos(text, {_string(literal)}) > 0" for literal in literals)
+    return f"if({prefilter},\n  {match},\n  false)"
+
+
+def _keywords_sql(name: str, frame: Frame) -> str:
+    flags = ",\n".join(f"  if(regexp_contains(text, {_regex(_alternation(patterns))}), "
+                       f"[{_string(f'{frame.prefix}_{keyword}')}], [])"
+                       for keyword, patterns in frame.keywords.items())
+    return f"if({name}, array_concat(\n{flags}), [])"
+
+
+def _alternation(patterns: List[str]) -> str:
+    if len(patterns) == 1:
+        return patterns[0]
+    return "|".join(f"(?:{pattern})" for pattern in patterns)
+
+
+def _regex(pattern: str) -> str:
+    # A raw string, so backslashes reach RE2 as written
+    for quote in ("'", '"'):
+        if quote not in pattern:
+            return f"r{quote}{pattern}{quote}"
+    raise ValueError(f"Can't quote a pattern with both kinds of quote: {pattern}")
+
+
+def _string(value: str) -> str:
+    return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def _indent(sql: str, spaces: int) -> str:
+    return sql.replace("\n", "\n" + " " * spaces)
+
+
+def _parse_alternation(pattern: str, i: int) -> Tuple[Optional[Set[str]], int]:
+    # Each branch must contain one of its literals, so the alternation contains one of their union
+    literals: Optional[Set[str]] = set()
+    while True:
+        branch, i = _parse_sequence(pattern, i)
+        literals = literals | branch if literals is not None and branch is not None else None
+        if i < len(pattern) and pattern[i] == "|":
+            i += 1
+            continue
+        return literals, i
+
+
+def _parse_sequence(pattern: str, i: int) -> Tuple[Optional[Set[str]], int]:
+    # Collect the factors every match contains (runs of literal characters, and required groups), and keep the one
+    # whose shortest literal is longest
+    factors: List[Set[str]] = []
+    run = ""
+    while i < len(pattern) and pattern[i] not in "|)":
+        atom, i = _parse_atom(pattern, i)
+        low, high, i = _parse_quantifier(pattern, i)
+        kind, value = atom
+        if kind == "zero":
+            continue
+        if kind == "char" and low == high == 1:
+            run += value
+            continue
+        if kind == "char" and low >= 1:
+            run += value * low
+        if run:
+            factors.append({run})
+            run = ""
+        if kind == "group" and low >= 1 and value is not None:
+            factors.append(value)
+    if run:
+        factors.append({run})
+    if not factors:
+        return None, i
+    return max(factors, key=lambda f: (min(len(s) for s in f), -len(f))), i
+
+
+def _parse_atom(pattern: str, i: int):
+    char = pattern[i]
+    if char == "\\":
+        if i + 1 >= len(pattern):
+            raise _Unsupported
+        escaped = pattern[i + 1]
+        if escaped in _ZERO_WIDTH_ESCAPES:
+            return ("zero", None), i + 2
+        if escaped in _CLASS_ESCAPES or escaped.isalnum():
+            return ("any", None), i + 2
+        return ("char", escaped), i + 2
+    if char == "(":
+        if pattern.startswith("(?:", i):
+            start = i + 3
+        elif pattern.startswith("(?", i):
+            # Flags and named groups
+            raise _Unsupported
+        else:
+            start = i + 1
+        literals, end = _parse_alternation(pattern, start)
+        if end >= len(pattern) or pattern[end] != ")":
+            raise _Unsupported
+        return ("group", literals), end + 1
+    if char == "[":
+        end = i + 1
+        if end < len(pattern) and pattern[end] == "^":
+            end += 1
+        if end < len(pattern) and pattern[end] == "]":
+            end += 1
+        while end < len(pattern) and pattern[end] != "]":
+            end += 2 if pattern[end] == "\\" else 1
+        if end >= len(pattern):
+            raise _Unsupported
+        return ("any", None), end + 1
+    if char == ".":
+        return ("any", None), i + 1
+    if char in "^$":
+        return ("zero", None), i + 1
+    if char in "*+?{":
+        raise _Unsupported
+    return ("char", char), i + 1
+
+
+def _parse_quantifier(pattern: str, i: int) -> Tuple[int, Optional[int], int]:
+    if i >= len(pattern) or pattern[i] not in "*+?{":
+        return 1, 1, i
+    char = pattern[i]
+    if char == "{":
+        end = pattern.find("}", i)
+        if end < 0:
+            raise _Unsupported
+        bounds = pattern[i + 1:end].split(",")
+        try:
+            low = int(bounds[0])
+            high = low if len(bounds) == 1 else int(bounds[1]) if bounds[1] else None
+        except ValueError:
+            raise _Unsupported from None
+        i = end + 1
+    else:
+        low, high = {"*": (0, None), "+": (1, None), "?": (0, 1)}[char]
+        i += 1
+    # Lazy quantifiers match the same texts
+    if i < len(pattern) and pattern[i] == "?":
+        i += 1
+    return low, high, i
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--check", action="store_true",
+                        help="Don't write anything; exit with an error if frame_membership.sql is out of date.")
+    args = parser.parse_args()
+    if args.check:
+        if not MEMBERSHIP_SQL.exists() or MEMBERSHIP_SQL.read_text() != membership_sql(load_spec()):
+            sys.exit(f"{MEMBERSHIP_SQL.name} is out of date; run python3 frame_compiler.py")
+        print(f"{MEMBERSHIP_SQL.name} is up to date")
+        return
+    changed = write_membership_sql()
+    print(f"{'Wrote' if changed else 'No changes to'} {MEMBERSHIP_SQL}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,8 @@ import matplotlib
 import matplotlib.pyplot as plt
 import csv
 import argparse
-import matplotlib.font_manager as font_manager
 from matplotlib.ticker import PercentFormatter
+from frame_by_year import font_properties
 
 def read_data(input_csv, percent):
     """
@@ -26,7 +26,7 @@ def read_data(input_csv, percent):
     return labels, nums
 
 
-def make_chart(labels, nums, percent, font_path, output_file):
+def make_chart(labels, nums, percent, font_path, output_file, show=True):
     """
     Make our bar chart
     :param labels: The labels for each bar
@@ -34,15 +34,16 @@ def make_chart(labels, nums, percent, font_path, output_file):
     :param percent: Is the bar representing a percentage?
     :param font_path: The path to the Roboto font. This should be in our venv.
     :param output_file: The file we want to store our chart in
-    :return:
+    :param show: Do we also show the chart in a window? This blocks until it's closed.
+    :return: The figure
     """
     # CSET standard colors
     colors = ["#003DA6", "#7AC4A5", "#B53A6D", "#F17F4C", "#0B1F41"]
     # The color for the labels, CSET grey
     label_color = "#63676B"
-    prop = font_manager.FontProperties(fname=font_path, size=16)
+    prop = font_properties(font_path, 16)
     # We're hardcoding our figure size so everything fits nicely
-    plt.figure(figsize=(9, 8))
+    fig = plt.figure(figsize=(9, 8))
     ax = plt.axes()
     # Making the bar chart. We don't want bars that are quite as thick as the default.
     plt.bar(labels, nums, color=colors, width=0.6)
@@ -62,7 +63,9 @@ def make_chart(labels, nums, percent, font_path, output_file):
     ax.tick_params(axis='x', colors=label_color)
     ax.tick_params(axis='y', colors=label_color)
     plt.savefig(output_file)
-    plt.show()
+    if show:
+        plt.show()
+    return fig
 
 
 def main():
@@ -71,9 +74,10 @@ def main():
     parser.add_argument("output_file", type=str, help="An output file name to write the chart to.")
     parser.add_argument("font_path", type=str, help="The path on your system to the Roboto font.")
     parser.add_argument("-p", "--percent", action="store_true", help="If percent rather than raw counts, use this flag.")
+    parser.add_argument("--no-show", action="store_true", help="Just save the chart, without showing it.")
     args = parser.parse_args()
     labels, nums = read_data(args.input_csv, args.percent)
-    make_chart(labels, nums, args.percent, args.font_path, args.output_file)
+    make_chart(labels, nums, args.percent, args.font_path, args.output_file, show=not args.no_show)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,272 @@
+"""Match frames against a local extract of `gcp_cset_lexisnexis.raw_news`, without BigQuery.
+
+Input is JSONL or Parquet with one raw_news record per row (nested `source`, `author` and `semantics` fields as in
+BigQuery). The file is cut into batches of lines or Parquet row groups, and a process pool parses and matches each
+batch, so throughput scales with the number of workers. Only the hits come back to the parent process.
+
+Output has the columns and grain of the tables built in BigQuery: a table per frame with one row per matching article
+(as in `saving_killer_robots_frame_data.sql`), and an `article_entities` table with one row per named entity in each
+AI article (as in `article_entities.sql`).
+"""
+import argparse
+import json
+import os
+import re
+from collections import deque
+from datetime import date, datetime
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from frames import (AI_GATE, COUNTRY, EDITORIAL_RANKS, FIRST_YEAR, LANGUAGE, LAST_YEAR, SOURCE_CATEGORIES,
+                    article_text, load_frames)
+
+FRAME_TABLE_COLUMNS = ["id", "duplicateGroupId", "title", "url", "year", "source_name", "author"]
+ENTITY_TABLE = "article_entities"
+ENTITY_TABLE_COLUMNS = ["id", "duplicateGroupId", "semantic_info"]
+DEFAULT_BATCH_SIZE = 5_000
+
+# Compiled frames and AI test for this worker process, set by _init_worker
+_frames = None
+_ai_gate = None
+
+
+def read_batches(path: Union[str, Path], batch_size=DEFAULT_BATCH_SIZE) -> Iterator[Tuple[str, object]]:
+    """
+    Cut an article extract into units of work, without parsing it.
+    :param path: JSONL or Parquet file.
+    :param batch_size: Lines per JSONL batch. Parquet files are cut on row groups.
+    :return: Iterator of ``("jsonl", lines)`` or ``("parquet", (path, row_group))`` batches.
+    """
+    path = Path(path)
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+        for row_group in range(pq.ParquetFile(path).num_row_groups):
+            yield "parquet", (str(path), row_group)
+        return
+    with path.open("rb") as f:
+        lines = []
+        for line in f:
+            if line.strip():
+                lines.append(line)
+            if len(lines) == batch_size:
+                yield "jsonl", lines
+                lines = []
+        if lines:
+            yield "jsonl", lines
+
+
+def load_batch(batch: Tuple[str, object]) -> List[dict]:
+    """Parse a batch from :func:`read_batches` into raw_news records."""
+    kind, payload = batch
+    if kind == "parquet":
+        import pyarrow.parquet as pq
+        path, row_group = payload
+        # Table.to_pylist needs pyarrow 7
+        columns = pq.ParquetFile(path).read_row_group(row_group).to_pydict()
+        return [dict(zip(columns, values)) for values in zip(*columns.values())]
+    return [json.loads(line) for line in payload]
+
+
+def in_corpus(article: dict) -> bool:
+    """Python version of the analytic corpus WHERE clause shared by the frame queries."""
+    source = article.get("source") or {}
+    year = published_year(article.get("publishedDate"))
+    return (year is not None
+            and FIRST_YEAR <= year <= LAST_YEAR
+            and source.get("category") in SOURCE_CATEGORIES
+            and source.get("editorialRank") in EDITORIAL_RANKS
+            and article.get("language") == LANGUAGE
+            and (source.get("location") or {}).get("country") == COUNTRY
+            # As array_length(semantics.entities) > 0
+            and bool((article.get("semantics") or {}).get("entities")))
+
+
+def published_year(published_date) -> Optional[int]:
+    if published_date is None:
+        return None
+    if isinstance(published_date, (date, datetime)):
+        return published_date.year
+    return int(str(published_date)[:4])
+
+
+def frame_row(article: dict) -> dict:
+    """Select the frame table columns from a raw_news record."""
+    return {
+        "id": article.get("id"),
+        "duplicateGroupId": article.get("duplicateGroupId"),
+        "title": article.get("title"),
+        "url": article.get("url"),
+        "year": published_year(article.get("publishedDate")),
+        "source_name": (article.get("source") or {}).get("name"),
+        "author": (article.get("author") or {}).get("name"),
+    }
+
+
+def entity_rows(article: dict) -> List[dict]:
+    """Flatten an article's named entities the way ``cross join unnest(raw_news.semantics.entities)`` does."""
+    entities = (article.get("semantics") or {}).get("entities") or []
+    return [{"id": article.get("id"),
+             "duplicateGroupId": article.get("duplicateGroupId"),
+             "semantic_info": entity.get("properties") or []}
+            for entity in entities]
+
+
+def match_batch(batch: Tuple[str, object]) -> Tuple[int, Dict[str, List[dict]]]:
+    """
+    Match one batch against every frame. Runs in a worker process.
+    :param batch: A batch from :func:`read_batches`.
+    :return: The number of articles read, and table name -> output rows.
+    """
+    articles = load_batch(batch)
+    hits = {name: [] for name in [*_frames, ENTITY_TABLE]}
+    for article in articles:
+        if not in_corpus(article):
+            continue
+        texts = {}
+        source_name = (article.get("source") or {}).get("name")
+        for name, frame in _frames.items():
+            trim = frame.frame.trim_text
+            if trim not in texts:
+                texts[trim] = article_text(article.get("title"), article.get("subTitle"), article.get("content"), trim)
+            if frame.matches(texts[trim], source_name):
+                hits[name].append(frame_row(article))
+        # Trimming the text doesn't change whether it mentions AI
+        if _ai_gate.search(next(iter(texts.values()))):
+            hits[ENTITY_TABLE].extend(entity_rows(article))
+    return len(articles), hits
+
+
+def match_batches(batches: Iterator[Tuple[str, object]],
+                  frame_names: Optional[List[str]] = None,
+                  workers: Optional[int] = None) -> Iterator[Tuple[int, Dict[str, List[dict]]]]:
+    """
+    Match batches in a process pool, yielding results in input order.
+
+    At most a few batches per worker are in flight at once, so memory use doesn't grow with the size of the input.
+    :param batches: Batches from :func:`read_batches`.
+    :param frame_names: Frames to match. Defaults to all frames.
+    :param workers: Number of worker processes. Defaults to the number of CPUs.
+    :return: Iterator of :func:`match_batch` results.
+    """
+    workers = workers or os.cpu_count()
+    with Pool(workers, initializer=_init_worker, initargs=(frame_names,)) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.apply_async(match_batch, (batch,)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def match_file(input_path: Union[str, Path],
+               output_dir: Union[str, Path],
+               frame_names: Optional[List[str]] = None,
+               workers: Optional[int] = None,
+               batch_size=DEFAULT_BATCH_SIZE,
+               output_format="jsonl") -> Dict[str, int]:
+    """
+    Match every frame against an article extract and write a table per frame, plus the entity table.
+    :param input_path: JSONL or Parquet raw_news extract.
+    :param output_dir: Directory for the output, written as ``<table>.jsonl`` or ``<table>.parquet``.
+    :param frame_names: Frames to match. Defaults to all frames.
+    :param workers: Number of worker processes. Defaults to the number of CPUs.
+    :param batch_size: Lines per JSONL batch.
+    :param output_format: ``"jsonl"`` or ``"parquet"``.
+    :return: Table name -> number of rows written.
+    """
+    frame_names = frame_names or list(load_frames())
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    tables = [*frame_names, ENTITY_TABLE]
+    writers = {name: _writer(output_dir / f"{name}.{output_format}", output_format, name == ENTITY_TABLE)
+               for name in tables}
+    counts = dict.fromkeys(tables, 0)
+    n_articles = 0
+    try:
+        for n, hits in match_batches(read_batches(input_path, batch_size), frame_names, workers):
+            n_articles += n
+            for name, rows in hits.items():
+                if rows:
+                    writers[name].write(rows)
+                    counts[name] += len(rows)
+    finally:
+        for writer in writers.values():
+            writer.close()
+    print(f"Matched {n_articles} articles: " + ", ".join(f"{name} {count} rows" for name, count in counts.items()))
+    return counts
+
+
+def _init_worker(frame_names: Optional[List[str]]):
+    global _frames, _ai_gate
+    _frames = {name: frame.compile() for name, frame in load_frames(frame_names).items()}
+    _ai_gate = re.compile(AI_GATE, re.ASCII)
+
+
+class _JsonlWriter:
+
+    def __init__(self, path: Path):
+        self.f = path.open("w")
+
+    def write(self, rows: List[dict]):
+        self.f.writelines(json.dumps(row, default=str) + "\n" for row in rows)
+
+    def close(self):
+        self.f.close()
+
+
+class _ParquetWriter:
+
+    def __init__(self, path: Path, entities=False):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa = pa
+        if entities:
+            self.schema = pa.schema([
+                ("id", pa.string()),
+                ("duplicateGroupId", pa.string()),
+                ("semantic_info", pa.list_(pa.struct([("name", pa.string()), ("value", pa.string())]))),
+            ])
+        else:
+            self.schema = pa.schema([
+                ("id", pa.string()),
+                ("duplicateGroupId", pa.string()),
+                ("title", pa.string()),
+                ("url", pa.string()),
+                ("year", pa.int64()),
+                ("source_name", pa.string()),
+                ("author", pa.string()),
+            ])
+        self.writer = pq.ParquetWriter(str(path), self.schema)
+
+    def write(self, rows: List[dict]):
+        columns = {name: [row.get(name) for row in rows] for name in self.schema.names}
+        self.writer.write_table(self.pa.Table.from_pydict(columns, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def _writer(path: Path, output_format: str, entities=False):
+    if output_format == "parquet":
+        return _ParquetWriter(path, entities)
+    if output_format == "jsonl":
+        return _JsonlWriter(path)
+    raise ValueError(f"Unknown output format {output_format}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input_path", type=str, help="A JSONL or Parquet extract of raw_news.")
+    parser.add_argument("output_dir", type=str, help="A directory for writing a table per frame.")
+    parser.add_argument("-f", "--frames", nargs="+", help="The frames to match. Defaults to all of them.")
+    parser.add_argument("-w", "--workers", type=int, help="Number of worker processes. Defaults to the CPU count.")
+    parser.add_argument("-b", "--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Lines per JSONL batch.")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl", help="Output file format.")
+    args = parser.parse_args()
+    match_file(args.input_path, args.output_dir, args.frames, args.workers, args.batch_size, args.format)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""Overlaps between frames, from packed bitsets of each frame's articles.
+
+How many articles are in both competition and killer_robots, in a given year or at all, is otherwise a join between
+frame tables. Here the duplicateGroupIds of every article in any frame are downloaded from frame_membership once and
+numbered in a shared dictionary, and each frame becomes a packed bit array with one bit per duplicateGroupId, overall
+and per year. The articles in several frames at once are then a bitwise AND of their arrays, and counting them is a
+popcount: a million articles are 125 KB per frame, so every pairwise and higher-order overlap, Jaccard index and
+per-year intersection of the frames takes milliseconds.
+
+Counts are of distinct duplicateGroupIds, like the summaries in main.py; a year's count is of the duplicate groups
+with an article in the frame in that year. Results are saved to ``analysis/frame_overlap_<kind>_<date>.csv``.
+
+    python3 frame_overlap.py [--frames competition killer_robots] [--max-order 4] [--local [<dir>]]
+"""
+import argparse
+from itertools import combinations
+from typing import Dict, Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from bq import read_query
+from frames import load_frames
+from settings import DATASET_ID, LOCAL_DATA_DIR, PROJECT_ID
+
+OVERLAP_TABLE_NAME = "frame_overlap"
+# Separates frame names in the frames column of the results
+FRAME_SEPARATOR = " & "
+
+# Number of set bits in each byte value
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class FrameSets:
+    """Each frame's articles as packed bit arrays over a shared dictionary of duplicateGroupIds."""
+
+    def __init__(self, frames: Sequence[str], groups: np.ndarray, years: np.ndarray, bits: np.ndarray,
+                 year_bits: np.ndarray):
+        """
+        :param frames: Frame names.
+        :param groups: duplicateGroupId of each bit position.
+        :param years: Sorted years.
+        :param bits: Packed bits of each frame's duplicate groups, of shape ``(frames, bytes)``.
+        :param year_bits: Packed bits of each frame's duplicate groups per year, of shape ``(frames, years, bytes)``.
+        """
+        self.frames = list(frames)
+        self.groups = groups
+        self.years = years
+        self.bits = bits
+        self.year_bits = year_bits
+        self._index = {frame: i for i, frame in enumerate(self.frames)}
+
+    @classmethod
+    def from_articles(cls, articles: pd.DataFrame, frames: Sequence[str]) -> "FrameSets":
+        """
+        :param articles: ``duplicateGroupId``, ``year`` and a boolean column per frame, one row per article.
+        :param frames: Frame columns.
+        :return: Frame sets.
+        """
+        codes, groups = pd.factorize(articles["duplicateGroupId"], sort=True)
+        # A NULL duplicateGroupId is coded -1, which would set the last group's bit; COUNT(DISTINCT) skips NULLs too
+        has_group = codes >= 0
+        articles = articles[has_group]
+        codes = codes[has_group]
+        has_year = articles["year"].notna().to_numpy()
+        years = np.unique(articles["year"][has_year].to_numpy(np.int64))
+        year_positions = np.searchsorted(years, articles["year"][has_year].to_numpy(np.int64))
+        bits = []
+        year_bits = []
+        for frame in frames:
+            in_frame = articles[frame].fillna(False).to_numpy(bool)
+            members = np.zeros(len(groups), dtype=bool)
+            members[codes[in_frame]] = True
+            bits.append(np.packbits(members))
+            year_members = np.zeros((len(years), len(groups)), dtype=bool)
+            in_frame = in_frame[has_year]
+            year_members[year_positions[in_frame], codes[has_year][in_frame]] = True
+            year_bits.append(np.packbits(year_members, axis=1))
+        n_bytes = (len(groups) + 7) // 8
+        return cls(frames, np.asarray(groups), years,
+                   np.array(bits, dtype=np.uint8).reshape(len(frames), n_bytes),
+                   np.array(year_bits, dtype=np.uint8).reshape(len(frames), len(years), n_bytes))
+
+    def count(self, frames: Sequence[str], year: Optional[int] = None) -> int:
+        """
+        :param frames: Frame names.
+        :param year: If given, count only duplicate groups with an article in every frame in this year.
+        :return: Number of duplicate groups in every one of the frames.
+        """
+        return int(_popcount(self._intersect(frames, year)))
+
+    def members(self, frames: Sequence[str], year: Optional[int] = None) -> np.ndarray:
+        """
+        :param frames: Frame names.
+        :param year: If given, only duplicate groups with an article in every frame in this year.
+        :return: duplicateGroupIds in every one of the frames.
+        """
+        positions = np.flatnonzero(np.unpackbits(self._intersect(frames, year))[:len(self.groups)])
+        return self.groups[positions]
+
+    def pairwise(self) -> pd.DataFrame:
+        """
+        :return: Frames by frames matrix of the number of duplicate groups in both; the diagonal is each frame's size.
+        """
+        both = _popcount(self.bits[:, None, :] & self.bits[None, :, :])
+        return pd.DataFrame(both, index=pd.Index(self.frames, name="frame"), columns=self.frames)
+
+    def jaccard(self) -> pd.DataFrame:
+        """
+        :return: Frames by frames matrix of the Jaccard index, the share of the duplicate groups in either frame that
+            are in both.
+        """
+        both = self.pairwise().to_numpy()
+        sizes = np.diag(both)
+        either = sizes[:, None] + sizes[None, :] - both
+        with np.errstate(invalid="ignore", divide="ignore"):
+            jaccard = np.where(either > 0, both / either, 0.0)
+        return pd.DataFrame(jaccard, index=pd.Index(self.frames, name="frame"), columns=self.frames)
+
+    def overlaps(self, min_order: int = 2, max_order: Optional[int] = None) -> pd.DataFrame:
+        """
+        Number of duplicate groups in every frame of each combination of frames.
+        :param min_order: Fewest frames in a combination.
+        :param max_order: Most frames in a combination. Defaults to all of them.
+        :return: ``frames``, ``order`` (the number of frames) and ``count``, largest overlaps of each order first.
+        """
+        rows = [(FRAME_SEPARATOR.join(combination), len(combination), self.count(combination))
+                for combination in self._combinations(min_order, max_order)]
+        df = pd.DataFrame(rows, columns=["frames", "order", "count"])
+        return df.sort_values(["order", "count"], ascending=[True, False], kind="mergesort", ignore_index=True)
+
+    def by_year(self, min_order: int = 1, max_order: Optional[int] = 2) -> pd.DataFrame:
+        """
+        Per-year number of duplicate groups in every frame of each combination of frames.
+        :param min_order: Fewest frames in a combination; 1 includes each frame's own count.
+        :param max_order: Most frames in a combination. ``None`` for all of them.
+        :return: ``year``, ``frames``, ``order`` and ``count``.
+        """
+        frames = []
+        counts = []
+        for combination in self._combinations(min_order, max_order):
+            rows = [self._index[frame] for frame in combination]
+            frames.append(FRAME_SEPARATOR.join(combination))
+            # Every year at once: (years, bytes) -> (years,)
+            counts.append(_popcount(np.bitwise_and.reduce(self.year_bits[rows], axis=0)))
+        counts = np.array(counts, dtype=np.int64).reshape(len(frames), len(self.years))
+        orders = [frame.count(FRAME_SEPARATOR) + 1 for frame in frames]
+        return pd.DataFrame({
+            "year": np.tile(self.years, len(frames)),
+            "frames": np.repeat(frames, len(self.years)),
+            "order": np.repeat(orders, len(self.years)),
+            "count": counts.ravel(),
+        })
+
+    def _intersect(self, frames: Sequence[str], year: Optional[int] = None) -> np.ndarray:
+        unknown = [frame for frame in frames if frame not in self._index]
+        if unknown or not frames:
+            raise ValueError(f"Unknown frames: {', '.join(unknown)}" if unknown else "No frames to intersect")
+        rows = [self._index[frame] for frame in frames]
+        if year is None:
+            return np.bitwise_and.reduce(self.bits[rows], axis=0)
+        year_position = np.searchsorted(self.years, year)
+        if year_position == len(self.years) or self.years[year_position] != year:
+            return np.zeros(self.bits.shape[1], dtype=np.uint8)
+        return np.bitwise_and.reduce(self.year_bits[rows, year_position], axis=0)
+
+    def _combinations(self, min_order: int, max_order: Optional[int]) -> Iterable[tuple]:
+        max_order = len(self.frames) if max_order is None else min(max_order, len(self.frames))
+        for order in range(max(min_order, 1), max_order + 1):
+            yield from combinations(self.frames, order)
+
+
+def overlap_sql(frames: Sequence[str]) -> str:
+    """Query for the duplicateGroupId, year and frame flags of every article in any of the frames."""
+    return f"""\
+    SELECT
+      duplicateGroupId,
+      year,
+      {", ".join(frames)}
+    FROM
+      `{PROJECT_ID}.{DATASET_ID}.frame_membership`
+    WHERE
+      {" OR ".join(frames)}
+    """
+
+
+def load_frame_sets(frames: Optional[Iterable[str]] = None) -> FrameSets:
+    """
+    Download the frames' articles from frame_membership and encode them as bitsets.
+    :param frames: Frames to compare. Defaults to every frame in the frame spec.
+    :return: Frame sets.
+    """
+    frames = list(frames or load_frames())
+    articles = read_query(overlap_sql(frames), step=OVERLAP_TABLE_NAME).to_pandas()
+    return FrameSets.from_articles(articles, frames)
+
+
+def save_overlaps(sets: FrameSets, max_order: Optional[int] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Compute and save every overlap summary, the same way main.py saves its summaries.
+    :param sets: Frame sets.
+    :param max_order: Most frames in a combination. Defaults to all of them.
+    :return: Summary name -> result.
+    """
+    # main imports the BigQuery client setup, so only when saving
+    from main import save_summary
+    results = {
+        "pairwise": sets.pairwise().reset_index(),
+        "jaccard": sets.jaccard().reset_index(),
+        "combinations": sets.overlaps(max_order=max_order),
+        "by_year": sets.by_year(max_order=max_order),
+    }
+    for name, df in results.items():
+        save_summary(df, OVERLAP_TABLE_NAME, name)
+    return results
+
+
+def _popcount(packed: np.ndarray) -> np.ndarray:
+    # Bits set along the last axis
+    return _POPCOUNT[packed].sum(axis=-1, dtype=np.int64)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", nargs="*", help="Frames to compare. Defaults to every frame in the frame spec.")
+    parser.add_argument("--max-order", type=int, help="Most frames in a combination. Defaults to all of them.")
+    parser.add_argument("--local", type=str, nargs="?", const=str(LOCAL_DATA_DIR),
+                        help="Query the local Parquet tables in this directory instead of BigQuery.")
+    args = parser.parse_args()
+    if args.local is not None:
+        from backends import LocalBackend
+        from bq import set_backend
+        set_backend(LocalBackend(args.local))
+    sets = load_frame_sets(args.frames)
+    results = save_overlaps(sets, args.max_order)
+    print(f"{len(sets.groups)} duplicate groups in {len(sets.frames)} frames")
+    with pd.option_context("display.width", 200):
+        print(results["pairwise"].to_string(index=False))
+        print(results["jaccard"].round(3).to_string(index=False))
+        print(results["combinations"].to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
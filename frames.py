@@ -0,0 +1,216 @@
+"""Frame keyword definitions, read from `./data/frames.yaml`.
+
+The YAML spec is the source of truth: frame_compiler.py generates frame_membership.sql from it, and
+:class:`CompiledFrame` matches articles in Python with the same patterns, so the two can't drift apart.
+"""
+import ast
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Pattern, Tuple, Union
+
+import yaml
+
+from settings import SQL_DIR
+
+# Every frame's keywords, gate, hit condition and exclusions
+FRAME_SPEC = SQL_DIR / "frames.yaml"
+
+# The analytic corpus, shared by every frame query
+FIRST_YEAR = 2012
+LAST_YEAR = 2020
+SOURCE_CATEGORIES = ("Press Wire", "National", "Trade")
+EDITORIAL_RANKS = (1, 2)
+LANGUAGE = "English"
+COUNTRY = "United States"
+# The AI mention test for the artificial_intelligence table
+AI_GATE = r"\bai\b|artificial intelligence\b"
+
+EXCLUSION_COLUMNS = ("source_name", "text")
+EXCLUSION_OPERATORS = ("not like", "!=")
+
+
+@dataclass
+class Frame:
+    """A frame's matching rules, as written in the frame spec."""
+    name: str
+    # Keyword name -> regexes that are OR'd together to set it
+    keywords: Dict[str, List[str]]
+    # Every frame requires a mention of AI somewhere in the text
+    gate: str
+    # Boolean expression over keyword names, e.g. "sputnik or (ai_conflict or conflict_ai)"
+    condition: str
+    # (column, operator, value) triples, e.g. ("text", "not like", "%indiebound.org%")
+    exclusions: List[Tuple[str, str, str]] = field(default_factory=list)
+    # Whether the query trims whitespace around the concatenated text
+    trim_text: bool = False
+    # Prefix of the keyword names in frame_membership.sql
+    prefix: Optional[str] = None
+
+    def compile(self) -> "CompiledFrame":
+        return CompiledFrame(self)
+
+
+class CompiledFrame:
+    """A :class:`Frame` with its regexes compiled, ready to match article text."""
+
+    def __init__(self, frame: Frame):
+        self.frame = frame
+        self.name = frame.name
+        # RE2's \b and \w are ASCII-only
+        self.gate = re.compile(frame.gate, re.ASCII)
+        self.keywords = {name: [re.compile(p, re.ASCII) for p in patterns]
+                         for name, patterns in frame.keywords.items()}
+        self.condition = _parse_condition(frame.condition, set(frame.keywords))
+        self.exclusions = [(column, _exclusion_test(op, value)) for column, op, value in frame.exclusions]
+
+    def keyword_hit(self, name: str, text: str) -> bool:
+        return any(p.search(text) for p in self.keywords[name])
+
+    def matches(self, text: str, source_name: Optional[str] = None) -> bool:
+        """
+        Test whether an article is in the frame.
+        :param text: Lowercased title, subtitle and content, as built by :func:`article_text`.
+        :param source_name: The publisher name, for source exclusions.
+        :return: ``True`` if the article is a hit.
+        """
+        if not self.gate.search(text):
+            return False
+        values = {"text": text, "source_name": source_name}
+        if any(excluded(values[column]) for column, excluded in self.exclusions):
+            return False
+        # Keywords are only evaluated as far as the condition needs them
+        return _evaluate(self.condition, lambda name: self.keyword_hit(name, text))
+
+
+def article_text(title: Optional[str], sub_title: Optional[str], content: Optional[str], trim=False) -> str:
+    """Python version of ``lower(coalesce(title, "") || " " || coalesce(subTitle, "") || " " || coalesce(content, ""))``."""
+    text = f"{title or ''} {sub_title or ''} {content or ''}".lower()
+    return text.strip() if trim else text
+
+
+def parse_frame(name: str, spec: dict) -> Frame:
+    """
+    Build a frame from its entry in the frame spec.
+    :param name: Frame name.
+    :param spec: The frame's entry, as described in `./data/frames.yaml`.
+    :return: Frame definition.
+    :raises: :class:`ValueError` if the entry has no keywords, or an unknown keyword or exclusion.
+    """
+    keywords = {keyword: _keyword_patterns(keyword, value) for keyword, value in (spec.get("keywords") or {}).items()}
+    if not keywords:
+        raise ValueError(f"{name} has no keywords")
+    exclusions = []
+    for column, op, value in spec.get("exclusions") or []:
+        op = " ".join(op.lower().split())
+        if column not in EXCLUSION_COLUMNS or op not in EXCLUSION_OPERATORS:
+            raise ValueError(f"Unsupported exclusion in {name}: {column} {op} {value!r}")
+        exclusions.append((column, op, value))
+    frame = Frame(name=name,
+                  keywords=keywords,
+                  gate=spec.get("gate", AI_GATE),
+                  condition=" ".join(spec.get("condition", " or ".join(keywords)).split()),
+                  exclusions=exclusions,
+                  trim_text=spec.get("trim_text", False),
+                  prefix=spec.get("prefix", name))
+    # Fail on a bad condition here rather than at matching time
+    _parse_condition(frame.condition, set(keywords))
+    return frame
+
+
+def near_pattern(terms: List[str], within: int, ordered=True) -> List[str]:
+    """
+    Regexes for a proximity test.
+    :param terms: Regexes that must each follow the one before within ``within`` characters.
+    :param within: Maximum number of characters between consecutive terms.
+    :param ordered: If ``False``, two terms may also appear the other way round.
+    :return: Regexes any of which passes the test.
+    """
+    if not ordered and len(terms) != 2:
+        raise ValueError("Only two terms can be matched in either order")
+    orders = [terms] if ordered else [terms, terms[::-1]]
+    gap = f".{{0,{within}}}"
+    return [gap.join(f"(?:{term})" if "|" in term else term for term in order) for order in orders]
+
+
+@lru_cache(maxsize=None)
+def load_spec(path: Union[str, Path] = FRAME_SPEC) -> Dict[str, Frame]:
+    """
+    Read every frame from the frame spec.
+    :param path: Frame spec YAML.
+    :return: Frame name -> definition, in spec order.
+    """
+    with open(path) as f:
+        spec = yaml.safe_load(f)
+    return {name: parse_frame(name, frame_spec) for name, frame_spec in spec["frames"].items()}
+
+
+def load_frame(name: str) -> Frame:
+    """
+    Read a frame's definition from the frame spec.
+    :param name: Frame name.
+    :return: Frame definition.
+    """
+    try:
+        return load_spec()[name]
+    except KeyError:
+        raise ValueError(f"{name} isn't a frame in {FRAME_SPEC.name}") from None
+
+
+def load_frames(names: Optional[List[str]] = None) -> Dict[str, Frame]:
+    frames = load_spec()
+    return {name: load_frame(name) for name in (names or frames)}
+
+
+def _keyword_patterns(keyword: str, value) -> List[str]:
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, list):
+        return [str(pattern) for pattern in value]
+    if isinstance(value, dict) and "near" in value and "within" in value:
+        return near_pattern(value["near"], int(value["within"]), value.get("ordered", True))
+    raise ValueError(f"Keyword {keyword} must be a regex, a list of regexes, or a near/within proximity test")
+
+
+def _parse_condition(condition: str, names: set) -> ast.expr:
+    expression = re.sub(r"\bkeywords\.", "", condition).lower()
+    tree = ast.parse(" ".join(expression.split()), mode="eval").body
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            if node.id not in names:
+                raise ValueError(f"Hit condition references unknown keyword {node.id}")
+        elif not isinstance(node, (ast.BoolOp, ast.And, ast.Or, ast.Load)):
+            raise ValueError(f"Unsupported hit condition: {condition}")
+    return tree
+
+
+def _evaluate(node: ast.expr, hit: Callable[[str], bool]) -> bool:
+    if isinstance(node, ast.BoolOp):
+        if isinstance(node.op, ast.And):
+            return all(_evaluate(value, hit) for value in node.values)
+        return any(_evaluate(value, hit) for value in node.values)
+    return hit(node.id)
+
+
+def _exclusion_test(op: str, value: str) -> Callable[[Optional[str]], bool]:
+    # Comparisons against NULL aren't true in SQL, so the WHERE clause drops those rows too
+    if op == "!=":
+        return lambda x: x is None or x == value
+    # LIKE: % is any run of characters, _ is any single character, backslash escapes
+    regex = ""
+    i = 0
+    while i < len(value):
+        char = value[i]
+        if char == "\\" and i + 1 < len(value):
+            i += 1
+            regex += re.escape(value[i])
+        elif char == "%":
+            regex += ".*"
+        elif char == "_":
+            regex += "."
+        else:
+            regex += re.escape(char)
+        i += 1
+    pattern: Pattern = re.compile(regex, re.DOTALL)
+    return lambda x: x is None or pattern.fullmatch(x) is not None
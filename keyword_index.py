@@ -0,0 +1,507 @@
+"""A positional inverted index over the AI article set, for trying out frame keywords without rescanning every article.
+
+The text of every article in ``frame_membership`` (which is the ``artificial_intelligence`` set) is tokenized once
+into runs of ASCII letters and digits. For each term the index keeps the articles it occurs in, its token position and
+its character offset, as flat NumPy arrays that are memory-mapped on load, next to the article texts themselves.
+
+A keyword regex is answered in two steps. First the index finds candidate articles: each literal the regex requires
+(see :func:`frame_compiler.required_literals`) is looked up as a term, a term prefix or suffix, or a phrase of
+consecutive terms, and the parts of a proximity rule like ``\\b(ai|artificial intelligence).{0,20}arms race\\b`` are
+joined on their character offsets. The candidates are a superset of the matches, and usually a small one, so the
+regex is then run on just those texts to get exactly the articles BigQuery's ``REGEXP_CONTAINS`` would. Frames are
+evaluated the same way, keyword by keyword, so a changed keyword can be checked in seconds:
+
+    python3 keyword_index.py --frame competition
+    python3 keyword_index.py "\\bsputnik\\b" "arms race"
+"""
+import argparse
+import ast
+import json
+import re
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from frame_compiler import required_literals
+from frames import AI_GATE, Frame, load_frames
+from mmap_store import load_array, load_bytes, pack, write_atomic
+from settings import DATASET_ID, KEYWORD_INDEX_DIR, PROJECT_ID
+
+SOURCE_TABLE = f"{DATASET_ID}.frame_membership"
+# Articles tokenized at a time while building
+BUILD_CHUNK_SIZE = 10_000
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+# A top-level gap in a pattern: .{0,20}, .{2,}, .* or .+
+_GAP_RE = re.compile(r"\.(?:\{(\d+),(\d*)\}|\*|\+)\??")
+
+
+class Postings(NamedTuple):
+    """Occurrences of a term, phrase or proximity match: article, first and last token position, and character span."""
+    doc: np.ndarray
+    first: np.ndarray
+    last: np.ndarray
+    start: np.ndarray
+    end: np.ndarray
+
+    def docs(self) -> np.ndarray:
+        """Distinct articles, sorted."""
+        return np.unique(self.doc)
+
+
+class KeywordIndex:
+    """A memory-mapped positional index of article text."""
+
+    def __init__(self, directory: Union[str, Path]):
+        """
+        :param directory: Directory of one index version, as written by :func:`write_index`.
+        """
+        self.directory = Path(directory)
+        self.manifest = json.loads((self.directory / "manifest.json").read_text())
+        terms = (self.directory / "terms.txt").read_text().split("\n") if self.manifest["terms"] else []
+        self.terms = np.array(terms, dtype=str)
+        self.term_offsets = load_array(self.directory / "term_offsets.npy")
+        self.posting_doc = load_array(self.directory / "posting_doc.npy")
+        self.posting_position = load_array(self.directory / "posting_position.npy")
+        self.posting_start = load_array(self.directory / "posting_start.npy")
+        self.ids = load_bytes(self.directory / "ids.bin")
+        self.id_offsets = load_array(self.directory / "id_offsets.npy")
+        self.group_ids = load_bytes(self.directory / "group_ids.bin")
+        self.group_id_offsets = load_array(self.directory / "group_id_offsets.npy")
+        self.texts = load_bytes(self.directory / "texts.bin")
+        self.text_offsets = load_array(self.directory / "text_offsets.npy")
+        self.source_codes = load_array(self.directory / "source_codes.npy")
+        self.sources = json.loads((self.directory / "sources.json").read_text())
+        self._term_lengths = np.char.str_len(self.terms).astype(np.int32)
+
+    @property
+    def version(self) -> str:
+        return self.manifest["version"]
+
+    def __len__(self):
+        return len(self.id_offsets) - 1
+
+    def text(self, doc: int) -> str:
+        return self.texts[self.text_offsets[doc]:self.text_offsets[doc + 1]].tobytes().decode()
+
+    def source_name(self, doc: int) -> Optional[str]:
+        code = self.source_codes[doc]
+        return self.sources[code] if code >= 0 else None
+
+    def article_ids(self, docs: np.ndarray) -> List[str]:
+        return [self.ids[self.id_offsets[d]:self.id_offsets[d + 1]].tobytes().decode() for d in docs]
+
+    def duplicate_group_ids(self, docs: np.ndarray) -> List[str]:
+        """Distinct duplicateGroupIds of some articles."""
+        return sorted({self.group_ids[self.group_id_offsets[d]:self.group_id_offsets[d + 1]].tobytes().decode()
+                       for d in docs})
+
+    def term(self, term: str) -> Postings:
+        """Occurrences of exactly this term."""
+        i = np.searchsorted(self.terms, term)
+        return self._postings([i] if i < len(self.terms) and self.terms[i] == term else [])
+
+    def prefix(self, prefix: str) -> Postings:
+        """Occurrences of every term starting with ``prefix``."""
+        low = np.searchsorted(self.terms, prefix)
+        high = np.searchsorted(self.terms, prefix + "\x7f")
+        return self._postings(range(low, high))
+
+    def suffix(self, suffix: str) -> Postings:
+        """Occurrences of every term ending with ``suffix``."""
+        return self._postings(self._matching_terms("suffix", suffix))
+
+    def containing(self, fragment: str) -> Postings:
+        """Occurrences of every term containing ``fragment``."""
+        return self._postings(self._matching_terms("containing", fragment))
+
+    def phrase(self, literal: str) -> Optional[Postings]:
+        """
+        Candidate occurrences of a literal string: its terms in consecutive positions, where the first term may end a
+        longer term and the last may start one if the literal starts or ends mid-word.
+        :param literal: Lowercase text.
+        :return: Postings spanning each candidate, or ``None`` if the literal has no letters or digits to look up.
+        """
+        tokens = _TOKEN_RE.findall(literal)
+        if not tokens:
+            return None
+        open_start = _TOKEN_RE.match(literal) is not None
+        open_end = _TOKEN_RE.fullmatch(literal[-1]) is not None
+        if len(tokens) == 1:
+            if open_start and open_end:
+                return self.containing(tokens[0])
+            if open_start:
+                return self.suffix(tokens[0])
+            return self.prefix(tokens[0]) if open_end else self.term(tokens[0])
+        postings = self.suffix(tokens[0]) if open_start else self.term(tokens[0])
+        for i, token in enumerate(tokens[1:], 1):
+            following = self.prefix(token) if open_end and i == len(tokens) - 1 else self.term(token)
+            postings = _consecutive(postings, following)
+        return postings
+
+    def near(self, left: Postings, right: Postings, within: Optional[int]) -> Postings:
+        """
+        Occurrences of ``left`` followed by ``right`` within ``within`` characters, as in ``left.{0,within}right``.
+        Offsets are those of whole terms, so this may include a few pairs the regex wouldn't match, but never misses
+        one.
+        :param within: Maximum gap in characters, or ``None`` for any gap.
+        :return: Postings spanning from each ``left`` occurrence to its nearest following ``right``.
+        """
+        if not len(left.doc) or not len(right.doc):
+            return _EMPTY
+        order = np.lexsort((right.start, right.doc))
+        right_keys = _key(right.doc[order], right.start[order])
+        # The first right occurrence at or after each left one, in the same article
+        i = np.searchsorted(right_keys, _key(left.doc, left.start))
+        found = i < len(right_keys)
+        nearest = order[np.minimum(i, len(order) - 1)]
+        found &= right.doc[nearest] == left.doc
+        if within is not None:
+            found &= right.start[nearest] - left.end <= within
+        nearest = nearest[found]
+        return Postings(left.doc[found], left.first[found], right.last[nearest], left.start[found], right.end[nearest])
+
+    def candidates(self, pattern: str) -> np.ndarray:
+        """
+        Articles that might match a regex: every match is among them.
+        :param pattern: Regex over lowercased text.
+        :return: Sorted article numbers.
+        """
+        branches = _split_top_level(pattern, "|")
+        docs = []
+        for branch in branches:
+            branch_docs = self._branch_candidates(branch)
+            if branch_docs is None:
+                return np.arange(len(self))
+            docs.append(branch_docs)
+        return np.unique(np.concatenate(docs)) if docs else np.arange(len(self))
+
+    def search(self, patterns: Union[str, List[str]]) -> np.ndarray:
+        """
+        Articles matching any of some regexes, as ``REGEXP_CONTAINS`` would find them.
+        :param patterns: Regexes over lowercased text.
+        :return: Sorted article numbers.
+        """
+        patterns = [patterns] if isinstance(patterns, str) else patterns
+        # RE2's \b and \w are ASCII-only
+        regex = re.compile("|".join(f"(?:{p})" for p in patterns), re.ASCII)
+        docs = np.unique(np.concatenate([self.candidates(p) for p in patterns]))
+        return docs[np.fromiter((regex.search(self.text(d)) is not None for d in docs), dtype=bool, count=len(docs))]
+
+    def keyword_hits(self, frame: Frame) -> Dict[str, np.ndarray]:
+        """Articles matching each of a frame's keywords."""
+        return {name: self.search(patterns) for name, patterns in frame.keywords.items()}
+
+    def frame_members(self, frame: Frame) -> np.ndarray:
+        """
+        Articles in a frame: passing its gate and exclusions, with keywords satisfying its hit condition.
+        :param frame: Frame definition.
+        :return: Sorted article numbers.
+        """
+        compiled = frame.compile()
+        hits = {}
+
+        def evaluate(node) -> np.ndarray:
+            if isinstance(node, ast.Name):
+                if node.id not in hits:
+                    hits[node.id] = self.search(frame.keywords[node.id])
+                return hits[node.id]
+            values = [evaluate(value) for value in node.values]
+            combine = np.intersect1d if isinstance(node.op, ast.And) else np.union1d
+            result = values[0]
+            for value in values[1:]:
+                result = combine(result, value)
+            return result
+
+        docs = evaluate(compiled.condition)
+        # Every indexed article passed the AI test already
+        if frame.gate != AI_GATE:
+            docs = docs[np.array([compiled.gate.search(self.text(d)) is not None for d in docs], dtype=bool)]
+        if compiled.exclusions:
+            keep = [not any(excluded({"text": self.text(d), "source_name": self.source_name(d)}[column])
+                            for column, excluded in compiled.exclusions) for d in docs]
+            docs = docs[np.array(keep, dtype=bool)]
+        return docs
+
+    def _branch_candidates(self, pattern: str) -> Optional[np.ndarray]:
+        # A chain of segments separated by gaps; each segment must contain one of its literals
+        segments = []
+        for segment, within in _split_gaps(pattern):
+            literals = required_literals(segment)
+            postings = None
+            if literals:
+                found = [self.phrase(literal) for literal in literals]
+                if all(p is not None for p in found):
+                    postings = _concat(found)
+            segments.append((postings, within))
+        if all(postings is not None for postings, _ in segments):
+            chain, _ = segments[0]
+            for postings, within in segments[1:]:
+                chain = self.near(chain, postings, within)
+            return chain.docs()
+        # Without every segment's position, fall back on articles containing every segment that could be looked up
+        known = [postings.docs() for postings, _ in segments if postings is not None]
+        if not known:
+            return None
+        docs = known[0]
+        for other in known[1:]:
+            docs = np.intersect1d(docs, other)
+        return docs
+
+    def _matching_terms(self, kind: str, fragment: str) -> np.ndarray:
+        if kind == "suffix":
+            return np.flatnonzero(np.char.endswith(self.terms, fragment))
+        return np.flatnonzero(np.char.find(self.terms, fragment) >= 0)
+
+    def _postings(self, term_ids) -> Postings:
+        ranges = [(self.term_offsets[i], self.term_offsets[i + 1]) for i in term_ids]
+        if not ranges:
+            return _EMPTY
+        index = np.concatenate([np.arange(low, high) for low, high in ranges])
+        lengths = np.concatenate([np.full(high - low, self._term_lengths[i], dtype=np.int32)
+                                  for i, (low, high) in zip(term_ids, ranges)])
+        position = self.posting_position[index]
+        start = self.posting_start[index]
+        return Postings(self.posting_doc[index], position, position, start, start + lengths)
+
+
+_EMPTY = Postings(*(np.zeros(0, dtype=np.int32) for _ in range(5)))
+
+
+def write_index(articles: pd.DataFrame, directory: Union[str, Path], version: str,
+                source: Optional[str] = None) -> KeywordIndex:
+    """
+    Tokenize articles and write an index.
+    :param articles: ``id``, ``duplicateGroupId``, ``source_name`` and ``text`` (lowercased) of each article.
+    :param directory: Index root. The index is written to ``<directory>/<version>`` and made current.
+    :param version: Index version.
+    :param source: Last-modified time of the source table, recorded in the manifest.
+    :return: The new index.
+    """
+    directory = Path(directory)
+    texts = articles["text"].fillna("").tolist()
+    vocabulary: Dict[str, int] = {}
+    term_ids, docs, positions, starts = [], [], [], []
+    for chunk_start in range(0, len(texts), BUILD_CHUNK_SIZE):
+        chunk = texts[chunk_start:chunk_start + BUILD_CHUNK_SIZE]
+        chunk_terms, chunk_docs, chunk_positions, chunk_starts = _tokenize(chunk)
+        codes, uniques = pd.factorize(pd.Series(chunk_terms, dtype=object))
+        # Chunk term codes -> vocabulary-wide term ids
+        mapping = np.array([vocabulary.setdefault(term, len(vocabulary)) for term in uniques], dtype=np.int32)
+        term_ids.append(mapping[codes] if len(codes) else np.zeros(0, dtype=np.int32))
+        docs.append(chunk_docs + chunk_start)
+        positions.append(chunk_positions)
+        starts.append(chunk_starts)
+    terms = np.array(list(vocabulary), dtype=object)
+    # Renumber terms in sorted order, so prefixes are ranges
+    sort = np.argsort(terms.astype(str), kind="stable")
+    rank = np.empty(len(terms), dtype=np.int32)
+    rank[sort] = np.arange(len(terms), dtype=np.int32)
+    term_ids = rank[np.concatenate(term_ids)] if term_ids else np.zeros(0, dtype=np.int32)
+    docs, positions, starts = (np.concatenate(a) if a else np.zeros(0, dtype=np.int32)
+                               for a in (docs, positions, starts))
+    order = np.lexsort((positions, docs, term_ids))
+    term_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(term_ids, minlength=len(terms)), out=term_offsets[1:])
+
+    source_codes, sources = pd.factorize(articles["source_name"])
+    version_dir = directory / version
+    version_dir.mkdir(parents=True, exist_ok=True)
+    (version_dir / "terms.txt").write_text("\n".join(terms[sort]))
+    np.save(version_dir / "term_offsets.npy", term_offsets)
+    np.save(version_dir / "posting_doc.npy", docs[order].astype(np.int32))
+    np.save(version_dir / "posting_position.npy", positions[order].astype(np.int32))
+    np.save(version_dir / "posting_start.npy", starts[order].astype(np.int32))
+    for name, values in (("ids", articles["id"]), ("group_ids", articles["duplicateGroupId"]), ("texts", texts)):
+        data, offsets = pack(np.asarray(values, dtype=object).astype(str))
+        (version_dir / f"{name}.bin").write_bytes(data)
+        np.save(version_dir / f"{name[:-1]}_offsets.npy", offsets)
+    np.save(version_dir / "source_codes.npy", source_codes.astype(np.int32))
+    (version_dir / "sources.json").write_text(json.dumps(list(sources)))
+    manifest = {
+        "version": version,
+        "source": source,
+        "articles": len(texts),
+        "terms": len(terms),
+        "postings": len(term_ids),
+        "built": datetime.now(timezone.utc).isoformat(),
+    }
+    (version_dir / "manifest.json").write_text(json.dumps(manifest, indent=2))
+    write_atomic(directory / "CURRENT", version)
+    return KeywordIndex(version_dir)
+
+
+def build_index(directory: Union[str, Path] = KEYWORD_INDEX_DIR) -> KeywordIndex:
+    """
+    Download the text of every AI article and write a new index version.
+    :param directory: Index root.
+    :return: The new index.
+    """
+    from bq import get_backend, read_query
+    source = get_backend().table_modified(SOURCE_TABLE)
+    articles = read_query(f"""\
+    SELECT
+      id,
+      duplicateGroupId,
+      source_name,
+      text
+    FROM
+      `{PROJECT_ID}.{SOURCE_TABLE}`
+    """, step="keyword index").to_pandas()
+    index = write_index(articles, directory, _version(source), source)
+    print(f"Built keyword index {index.version} with {len(index)} articles and {len(index.terms)} terms")
+    return index
+
+
+def load_index(directory: Union[str, Path] = KEYWORD_INDEX_DIR,
+               version: Optional[str] = None) -> Optional[KeywordIndex]:
+    """
+    Open an index version.
+    :param directory: Index root.
+    :param version: Version to open. Defaults to the current one.
+    :return: The index, or ``None`` if there isn't one.
+    """
+    directory = Path(directory)
+    if version is None:
+        try:
+            version = (directory / "CURRENT").read_text().strip()
+        except FileNotFoundError:
+            return None
+    if not (directory / version / "manifest.json").exists():
+        return None
+    return KeywordIndex(directory / version)
+
+
+@lru_cache(maxsize=None)
+def current_index(directory: Union[str, Path] = KEYWORD_INDEX_DIR) -> KeywordIndex:
+    """
+    Open the index for the current frame_membership table, building it if the table changed.
+    Checked once per process.
+    :param directory: Index root.
+    :return: The index.
+    """
+    from bq import get_backend
+    return load_index(directory, _version(get_backend().table_modified(SOURCE_TABLE))) or build_index(directory)
+
+
+def _version(source: Optional[str]) -> str:
+    return re.sub(r"[^0-9A-Za-z]", "", source or "unknown")
+
+
+def _tokenize(texts: List[str]):
+    # Token boundaries over the whole chunk at once; a separator character keeps texts from running together
+    joined = "\x00".join(texts)
+    chars = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32)
+    word = ((chars >= ord("a")) & (chars <= ord("z"))) | ((chars >= ord("0")) & (chars <= ord("9")))
+    edges = np.diff(np.concatenate(([False], word, [False])).astype(np.int8))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    text_starts = np.zeros(len(texts), dtype=np.int64)
+    np.cumsum([len(t) + 1 for t in texts[:-1]], out=text_starts[1:])
+    docs = (np.searchsorted(text_starts, starts, side="right") - 1).astype(np.int32)
+    first_token = np.searchsorted(docs, np.arange(len(texts)))
+    positions = (np.arange(len(starts)) - first_token[docs]).astype(np.int32)
+    terms = [joined[s:e] for s, e in zip(starts.tolist(), ends.tolist())]
+    return terms, docs, positions, (starts - text_starts[docs]).astype(np.int32)
+
+
+def _consecutive(left: Postings, right: Postings) -> Postings:
+    # Occurrences of right in the position after left ends, in the same article
+    right_keys = _key(right.doc, right.first)
+    order = np.argsort(right_keys, kind="stable")
+    right_keys = right_keys[order]
+    i = np.searchsorted(right_keys, _key(left.doc, left.last + 1))
+    found = (i < len(right_keys))
+    found[found] = right_keys[i[found]] == _key(left.doc[found], left.last[found] + 1)
+    following = order[i[found]]
+    return Postings(left.doc[found], left.first[found], right.last[following], left.start[found], right.end[following])
+
+
+def _concat(postings: List[Postings]) -> Postings:
+    return Postings(*(np.concatenate(arrays) for arrays in zip(*postings)))
+
+
+def _key(doc: np.ndarray, offset: np.ndarray) -> np.ndarray:
+    return (doc.astype(np.int64) << 32) | offset.astype(np.int64)
+
+
+def _split_top_level(pattern: str, separator: str) -> List[str]:
+    parts, depth, current, i = [], 0, "", 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\" and i + 1 < len(pattern):
+            current += pattern[i:i + 2]
+            i += 2
+            continue
+        if char == "[":
+            end = pattern.find("]", i + 2)
+            end = len(pattern) - 1 if end < 0 else end
+            current += pattern[i:end + 1]
+            i = end + 1
+            continue
+        depth += {"(": 1, ")": -1}.get(char, 0)
+        if char == separator and depth == 0:
+            parts.append(current)
+            current = ""
+        else:
+            current += char
+        i += 1
+    return parts + [current]
+
+
+def _split_gaps(pattern: str):
+    # Segments of a pattern between top-level gaps, each with the largest gap before the next segment
+    segments, depth, start, i = [], 0, 0, 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 2
+            continue
+        depth += {"(": 1, ")": -1}.get(char, 0)
+        gap = _GAP_RE.match(pattern, i) if depth == 0 and char == "." else None
+        if gap:
+            # .{m,n} allows up to n characters; .{m,}, .* and .+ any number
+            within = int(gap.group(2)) if gap.group(2) else None
+            segments.append((pattern[start:i], within))
+            start = i = gap.end()
+            continue
+        i += 1
+    segments.append((pattern[start:], None))
+    # Each segment carries the gap before it, rather than after
+    return [(segment, segments[k - 1][1] if k else None) for k, (segment, _) in enumerate(segments)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("patterns", nargs="*", help="Regexes to count matching articles for.")
+    parser.add_argument("--frame", nargs="*", default=[], help="Frames to count the articles of, keyword by keyword.")
+    parser.add_argument("--build", action="store_true", help="Rebuild the index from frame_membership.")
+    parser.add_argument("--local", type=str, help="Build from the local Parquet tables in this directory.")
+    args = parser.parse_args()
+    if args.local is not None:
+        from backends import LocalBackend
+        from bq import set_backend
+        set_backend(LocalBackend(args.local))
+    index = build_index() if args.build else current_index()
+    for pattern in args.patterns:
+        start = time.perf_counter()
+        candidates = index.candidates(pattern)
+        docs = index.search(pattern)
+        print(f"{pattern}: {len(docs)} articles, {len(index.duplicate_group_ids(docs))} distinct, "
+              f"from {len(candidates)} candidates in {time.perf_counter() - start:.2f}s")
+    for name, frame in load_frames(args.frame).items() if args.frame else []:
+        start = time.perf_counter()
+        for keyword, docs in index.keyword_hits(frame).items():
+            print(f"  {keyword}: {len(docs)}")
+        docs = index.frame_members(frame)
+        print(f"{name}: {len(docs)} articles, {len(index.duplicate_group_ids(docs))} distinct, "
+              f"in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,141 @@
+import argparse
 import datetime
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
 
 import pandas as pd
 
-from bq import make_table
-from settings import DATASET_ID, PROJECT_ID, ANALYSIS_DIR
+from authors import count_authors
+from bq import (FRAME_TABLE_LAYOUT, RAW_NEWS_SIGNATURE_SQL, clear_cache, create_bqstorage_client, create_client,
+                make_table_incremental, partition_signature_sql, read_query, read_query_batches, register_layout,
+                set_backend, set_budget, set_cache_enabled, using_bigquery)
+from export import (FORMATS, export_format, export_query, iter_file, set_streaming, streaming_enabled, sum_by_key,
+                    write_batches)
+from frames import load_frames
+from org_aliases import current_index
+from settings import DATASET_ID, PROJECT_ID, ANALYSIS_DIR, LOCAL_DATA_DIR
+from sketches import approximate_counts, approximate_enabled, approximate_percent_ai, make_sketch_table, set_approximate
 
 TODAY_STAMP = datetime.date.today().isoformat()
 
+# Frames with a boolean column in the frame_membership table
+FRAMES = list(load_frames())
+for frame in FRAMES:
+    register_layout(frame, FRAME_TABLE_LAYOUT)
+AI_TABLE = "artificial_intelligence"
+# Distinct AI articles by year, category and source, built from data/ai_denominators.sql
+AI_DENOMINATORS_TABLE = "ai_denominators"
+# Signature of each year's AI articles, which changes with the articles themselves but not when frames are edited
+AI_CORPUS_SIGNATURE_SQL = f"""\
+SELECT
+  year,
+  FORMAT("%d:%d", COUNT(*), BIT_XOR(FARM_FINGERPRINT(
+    CONCAT(id, "|", duplicateGroupId, "|", IFNULL(source_name, ""), "|", IFNULL(source_category, ""))))) AS signature
+FROM
+  `{PROJECT_ID}.{DATASET_ID}.frame_membership`
+GROUP BY
+  year
+"""
+# Named entity mentions of AI articles, one row per entity and type, flattened from article_entities by
+# data/entity_mentions.sql
+ENTITY_MENTIONS_TABLE = "entity_mentions"
+
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Run every query, even if its result is in the local query cache.")
+    parser.add_argument("--clear-cache", action="store_true", help="Empty the local query cache first.")
+    parser.add_argument("--in-memory", action="store_true",
+                        help="Compute the summaries from a single download of the frame table.")
+    parser.add_argument("--budget-gb", type=float,
+                        help="Refuse to run any query whose dry-run estimate is over this many GB.")
+    parser.add_argument("--approximate", action="store_true",
+                        help="Compute the year, source and percent-of-AI counts from distinct-count sketches.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Write the query summaries to file a batch at a time, with bounded memory.")
+    parser.add_argument("--export-format", choices=FORMATS, default="csv",
+                        help="File format of streamed summaries; Parquet files are zstd-compressed.")
+    parser.add_argument("--charts", action="store_true",
+                        help="Also draw the frame's by-year charts from its summaries, in analysis/charts.")
+    parser.add_argument("--local", type=str, nargs="?", const=str(LOCAL_DATA_DIR),
+                        help="Run every query locally on the Parquet tables in this directory instead of in BigQuery.")
+    args = parser.parse_args()
+    if args.local is not None:
+        from backends import LocalBackend
+        set_backend(LocalBackend(args.local))
+    if args.clear_cache:
+        clear_cache()
+    set_cache_enabled(not args.no_cache)
+    if args.budget_gb is not None:
+        set_budget(int(args.budget_gb * 1e9))
+    set_streaming(args.stream, args.export_format)
     table_name = "competition"
-    make_table(table_name, clobber=True)
-    summarize_by_year(table_name)
-    summarize_percent_ai_by_year(table_name)
-    summarize_by_source(table_name)
-    summarize_by_person_mention(table_name)
-    summarize_by_author(table_name)
-    summarize_by_organization_mention(table_name)
+    # Match every frame in one pass over raw_news, then cut the frame table out of the result. Only years whose
+    # articles changed since the last run are rebuilt.
+    make_table_incremental("frame_membership", RAW_NEWS_SIGNATURE_SQL)
+    # Only years whose AI articles changed get new denominators
+    make_table_incremental(AI_DENOMINATORS_TABLE, AI_CORPUS_SIGNATURE_SQL)
+    make_table_incremental("article_entities", partition_signature_sql("frame_membership"))
+    make_table_incremental(ENTITY_MENTIONS_TABLE, partition_signature_sql("article_entities"))
+    make_frame_table(table_name)
+    if args.approximate:
+        set_approximate(True)
+        make_sketch_table()
+    if args.in_memory:
+        # summary_engine imports from this module
+        from summary_engine import summarize
+        summaries = summarize(table_name)
+    else:
+        summaries = {name[len("summarize_"):]: df for name, df in run_summaries(table_name).items()}
+    if args.charts:
+        from render_charts import render_charts
+        render_charts({table_name: summaries})
+
+
+def make_frame_table(table_name) -> List[int]:
+    """
+    Write a frame table (or the artificial_intelligence table) from the frame_membership table, rebuilding only the
+    years of frame_membership that changed since the last build.
+    :param table_name: A frame in :data:`FRAMES`, or :data:`AI_TABLE`.
+    :return: Years that were (re)built.
+    """
+    return make_table_incremental(table_name, partition_signature_sql("frame_membership"),
+                                  sql=frame_projection_sql(table_name))
+
+
+def frame_projection_sql(table_name) -> str:
+    if table_name != AI_TABLE and table_name not in FRAMES:
+        raise ValueError(f"{table_name} isn't a frame in frame_membership")
+    # Every row of frame_membership is an AI article
+    condition = "TRUE" if table_name == AI_TABLE else table_name
+    # One row per article; named entities are in the article_entities table
+    sql = f"""\
+    SELECT
+      id,
+      duplicateGroupId,
+      title,
+      url,
+      year,
+      source_name,
+      author
+    FROM
+      `{PROJECT_ID}.{DATASET_ID}.frame_membership`
+    WHERE
+      {condition}
+      -- make_table_incremental() narrows this to the year it rebuilds
+      AND /* year: year */ TRUE
+    """
+    return sql
 
 
 def summarize_by_source(table_name):
+    if approximate_enabled():
+        df = approximate_counts(table_name, ["source_name"])
+        df = df.sort_values("count", ascending=False, kind="mergesort", ignore_index=True)
+        save_summary(df, table_name, "by_source")
+        return df
     # Get counts of articles by publishing source
     sql = f"""\
         SELECT
@@ -38,6 +154,11 @@ def summarize_by_source(table_name):
 
 
 def summarize_by_year(table_name) -> pd.DataFrame:
+    if approximate_enabled():
+        df = approximate_counts(table_name, ["year"])
+        df["percent"] = df["count"] / df["count"].sum()
+        save_summary(df, table_name, "by_year")
+        return df
     sql = f"""\
       SELECT
         year,
@@ -55,8 +176,12 @@ def summarize_by_year(table_name) -> pd.DataFrame:
 
 
 def summarize_percent_ai_by_year(table_name) -> pd.DataFrame:
-    sql = """\
-    -- We want the year and the percentage of AI articles with the competition frame in that year
+    if approximate_enabled():
+        df = approximate_percent_ai(table_name, ["year"])[["year", "percent"]]
+        save_summary(df, table_name, "percent_ai_by_year")
+        return df
+    sql = f"""\
+    -- We want the year and the percentage of AI articles in the frame in that year
     WITH
       counter AS (
       -- Get the frame-specific count
@@ -65,23 +190,9 @@ def summarize_percent_ai_by_year(table_name) -> pd.DataFrame:
         -- Want to count duplicateGroupIds to distinct articles correctly
         COUNT(DISTINCT duplicateGroupId) AS n
       FROM
-        `gcp-cset-projects.rhetorical_frames.competition`
-      GROUP BY
-        year
-      ORDER BY
-        year ASC),
-      ai_counter AS (
-      -- Get the count of all AI articles
-      SELECT
-        year,
-        -- Want to count duplicateGroupIds to distinct articles correctly
-        COUNT(DISTINCT duplicateGroupId) AS ai_count
-      FROM
-        `gcp-cset-projects.rhetorical_frames.artificial_intelligence`
+        `{PROJECT_ID}.{DATASET_ID}.{table_name}`
       GROUP BY
-        year
-      ORDER BY
-        year ASC)
+        year)
     SELECT
       counter.year,
       -- We just divide rather than multiplying by 100 -- it's easier to manipulate later
@@ -89,10 +200,14 @@ def summarize_percent_ai_by_year(table_name) -> pd.DataFrame:
     FROM
       counter
     INNER JOIN
-      ai_counter
+      -- The count of all AI articles, shared by every frame
+      `{PROJECT_ID}.{DATASET_ID}.{AI_DENOMINATORS_TABLE}` AS denominators
     ON
-      counter.year = ai_counter.year
-      ORDER BY year
+      counter.year = denominators.year
+    WHERE
+      denominators.breakdown = "year"
+    ORDER BY
+      year
     """
     df = _query_and_save(sql, table_name, "percent_ai_by_year")
     return df
@@ -102,34 +217,39 @@ def summarize_by_person_mention(table_name) -> pd.DataFrame:
     sql = f"""\
     -- Getting counts of how many distinct articles mention different people
     SELECT
-    -- Semantic.value contains the names of the person mentioned
-      temp_semantic.value,
+      -- The names of the people mentioned
+      mentions.value,
       -- Counting distinct articles containing mentions
-      COUNT(DISTINCT duplicateGroupId) AS count
+      COUNT(DISTINCT frame.duplicateGroupId) AS count
     FROM
-       `{PROJECT_ID}.{DATASET_ID}.{table_name}`,
-      -- We want to unnest the semantic info array so we have every row of it and can get the row with the "value" name in it
-      UNNEST(semantic_info) AS temp_semantic
-      -- We also want to cross join so we can specifically pull in only the semantic info arrays that have "Person" values
-    CROSS JOIN
-      UNNEST(semantic_info) AS semantic
+       `{PROJECT_ID}.{DATASET_ID}.{table_name}` AS frame
+      -- Named entity mentions are kept in a side table, one row per entity and type
+    INNER JOIN
+      `{PROJECT_ID}.{DATASET_ID}.{ENTITY_MENTIONS_TABLE}` AS mentions
+    ON
+      mentions.id = frame.id
     WHERE
-      semantic.value = "Person"
-      AND temp_semantic.name = "value"
+      mentions.entity_type = "Person"
     GROUP BY
-      temp_semantic.value
+      mentions.value
     ORDER BY
       count DESC
-    
     """
     df = _query_and_save(sql, table_name, "by_person_mention")
     return df
 
 
-def summarize_by_author(table_name):
+def summarize_by_author(table_name, clean=False):
+    """
+    Count distinct articles by author.
+    :param table_name: Frame table to summarize.
+    :param clean: Split bylines into individual, cleaned-up author names with :func:`authors.count_authors`, and save
+        the result as ``by_clean_author``.
+    :return: ``author`` and ``count``.
+    """
     sql = f"""\
     SELECT
-      author,
+      {"LOWER(author)" if clean else "author"} AS author,
       COUNT(DISTINCT duplicateGroupId) AS count
     FROM
        `{PROJECT_ID}.{DATASET_ID}.{table_name}`
@@ -138,92 +258,122 @@ def summarize_by_author(table_name):
     ORDER BY
       count DESC
     """
-    df = _query_and_save(sql, table_name, "by_author")
+    if not clean:
+        return _query_and_save(sql, table_name, "by_author")
+    authors = read_query(sql, step=f"{table_name}_by_clean_author").to_pandas()
+    df = count_authors(authors["author"], authors["count"])
+    save_summary(df, table_name, "by_clean_author")
     return df
 
 
+def summarize_by_clean_author(table_name):
+    # Same counts as by_author, with bylines split into individual, cleaned-up author names
+    return summarize_by_author(table_name, clean=True)
+
+
 def summarize_by_organization_mention(table_name):
     # Getting counts of how many distinct articles mention different organizations
     # We use both company and organization here because the distinction here isn't always a clear line
     sql = f"""\
-    WITH
-      orgs AS (
-      SELECT
-        -- Semantic.value contains the names of the organizations mentioned
-        LOWER(temp_semantic.value) AS organization,
-        -- Counting distinct articles containing mentions
-        COUNT(DISTINCT duplicateGroupId) AS count
-      FROM
-        `{PROJECT_ID}.{DATASET_ID}.{table_name}`,
-        -- We want to unnest the semantic info array so we have every row of it and can get the row with the "value" name in it
-        UNNEST(semantic_info) AS temp_semantic
-        -- We also want to cross join so we can specifically pull in only the semantic info arrays that have "Organization" values
-      CROSS JOIN
-        UNNEST(semantic_info) AS semantic
-      WHERE
-        -- Using both company and organization
-        (semantic.value = "Organization"
-          OR semantic.value = "Company")
-        AND temp_semantic.name = "value"
-      GROUP BY
-        1)
     SELECT
-      -- Adding in aliases from both high resolution organizations and grid
-      CASE
-        WHEN alias_tab.name IS NOT NULL THEN alias_tab.name
-        WHEN grid_alias.alias IS NOT NULL
-      AND api_grid.name IS NOT NULL THEN api_grid.name
-      ELSE
-      organization
-    END
-      AS organization,
-      -- Combining counts of all organizations with the same alias
-      SUM(count) AS count
+      -- The names of the organizations mentioned
+      LOWER(mentions.value) AS organization,
+      -- Counting distinct articles containing mentions
+      COUNT(DISTINCT frame.duplicateGroupId) AS count
     FROM
-      orgs
-      -- Pulling in aliases from high resolution entities
-    LEFT JOIN (
-      SELECT
-        DISTINCT name,
-        alias_list.alias
-      FROM
-        high_resolution_entities.organizations
-      CROSS JOIN
-        UNNEST(aliases) AS alias_list) AS alias_tab
-        -- Joining any organization name that matches an alias
-    ON
-      (orgs.organization = alias_tab.alias)
-      -- Adding in the grid aliases data
-    LEFT JOIN (
-      SELECT
-        grid_id,
-        alias
-      FROM
-        gcp_cset_grid.grid_aliases) AS grid_alias
-        -- Joining any organization name matching a grid alias
-    ON
-      orgs.organization = grid_alias.alias
-      -- Adding in the api_grid table so we can get the canonical names of the grid aliases
-    LEFT JOIN (
-      SELECT
-        id,
-        name
-      FROM
-        gcp_cset_grid.api_grid) AS api_grid
+      `{PROJECT_ID}.{DATASET_ID}.{table_name}` AS frame
+      -- Named entity mentions are kept in a side table, one row per entity and type
+    INNER JOIN
+      `{PROJECT_ID}.{DATASET_ID}.{ENTITY_MENTIONS_TABLE}` AS mentions
     ON
-      api_grid.id = grid_alias.grid_id
+      mentions.id = frame.id
+    WHERE
+      -- Using both company and organization
+      mentions.entity_type IN ("Organization", "Company")
     GROUP BY
       1
-    ORDER BY
-      2 DESC
-        """
-    df = _query_and_save(sql, table_name, "by_organization_mention")
+    """
+    if streaming_enabled():
+        # Mentions are resolved a batch at a time, and the counts of aliases combined with an external sort, so memory
+        # stays bounded however many organizations there are
+        batches = read_query_batches(sql, step=f"{table_name}_by_organization_mention")
+        resolved = (_resolve_aliases(batch.to_pandas()) for batch in batches)
+        path = summary_path(table_name, "by_organization_mention", export_format())
+        write_batches(sum_by_key(resolved, "organization", "count"), path, export_format())
+        return iter_file(path)
+    df = read_query(sql, step=f"{table_name}_by_organization_mention").to_pandas()
+    df = _combine_aliases(_resolve_aliases(df))
+    save_summary(df, table_name, "by_organization_mention")
     return df
 
 
+def _resolve_aliases(df: pd.DataFrame) -> pd.DataFrame:
+    # Adding in aliases from both high resolution organizations and grid, from the local alias index
+    df["organization"] = current_index().resolve(df["organization"])
+    return df
+
+
+def _combine_aliases(df: pd.DataFrame) -> pd.DataFrame:
+    # Combining counts of all organizations with the same alias
+    df = df.groupby("organization", dropna=False, sort=False, as_index=False)["count"].sum()
+    return df.sort_values("count", ascending=False, kind="mergesort", ignore_index=True)
+
+
+SUMMARIES = [
+    summarize_by_year,
+    summarize_percent_ai_by_year,
+    summarize_by_source,
+    summarize_by_person_mention,
+    summarize_by_author,
+    summarize_by_clean_author,
+    summarize_by_organization_mention,
+]
+
+
+def run_summaries(table_name,
+                  summaries: Optional[List[Callable[[str], pd.DataFrame]]] = None,
+                  max_workers: Optional[int] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Run summary queries for a table concurrently, so the total time is about that of the slowest one.
+    :param table_name: Frame table to summarize.
+    :param summaries: ``summarize_*`` functions to run. Defaults to :data:`SUMMARIES`.
+    :param max_workers: Number of queries in flight at once. Defaults to all of them.
+    :return: Summary function name -> result.
+    """
+    summaries = summaries or SUMMARIES
+    # Create the shared clients up front, rather than racing to create them in the worker threads
+    if using_bigquery():
+        create_client()
+        create_bqstorage_client()
+    if summarize_by_organization_mention in summaries:
+        current_index()
+    with ThreadPoolExecutor(max_workers=max_workers or len(summaries)) as executor:
+        futures = {f.__name__: executor.submit(f, table_name) for f in summaries}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def save_summary(df, table_name, save_suffix):
+    df.to_csv(summary_path(table_name, save_suffix), index=False)
+
+
+def summary_path(table_name, save_suffix, file_format="csv") -> Path:
+    return ANALYSIS_DIR / f"{table_name}_{save_suffix}_{TODAY_STAMP}.{file_format}"
+
+
+def latest_summary_path(table_name, save_suffix) -> Optional[Path]:
+    """The most recently dated summary file of a table, in any format, or None if there isn't one."""
+    # Dates sort by name
+    paths = sorted(ANALYSIS_DIR.glob(f"{table_name}_{save_suffix}_????-??-??.*"))
+    return paths[-1] if paths else None
+
+
 def _query_and_save(sql, table_name, save_suffix):
-    df = pd.read_gbq(sql, project_id=PROJECT_ID)
-    df.to_csv(ANALYSIS_DIR / f"{table_name}_{save_suffix}_{TODAY_STAMP}.csv", index=False)
+    if streaming_enabled():
+        # Returns a lazy iterator over the file rather than a DataFrame
+        return export_query(sql, summary_path(table_name, save_suffix, export_format()),
+                            step=f"{table_name}_{save_suffix}", lazy=True)
+    df = read_query(sql, step=f"{table_name}_{save_suffix}").to_pandas()
+    save_summary(df, table_name, save_suffix)
     return df
 
 
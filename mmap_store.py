@@ -0,0 +1,56 @@
+"""Flat NumPy files for the on-disk indexes, memory-mapped on load.
+
+Strings are stored as their UTF-8 bytes joined into one file, with an array of offsets where each one starts, so a
+string is a slice of the mapping and loading an index reads nothing until a lookup touches it.
+"""
+import os
+import tempfile
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+
+def pack(strings: np.ndarray) -> Tuple[bytes, np.ndarray]:
+    """
+    Join strings into one byte string.
+    :param strings: Strings to pack.
+    :return: Their UTF-8 bytes, and ``len(strings) + 1`` offsets; string ``i`` is ``data[offsets[i]:offsets[i + 1]]``.
+    """
+    encoded = [s.encode() for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(s) for s in encoded], out=offsets[1:])
+    return b"".join(encoded), offsets
+
+
+def load_array(path: Path) -> np.ndarray:
+    """
+    Memory-map an array saved with ``np.save``.
+    :param path: The ``.npy`` file.
+    :return: A read-only array backed by the file.
+    """
+    # A plain ndarray view of the mapping; indexing np.memmap objects is much slower
+    return np.asarray(np.load(path, mmap_mode="r"))
+
+
+def load_bytes(path: Path) -> np.ndarray:
+    """
+    Memory-map packed string bytes.
+    :param path: A file of bytes written from :func:`pack`.
+    :return: A read-only ``uint8`` array backed by the file.
+    """
+    # np.memmap can't map an empty file
+    if path.stat().st_size == 0:
+        return np.zeros(0, dtype=np.uint8)
+    return np.asarray(np.memmap(path, dtype=np.uint8, mode="r"))
+
+
+def write_atomic(path: Path, text: str):
+    """
+    Write a text file so that readers see either its old contents or its new contents, never part of them.
+    :param path: File to write.
+    :param text: Its new contents.
+    """
+    with tempfile.NamedTemporaryFile("w", dir=path.parent, suffix=".tmp", delete=False) as f:
+        f.write(text)
+    os.replace(f.name, path)
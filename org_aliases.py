@@ -0,0 +1,242 @@
+"""A local index from organization aliases to canonical names, for resolving organization mentions.
+
+The index is built from ``high_resolution_entities.organizations`` and the GRID alias tables with one query, then
+written to disk as flat NumPy arrays: sorted 64-bit hashes of the aliases, and the alias and canonical name strings as
+UTF-8 bytes with offsets. Loading memory-maps the arrays, so opening the index is instant and only the pages a lookup
+touches are read. Mentions are resolved in bulk with a binary search over the hashes, and the alias bytes are compared
+so a hash collision can't resolve a mention to the wrong name.
+
+Each build is stored under a version derived from the last-modified times of the source tables; ``CURRENT`` names the
+version in use, and :func:`current_index` rebuilds it when a source table changes.
+
+Precedence is as in the alias joins the summaries used to run in BigQuery: a high-resolution entity alias wins over a
+GRID alias, and mentions matching neither keep their own text. Unlike the joins, each alias resolves to exactly one
+name (the first in sort order if a table lists several), so a mention is never counted under more than one name.
+"""
+import argparse
+import hashlib
+import json
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from mmap_store import load_array, load_bytes, pack, write_atomic
+from settings import ALIAS_INDEX_DIR
+
+SOURCE_TABLES = (
+    "high_resolution_entities.organizations",
+    "gcp_cset_grid.grid_aliases",
+    "gcp_cset_grid.api_grid",
+)
+
+ALIAS_SQL = """\
+WITH
+  high_resolution AS (
+  SELECT
+    alias_list.alias AS alias,
+    MIN(name) AS name
+  FROM
+    high_resolution_entities.organizations
+  CROSS JOIN
+    UNNEST(aliases) AS alias_list
+  GROUP BY
+    alias),
+  grid AS (
+  SELECT
+    grid_alias.alias AS alias,
+    MIN(api_grid.name) AS name
+  FROM
+    gcp_cset_grid.grid_aliases AS grid_alias
+  INNER JOIN
+    gcp_cset_grid.api_grid AS api_grid
+  ON
+    api_grid.id = grid_alias.grid_id
+  GROUP BY
+    alias)
+SELECT
+  alias,
+  -- High resolution entity names take precedence over GRID names
+  COALESCE(high_resolution.name, grid.name) AS name
+FROM
+  high_resolution
+FULL OUTER JOIN
+  grid
+USING
+  (alias)
+WHERE
+  alias IS NOT NULL
+  AND COALESCE(high_resolution.name, grid.name) IS NOT NULL
+"""
+
+
+class AliasIndex:
+    """A memory-mapped alias -> canonical name index."""
+
+    def __init__(self, directory: Union[str, Path]):
+        """
+        :param directory: Directory of one index version, as written by :func:`write_index`.
+        """
+        self.directory = Path(directory)
+        self.manifest = json.loads((self.directory / "manifest.json").read_text())
+        self.hashes = load_array(self.directory / "hashes.npy")
+        self.alias_offsets = load_array(self.directory / "alias_offsets.npy")
+        self.name_ids = load_array(self.directory / "name_ids.npy")
+        self.name_offsets = load_array(self.directory / "name_offsets.npy")
+        self.aliases = load_bytes(self.directory / "aliases.bin")
+        self.names = load_bytes(self.directory / "names.bin")
+
+    @property
+    def version(self) -> str:
+        return self.manifest["version"]
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def resolve(self, organizations: Iterable[Optional[str]]) -> np.ndarray:
+        """
+        Resolve organization mentions to canonical names.
+        :param organizations: Lowercased organization mentions. ``None`` stays ``None``.
+        :return: Canonical name of each mention, or the mention itself if no alias matches it.
+        """
+        codes, uniques = pd.factorize(pd.Series(organizations, dtype=object))
+        resolved = np.asarray(uniques, dtype=object).copy()
+        hashes = hash_aliases(resolved)
+        positions = np.searchsorted(self.hashes, hashes)
+        candidates = np.flatnonzero(positions < len(self.hashes))
+        candidates = candidates[self.hashes[positions[candidates]] == hashes[candidates]]
+        for i in candidates:
+            position = self._find(resolved[i].encode(), hashes[i], positions[i])
+            if position is not None:
+                resolved[i] = self._name(position)
+        # Missing mentions are coded -1, which indexes this trailing None
+        return np.append(resolved, None)[codes]
+
+    def _find(self, key: bytes, key_hash: np.uint64, position: int) -> Optional[int]:
+        # Aliases with the same hash are adjacent; compare each one's bytes
+        while position < len(self.hashes) and self.hashes[position] == key_hash:
+            start, end = self.alias_offsets[position], self.alias_offsets[position + 1]
+            if self.aliases[start:end].tobytes() == key:
+                return position
+            position += 1
+        return None
+
+    def _name(self, position: int) -> str:
+        name_id = self.name_ids[position]
+        return self.names[self.name_offsets[name_id]:self.name_offsets[name_id + 1]].tobytes().decode()
+
+
+def hash_aliases(aliases: Iterable[str]) -> np.ndarray:
+    """64-bit hashes of alias strings, as stored in the index."""
+    return np.fromiter((int.from_bytes(hashlib.blake2b(alias.encode(), digest_size=8).digest(), "little")
+                        for alias in aliases), dtype=np.uint64)
+
+
+def write_index(aliases: pd.DataFrame, directory: Union[str, Path], version: str,
+                sources: Optional[Dict[str, Optional[str]]] = None) -> AliasIndex:
+    """
+    Write an alias index.
+    :param aliases: ``alias`` and its canonical ``name``, one row per alias.
+    :param directory: Index root. The index is written to ``<directory>/<version>`` and made current.
+    :param version: Index version.
+    :param sources: Source table -> last-modified time, recorded in the manifest.
+    :return: The new index.
+    """
+    directory = Path(directory)
+    aliases = aliases.dropna(subset=["alias", "name"]).drop_duplicates("alias")
+    hashes = hash_aliases(aliases["alias"])
+    order = np.argsort(hashes, kind="stable")
+    names, name_ids = np.unique(aliases["name"].to_numpy(dtype=object)[order].astype(str), return_inverse=True)
+    alias_bytes, alias_offsets = pack(aliases["alias"].to_numpy(dtype=object)[order])
+    name_bytes, name_offsets = pack(names)
+
+    version_dir = directory / version
+    version_dir.mkdir(parents=True, exist_ok=True)
+    np.save(version_dir / "hashes.npy", hashes[order])
+    np.save(version_dir / "alias_offsets.npy", alias_offsets)
+    np.save(version_dir / "name_ids.npy", name_ids.astype(np.int32))
+    np.save(version_dir / "name_offsets.npy", name_offsets)
+    (version_dir / "aliases.bin").write_bytes(alias_bytes)
+    (version_dir / "names.bin").write_bytes(name_bytes)
+    manifest = {
+        "version": version,
+        "sources": sources or {},
+        "aliases": len(hashes),
+        "names": len(names),
+        "built": datetime.now(timezone.utc).isoformat(),
+    }
+    (version_dir / "manifest.json").write_text(json.dumps(manifest, indent=2))
+    write_atomic(directory / "CURRENT", version)
+    return AliasIndex(version_dir)
+
+
+def build_index(directory: Union[str, Path] = ALIAS_INDEX_DIR) -> AliasIndex:
+    """
+    Download the alias tables from BigQuery (or the local backend) and write a new index version.
+    :param directory: Index root.
+    :return: The new index.
+    """
+    from bq import read_query
+    sources = source_versions()
+    aliases = read_query(ALIAS_SQL, step="alias index").to_pandas()
+    index = write_index(aliases, directory, _version(sources), sources)
+    print(f"Built alias index {index.version} with {len(index)} aliases")
+    return index
+
+
+def source_versions() -> Dict[str, Optional[str]]:
+    """Last-modified time of each source table, from table metadata."""
+    from bq import get_backend
+    backend = get_backend()
+    return {table_id: backend.table_modified(table_id) for table_id in SOURCE_TABLES}
+
+
+def load_index(directory: Union[str, Path] = ALIAS_INDEX_DIR, version: Optional[str] = None) -> Optional[AliasIndex]:
+    """
+    Open an index version.
+    :param directory: Index root.
+    :param version: Version to open. Defaults to the current one.
+    :return: The index, or ``None`` if there isn't one.
+    """
+    directory = Path(directory)
+    if version is None:
+        try:
+            version = (directory / "CURRENT").read_text().strip()
+        except FileNotFoundError:
+            return None
+    if not (directory / version / "manifest.json").exists():
+        return None
+    return AliasIndex(directory / version)
+
+
+@lru_cache(maxsize=None)
+def current_index(directory: Union[str, Path] = ALIAS_INDEX_DIR) -> AliasIndex:
+    """
+    Open the index for the current state of the source tables, building it if any of them changed.
+    Checked once per process.
+    :param directory: Index root.
+    :return: The index.
+    """
+    version = _version(source_versions())
+    return load_index(directory, version) or build_index(directory)
+
+
+def _version(sources: Dict[str, Optional[str]]) -> str:
+    return hashlib.sha256(json.dumps(sources, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("organizations", nargs="*", help="Lowercased organization mentions to resolve.")
+    parser.add_argument("--build", action="store_true", help="Rebuild the index from BigQuery.")
+    args = parser.parse_args()
+    index = build_index() if args.build else current_index()
+    for organization, name in zip(args.organizations, index.resolve(args.organizations)):
+        print(f"{organization}\t{name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""Build every frame's tables, summaries and charts as one dependency graph, running independent steps in parallel.
+
+main.py builds and summarizes one frame at a time. Here each step is a node that runs once the nodes it reads from
+are done:
+
+    frame_membership -> artificial_intelligence, ai_denominators, article_entities -> entity_mentions, <frame> tables
+    <frame> table (+ entity_mentions, ai_denominators, the alias index) -> <frame> summaries
+    every frame's by-year and percent-of-AI summaries -> charts (see render_charts.py)
+
+so the frames build side by side and a full refresh takes about as long as its longest chain of steps. Each node
+fingerprints what it produced (a table's last-modified time, a file's size and modified time). A node whose code and
+input fingerprints haven't changed since it last ran, and whose output is still there, is skipped. Tables always
+run, since they check their own inputs year by year (see bq.make_table_incremental) and keep their fingerprint when
+nothing changed, and so do the charts, which are only redrawn when their data changed. The run ends with a timing
+report per node.
+
+    python3 pipeline.py [--workers 8] [--frames competition killer_robots] [--local [<dir>]] [--force]
+"""
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from settings import CHART_DIR, DATASET_ID, LOCAL_DATA_DIR, PIPELINE_STATE, PROJECT_ID
+
+DEFAULT_WORKERS = 8
+# Summaries that read the named entity mentions in entity_mentions
+MENTION_SUMMARIES = ("summarize_by_person_mention", "summarize_by_organization_mention")
+
+
+@dataclass
+class Node:
+    """A pipeline step."""
+    name: str
+    # Does the work
+    run: Callable[[], object]
+    # Fingerprint of what the step produced, or None if there's nothing yet
+    output: Callable[[], Optional[str]]
+    # Names of the nodes it reads from
+    inputs: Tuple[str, ...] = ()
+    # Changing this reruns the node, e.g. a hash of its code
+    version: str = ""
+    # Run every time, for steps that skip unchanged work themselves
+    always_run: bool = False
+
+
+@dataclass
+class NodeResult:
+    name: str
+    status: str
+    start: float = 0.0
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+class Pipeline:
+    """A DAG of :class:`Node`\\s, run on a thread pool."""
+
+    def __init__(self, state_path: Optional[Path] = PIPELINE_STATE):
+        """
+        :param state_path: JSON file of each node's fingerprints from its last run. If ``None``, every node runs.
+        """
+        self.nodes: Dict[str, Node] = {}
+        self.state_path = state_path
+
+    def add(self, node: Node) -> Node:
+        missing = [name for name in node.inputs if name not in self.nodes]
+        if missing:
+            raise ValueError(f"{node.name} reads from unknown nodes: {', '.join(missing)}")
+        if node.name in self.nodes:
+            raise ValueError(f"{node.name} is already in the pipeline")
+        self.nodes[node.name] = node
+        return node
+
+    def run(self, workers: int = DEFAULT_WORKERS, force=False) -> pd.DataFrame:
+        """
+        Run every node once its inputs are done, up to ``workers`` at a time. A node whose input failed is blocked.
+        :param workers: Maximum nodes running at once.
+        :param force: Run every node, even if it's up to date.
+        :return: Timing report: ``node``, ``status`` (ran, skipped, failed or blocked), ``start`` and ``seconds``,
+            relative to the start of the run, and ``error``.
+        """
+        state = self._read_state()
+        outputs: Dict[str, Optional[str]] = {}
+        results: Dict[str, NodeResult] = {}
+        waiting = {name: set(node.inputs) for name, node in self.nodes.items()}
+        dependents = {name: [other for other, node in self.nodes.items() if name in node.inputs]
+                      for name in self.nodes}
+        start = time.perf_counter()
+
+        def execute(node: Node) -> NodeResult:
+            node_start = time.perf_counter()
+            key = _fingerprint([node.version] + [f"{name}={outputs[name]}" for name in node.inputs])
+            previous = state.get(node.name, {})
+            status = "ran"
+            if (not force and not node.always_run and previous.get("key") == key
+                    and previous.get("output") is not None and previous.get("output") == node.output()):
+                status = "skipped"
+            else:
+                node.run()
+            outputs[node.name] = node.output()
+            state[node.name] = {"key": key, "output": outputs[node.name]}
+            return NodeResult(node.name, status, node_start - start, time.perf_counter() - node_start)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(execute, node): name for name, node in self.nodes.items() if not node.inputs}
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = futures.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        results[name] = NodeResult(name, "failed", error=f"{type(e).__name__}: {e}")
+                        print(f"{name} failed: {results[name].error}")
+                    # Dependents of a failed node are blocked, and so on down the graph
+                    finished = [name]
+                    while finished:
+                        finished_name = finished.pop()
+                        for dependent in dependents[finished_name]:
+                            waiting[dependent].discard(finished_name)
+                            if waiting[dependent] or dependent in results:
+                                continue
+                            inputs = self.nodes[dependent].inputs
+                            if any(results[i].status in ("failed", "blocked") for i in inputs):
+                                results[dependent] = NodeResult(dependent, "blocked")
+                                finished.append(dependent)
+                            else:
+                                futures[executor.submit(execute, self.nodes[dependent])] = dependent
+        self._write_state({name: value for name, value in state.items()
+                           if results.get(name) is None or results[name].status in ("ran", "skipped")})
+        report = pd.DataFrame([vars(results[name]) for name in self.nodes])
+        report = report.rename(columns={"name": "node"}).sort_values(["start", "node"], ignore_index=True)
+        report.attrs["wall_seconds"] = time.perf_counter() - start
+        return report
+
+    def critical_path(self, report: pd.DataFrame) -> Tuple[float, List[str]]:
+        """
+        The chain of dependent nodes that took longest, which bounds the run's wall time however many workers run.
+        :param report: Timing report from :meth:`run`.
+        :return: Its total seconds and node names.
+        """
+        seconds = dict(zip(report["node"], report["seconds"]))
+        longest: Dict[str, Tuple[float, List[str]]] = {}
+        # Nodes are added after their inputs, so this is a topological order
+        for name, node in self.nodes.items():
+            before = max((longest[i] for i in node.inputs), default=(0.0, []), key=lambda path: path[0])
+            longest[name] = (before[0] + seconds.get(name, 0.0), before[1] + [name])
+        return max(longest.values(), default=(0.0, []), key=lambda path: path[0])
+
+    def _read_state(self) -> Dict[str, dict]:
+        if self.state_path is None:
+            return {}
+        try:
+            return json.loads(Path(self.state_path).read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _write_state(self, state: Dict[str, dict]):
+        if self.state_path is None:
+            return
+        path = Path(self.state_path)
+        with tempfile.NamedTemporaryFile("w", dir=path.parent, suffix=".tmp", delete=False) as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        os.replace(f.name, path)
+
+
+def build_pipeline(frames: Optional[List[str]] = None, charts=True, font_path: Optional[str] = None) -> Pipeline:
+    """
+    The graph of tables, summaries and charts for some frames.
+    :param frames: Frames to build. Defaults to every frame in the frame spec.
+    :param charts: Whether to draw the charts.
+    :param font_path: Font for the charts. Defaults to matplotlib's DejaVu Sans.
+    :return: Pipeline.
+    """
+    import main
+    from bq import RAW_NEWS_SIGNATURE_SQL, make_table_incremental, partition_signature_sql
+    from org_aliases import current_index
+    from render_charts import CHART_MANIFEST, CHART_SUMMARIES, render_saved_charts
+
+    frames = frames or main.FRAMES
+    pipeline = Pipeline()
+    membership = partition_signature_sql("frame_membership")
+    pipeline.add(_table_node("frame_membership",
+                             lambda: make_table_incremental("frame_membership", RAW_NEWS_SIGNATURE_SQL)))
+    pipeline.add(_table_node(main.AI_DENOMINATORS_TABLE,
+                             lambda: make_table_incremental(main.AI_DENOMINATORS_TABLE, main.AI_CORPUS_SIGNATURE_SQL),
+                             ("frame_membership",)))
+    pipeline.add(_table_node("article_entities", lambda: make_table_incremental("article_entities", membership),
+                             ("frame_membership",)))
+    pipeline.add(_table_node(main.ENTITY_MENTIONS_TABLE,
+                             lambda: make_table_incremental(main.ENTITY_MENTIONS_TABLE,
+                                                            partition_signature_sql("article_entities")),
+                             ("article_entities",)))
+    pipeline.add(Node("alias_index", run=lambda: current_index(), output=lambda: current_index().version,
+                      always_run=True))
+    for table in [main.AI_TABLE] + frames:
+        pipeline.add(_table_node(table, lambda table=table: main.make_frame_table(table), ("frame_membership",)))
+        for summary in main.SUMMARIES:
+            inputs = (table,)
+            if summary.__name__ in MENTION_SUMMARIES:
+                inputs += (main.ENTITY_MENTIONS_TABLE,)
+            if summary is main.summarize_by_organization_mention:
+                inputs += ("alias_index",)
+            if summary is main.summarize_percent_ai_by_year:
+                inputs += (main.AI_DENOMINATORS_TABLE,)
+            suffix = summary.__name__[len("summarize_"):]
+            pipeline.add(Node(f"{table}:{suffix}",
+                              run=lambda summary=summary, table=table: summary(table),
+                              output=lambda table=table, suffix=suffix: _file_fingerprint(
+                                  main.latest_summary_path(table, suffix)),
+                              inputs=inputs,
+                              version=_code_version(summary)))
+    if not charts:
+        return pipeline
+    # render_charts only redraws the charts whose data changed
+    pipeline.add(Node("charts",
+                      run=lambda: render_saved_charts(frames, font_path=font_path),
+                      output=lambda: _file_fingerprint(CHART_DIR / CHART_MANIFEST),
+                      inputs=tuple(f"{table}:{suffix}" for table in frames for suffix in CHART_SUMMARIES)
+                      + (f"{main.AI_TABLE}:by_year",),
+                      always_run=True))
+    return pipeline
+
+
+def print_report(pipeline: Pipeline, report: pd.DataFrame):
+    with pd.option_context("display.max_rows", None, "display.width", 200, "display.max_colwidth", 80):
+        print(report.round({"start": 2, "seconds": 2}).to_string(index=False))
+    path_seconds, path = pipeline.critical_path(report)
+    counts = report["status"].value_counts()
+    print(", ".join(f"{count} {status}" for status, count in counts.items()))
+    print(f"Wall time {report.attrs['wall_seconds']:.1f}s; all nodes {report['seconds'].sum():.1f}s; "
+          f"critical path {path_seconds:.1f}s: {' -> '.join(path)}")
+
+
+def _table_node(table: str, build: Callable[[], object], inputs: Tuple[str, ...] = ()) -> Node:
+    return Node(table, run=build, output=lambda: _table_fingerprint(table), inputs=inputs, always_run=True)
+
+
+def _table_fingerprint(table: str) -> Optional[str]:
+    from bq import get_backend, read_query, using_bigquery
+    modified = get_backend().table_modified(f"{DATASET_ID}.{table}")
+    if modified is None or using_bigquery():
+        # Incremental builds leave an unchanged table's last-modified time alone
+        return modified
+    # The local backend rebuilds every table in full, so fingerprint its rows instead, in any order. DuckDB hashes
+    # them where they are, so only one row comes back
+    sql = f"""\
+    SELECT
+      COUNT(*) AS n,
+      CAST(SUM(CAST(hash(t) AS HUGEINT)) AS VARCHAR) AS total
+    FROM
+      {DATASET_ID}.{table} AS t
+    """
+    row = read_query(sql, use_cache=False, step=f"{table} fingerprint").to_pydict()
+    return f"{row['n'][0]}:{row['total'][0]}"
+
+
+def _file_fingerprint(path: Optional[Path]) -> Optional[str]:
+    if path is None or not path.exists():
+        return None
+    stat = path.stat()
+    return f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _fingerprint(parts: List[str]) -> str:
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()[:16]
+
+
+def _code_version(function: Callable) -> str:
+    return _fingerprint([inspect.getsource(function)])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", nargs="*", help="Frames to build. Defaults to every frame in the frame spec.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Maximum steps running at once.")
+    parser.add_argument("--force", action="store_true", help="Run every step, even if it's up to date.")
+    parser.add_argument("--no-charts", action="store_true", help="Stop at the summaries.")
+    parser.add_argument("--font-path", type=str, help="Font for the charts, e.g. Roboto-Regular.ttf.")
+    parser.add_argument("--local", type=str, nargs="?", const=str(LOCAL_DATA_DIR),
+                        help="Run every query locally on the Parquet tables in this directory instead of in BigQuery.")
+    args = parser.parse_args()
+    from bq import create_bqstorage_client, create_client, set_backend, using_bigquery
+    if args.local is not None:
+        from backends import LocalBackend
+        set_backend(LocalBackend(args.local))
+    if using_bigquery():
+        # Create the shared clients up front, rather than racing to create them in the worker threads
+        create_client()
+        create_bqstorage_client()
+    pipeline = build_pipeline(args.frames, charts=not args.no_charts, font_path=args.font_path)
+    print(f"Running {len(pipeline.nodes)} steps in {PROJECT_ID}.{DATASET_ID} with {args.workers} workers")
+    report = pipeline.run(args.workers, force=args.force)
+    print_report(pipeline, report)
+    if (report["status"].isin(["failed", "blocked"])).any():
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
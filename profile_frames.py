@@ -0,0 +1,187 @@
+"""Profile what each of a frame's keyword regexes costs, and what it adds to the frame.
+
+Every regex of every keyword is run on every article of a local raw_news sample that passes the frame's AI gate and
+exclusions, and timed. A pattern's cost is the fastest of ``--repeat`` runs. Each pattern is reported with its time
+and share of the frame's keyword time, its match rate, and its unique hits: the frame hits that would be lost if the
+pattern were cut from its keyword, with the frame's hit condition evaluated as written. A pattern that takes much of
+the time but has no unique hits (because other keywords always match the same articles) is the one to cut or
+rewrite. Keywords are reported the same way, as if cut whole.
+
+Matching uses the same compiled patterns as frame_matcher.py, read from the frame spec, so no BigQuery is needed:
+
+    python3 profile_frames.py raw_news.parquet [--frames competition] [--limit 20000] [--output profile.csv]
+
+The sample can be an export of raw_news or written by synthetic.py. Timings are for Python's ``re``. BigQuery's RE2
+has different constant factors, but the same patterns are the expensive ones.
+"""
+import argparse
+import ast
+import time
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from frame_matcher import in_corpus, load_batch, read_batches
+from frames import CompiledFrame, Frame, article_text, load_frames
+
+DEFAULT_LIMIT = 20_000
+DEFAULT_REPEAT = 3
+# Columns of the profile, one row per pattern
+PROFILE_COLUMNS = ["frame", "keyword", "pattern", "seconds", "share_of_time", "us_per_article", "matches",
+                   "match_rate", "unique_hits", "keyword_seconds", "keyword_unique_hits"]
+
+
+def load_sample(path, limit: Optional[int] = DEFAULT_LIMIT) -> List[dict]:
+    """
+    Read the articles of a raw_news extract that are in the analytic corpus.
+    :param path: JSONL or Parquet extract.
+    :param limit: Most articles to read. ``None`` for all of them.
+    :return: raw_news records.
+    """
+    articles = []
+    for batch in read_batches(path):
+        articles.extend(article for article in load_batch(batch) if in_corpus(article))
+        if limit is not None and len(articles) >= limit:
+            return articles[:limit]
+    return articles
+
+
+def profile_frame(frame: Union[Frame, CompiledFrame], articles: List[dict],
+                  repeat: int = DEFAULT_REPEAT) -> pd.DataFrame:
+    """
+    Time every keyword pattern of a frame on the articles that pass its gate and exclusions.
+    :param frame: Frame.
+    :param articles: raw_news records from :func:`load_sample`.
+    :param repeat: Times to run each pattern; the fastest is reported.
+    :return: One row per pattern with the :data:`PROFILE_COLUMNS`, most expensive first. ``attrs`` has the number
+        of ``articles``, ``gated`` articles the keywords ran on, frame ``hits``, and ``gate_seconds``.
+    """
+    compiled = frame if isinstance(frame, CompiledFrame) else frame.compile()
+    texts = [article_text(a.get("title"), a.get("subTitle"), a.get("content"), compiled.frame.trim_text)
+             for a in articles]
+    gate_seconds, gated = _time_pattern(compiled.gate, texts, repeat)
+    source_names = [(a.get("source") or {}).get("name") for a in articles]
+    texts = [text for text, source_name, in_gate in zip(texts, source_names, gated)
+             if in_gate and not any(excluded({"text": text, "source_name": source_name}[column])
+                                    for column, excluded in compiled.exclusions)]
+    pattern_seconds = {}
+    pattern_hits = {}
+    for keyword, patterns in compiled.keywords.items():
+        for i, pattern in enumerate(patterns):
+            pattern_seconds[keyword, i], pattern_hits[keyword, i] = _time_pattern(pattern, texts, repeat)
+    none = np.zeros(len(texts), dtype=bool)
+    keyword_hits = {keyword: np.logical_or.reduce([pattern_hits[keyword, i] for i in range(len(patterns))] + [none])
+                    for keyword, patterns in compiled.keywords.items()}
+    hits = _evaluate(compiled.condition, keyword_hits)
+    total_seconds = sum(pattern_seconds.values())
+    rows = []
+    for keyword, patterns in compiled.keywords.items():
+        keyword_seconds = sum(pattern_seconds[keyword, i] for i in range(len(patterns)))
+        keyword_unique = _lost_hits(compiled.condition, keyword_hits, hits, keyword, none)
+        for i, pattern in enumerate(patterns):
+            others = np.logical_or.reduce([pattern_hits[keyword, j] for j in range(len(patterns)) if j != i] + [none])
+            seconds = pattern_seconds[keyword, i]
+            rows.append({
+                "frame": compiled.name,
+                "keyword": keyword,
+                "pattern": pattern.pattern,
+                "seconds": seconds,
+                "share_of_time": seconds / total_seconds if total_seconds else 0.0,
+                "us_per_article": seconds / len(texts) * 1e6 if texts else 0.0,
+                "matches": int(pattern_hits[keyword, i].sum()),
+                "match_rate": pattern_hits[keyword, i].mean() if texts else 0.0,
+                "unique_hits": _lost_hits(compiled.condition, keyword_hits, hits, keyword, others),
+                "keyword_seconds": keyword_seconds,
+                "keyword_unique_hits": keyword_unique,
+            })
+    df = pd.DataFrame(rows, columns=PROFILE_COLUMNS).sort_values("seconds", ascending=False, ignore_index=True)
+    df.attrs.update(articles=len(articles), gated=len(texts), hits=int(hits.sum()), gate_seconds=gate_seconds)
+    return df
+
+
+def profile_frames(path, frames: Optional[Iterable[str]] = None, limit: Optional[int] = DEFAULT_LIMIT,
+                   repeat: int = DEFAULT_REPEAT) -> Dict[str, pd.DataFrame]:
+    """
+    Profile some frames on a local sample.
+    :param path: JSONL or Parquet extract of raw_news.
+    :param frames: Frames to profile. Defaults to every frame in the frame spec.
+    :param limit: Most articles to read.
+    :param repeat: Times to run each pattern.
+    :return: Frame name -> profile from :func:`profile_frame`.
+    """
+    articles = load_sample(path, limit)
+    return {name: profile_frame(frame, articles, repeat)
+            for name, frame in load_frames(list(frames) if frames else None).items()}
+
+
+def cut_candidates(profile: pd.DataFrame, min_share: float = 0.05) -> pd.DataFrame:
+    """
+    Patterns that take at least ``min_share`` of their frame's keyword time but add no hits of their own.
+    :param profile: Profile from :func:`profile_frame`.
+    :param min_share: Smallest share of the frame's keyword time worth reporting.
+    :return: The matching rows, most expensive first.
+    """
+    return profile[(profile["unique_hits"] == 0) & (profile["share_of_time"] >= min_share)]
+
+
+def _time_pattern(pattern, texts: List[str], repeat: int):
+    best = float("inf")
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        hits = [pattern.search(text) is not None for text in texts]
+        best = min(best, time.perf_counter() - start)
+    return best, np.array(hits, dtype=bool)
+
+
+def _lost_hits(condition: ast.expr, keyword_hits: Dict[str, np.ndarray], hits: np.ndarray, keyword: str,
+               replacement: np.ndarray) -> int:
+    # Frame hits that turn into misses when the keyword matches only the replacement articles
+    return int((hits & ~_evaluate(condition, {**keyword_hits, keyword: replacement})).sum())
+
+
+def _evaluate(node: ast.expr, keyword_hits: Dict[str, np.ndarray]) -> np.ndarray:
+    # frames._evaluate over arrays of articles instead of one article
+    if isinstance(node, ast.BoolOp):
+        values = [_evaluate(value, keyword_hits) for value in node.values]
+        if isinstance(node.op, ast.And):
+            return np.logical_and.reduce(values)
+        return np.logical_or.reduce(values)
+    return keyword_hits[node.id]
+
+
+def _print_profile(name: str, df: pd.DataFrame):
+    attrs = df.attrs
+    print(f"{name}: {attrs['hits']} hits in {attrs['gated']} of {attrs['articles']} articles past the gate "
+          f"({attrs['gate_seconds']:.3f}s); keywords {df['seconds'].sum():.3f}s")
+    shown = df.assign(pattern=df["pattern"].str.slice(0, 60))
+    with pd.option_context("display.width", 250, "display.max_rows", None):
+        print(shown.drop(columns=["frame"]).round({"seconds": 4, "share_of_time": 3, "us_per_article": 1,
+                                                   "match_rate": 4, "keyword_seconds": 4}).to_string(index=False))
+    candidates = cut_candidates(df)
+    if len(candidates):
+        print("Expensive patterns with no unique hits:")
+        for row in candidates.itertuples():
+            print(f"  {row.keyword}: {row.pattern[:60]} ({row.share_of_time:.0%} of the time)")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input_path", type=str, help="A JSONL or Parquet extract of raw_news.")
+    parser.add_argument("-f", "--frames", nargs="+", help="The frames to profile. Defaults to all of them.")
+    parser.add_argument("-n", "--limit", type=int, default=DEFAULT_LIMIT,
+                        help="Most articles to read from the extract.")
+    parser.add_argument("-r", "--repeat", type=int, default=DEFAULT_REPEAT,
+                        help="Times to run each pattern; the fastest is reported.")
+    parser.add_argument("-o", "--output", type=str, help="Also write every frame's profile to this CSV.")
+    args = parser.parse_args()
+    profiles = profile_frames(args.input_path, args.frames, args.limit, args.repeat)
+    for name, df in profiles.items():
+        _print_profile(name, df)
+    if args.output:
+        pd.concat(profiles.values(), ignore_index=True).to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""A local cache for query results, keyed on the query and the state of the tables it reads.
+
+A cache key is a hash of the normalized SQL, the job configuration, and the last-modified time of every table the
+query references, which a (free) dry run reports. Editing a query or rebuilding one of its inputs therefore misses the
+cache, while re-running an unchanged analysis costs nothing. Results are stored as Parquet and evicted least recently
+used first once the cache grows past its size limit.
+
+Written tables are cached too: instead of the data, the entry records the job that wrote the destination table and
+the table's last-modified time, so a hit can hand back that job as long as nobody has touched the table since.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from google.cloud import bigquery
+from google.cloud.bigquery.job import QueryJob
+
+from backends import empty_batch
+from settings import CACHE_DIR, CACHE_MAX_BYTES
+
+
+class QueryCache:
+
+    def __init__(self, directory: Union[str, Path] = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        """
+        :param directory: Where to store cached results.
+        :param max_bytes: Size limit for the cache directory, above which least recently used results are evicted.
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def key(self, client: bigquery.Client, sql: str, **config_kw) -> str:
+        """
+        Compute the cache key for a query.
+        :param client: BQ API Client, for a dry run and table metadata.
+        :param sql: Query SQL.
+        :param config_kw: Job configuration that affects the result, e.g. ``query_parameters`` or the destination.
+        :return: Hex digest.
+        """
+        dry_run_config = {k: v for k, v in config_kw.items() if k in ("query_parameters", "default_dataset")}
+        job = client.query(sql, job_config=bigquery.QueryJobConfig(dry_run=True,
+                                                                   use_query_cache=False,
+                                                                   use_legacy_sql=False,
+                                                                   **dry_run_config))
+        tables = sorted(f"{ref.project}.{ref.dataset_id}.{ref.table_id}" for ref in job.referenced_tables)
+        state = {
+            "sql": normalize_sql(sql),
+            "config": json.dumps(config_kw, sort_keys=True, default=_to_json),
+            "tables": {table: _modified(client.get_table(table)) for table in tables},
+        }
+        return hashlib.sha256(json.dumps(state, sort_keys=True).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[pa.Table]:
+        """Read a cached result, or return ``None`` on a miss."""
+        path = self._path(key, ".parquet")
+        try:
+            table = pq.read_table(path)
+        except (FileNotFoundError, OSError):
+            return None
+        _touch(path)
+        return table
+
+    def get_batches(self, key: str, batch_rows: int) -> Optional[Iterator[pa.RecordBatch]]:
+        """Read a cached result a batch at a time, or return ``None`` on a miss."""
+        path = self._path(key, ".parquet")
+        try:
+            parquet_file = pq.ParquetFile(path)
+        except (FileNotFoundError, OSError):
+            return None
+        _touch(path)
+        return iter_parquet_batches(parquet_file, batch_rows)
+
+    def put(self, key: str, table: pa.Table):
+        """Store a result and evict old ones if the cache is over its size limit."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=self.directory, suffix=".tmp", delete=False) as f:
+            pq.write_table(table, f.name)
+        os.replace(f.name, self._path(key, ".parquet"))
+        self.evict()
+
+    def get_job(self, client: bigquery.Client, key: str) -> Optional[QueryJob]:
+        """
+        Look up the job that wrote a table, if the table hasn't changed since.
+        :param client: BQ API Client.
+        :param key: Cache key of the write.
+        :return: Completed QueryJob, or ``None`` on a miss.
+        """
+        path = self._path(key, ".json")
+        try:
+            entry = json.loads(path.read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+        try:
+            destination = client.get_table(entry["destination"])
+        except Exception:
+            return None
+        if _modified(destination) != entry["modified"]:
+            return None
+        _touch(path)
+        return client.get_job(entry["job_id"], location=entry["location"])
+
+    def put_job(self, client: bigquery.Client, key: str, job: QueryJob):
+        """Record the job that wrote a table."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        destination = job.destination
+        table_id = f"{destination.project}.{destination.dataset_id}.{destination.table_id}"
+        entry = {
+            "job_id": job.job_id,
+            "location": job.location,
+            "destination": table_id,
+            "modified": _modified(client.get_table(table_id)),
+        }
+        self._path(key, ".json").write_text(json.dumps(entry))
+
+    def invalidate(self, key: str):
+        """Drop a cached result."""
+        for suffix in (".parquet", ".json"):
+            self._path(key, suffix).unlink(missing_ok=True)
+
+    def clear(self):
+        """Drop every cached result."""
+        for path in self._entries():
+            path.unlink(missing_ok=True)
+
+    def size(self) -> int:
+        return sum(_size(path) for path in self._entries())
+
+    def evict(self):
+        """Drop least recently used results until the cache fits in its size limit."""
+        entries = sorted(self._entries(), key=_mtime)
+        total = sum(_size(path) for path in entries)
+        for path in entries:
+            if total <= self.max_bytes:
+                break
+            total -= _size(path)
+            path.unlink(missing_ok=True)
+
+    def _path(self, key: str, suffix: str) -> Path:
+        return self.directory / f"{key}{suffix}"
+
+    def _entries(self):
+        if not self.directory.exists():
+            return []
+        return [p for p in self.directory.iterdir() if p.suffix in (".parquet", ".json")]
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace, so reformatting a query doesn't miss the cache."""
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+def iter_parquet_batches(parquet_file: pq.ParquetFile, batch_rows: int) -> Iterator[pa.RecordBatch]:
+    """
+    Read a Parquet file a row group at a time, in batches of at most ``batch_rows`` rows.
+
+    ``ParquetFile.iter_batches`` would do, but it needs pyarrow 3.0. Batches don't span row groups, so at most a row
+    group is in memory at once. A file with no rows is one empty batch with the file's columns.
+    :param parquet_file: Parquet file.
+    :param batch_rows: Most rows per batch.
+    :return: Lazy iterator of record batches.
+    """
+    empty = True
+    for row_group in range(parquet_file.num_row_groups):
+        for batch in parquet_file.read_row_group(row_group).to_batches(batch_rows):
+            empty = False
+            yield batch
+    if empty:
+        yield empty_batch(parquet_file.schema_arrow)
+
+
+def _modified(table) -> Optional[str]:
+    return table.modified.isoformat() if table.modified is not None else None
+
+
+def _to_json(value):
+    if hasattr(value, "to_api_repr"):
+        return value.to_api_repr()
+    return repr(value)
+
+
+def _touch(path: Path):
+    # Reading an entry makes it the most recently used
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+
+def _size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+def _mtime(path: Path) -> float:
+    try:
+        return path.stat().st_mtime
+    except FileNotFoundError:
+        return 0
@@ -0,0 +1,132 @@
+"""A JSONL log of the cost and latency of every BigQuery job the pipeline runs.
+
+bq.py appends one record per query: what it was for, how long it took, and the job statistics BigQuery reports (bytes
+processed and billed, slot time, whether BigQuery's own cache answered it), or that the local query cache did. Reading
+the log back shows which steps are expensive and whether a change made one more so:
+
+    python3 query_metrics.py [--since 2021-06-01]
+
+To check what a change saved, e.g. a new table layout, compare the bytes each step processed before and after it:
+
+    python3 query_metrics.py --compare-at 2021-06-01T12:00
+"""
+import argparse
+import json
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional, Union
+
+import pandas as pd
+
+from settings import METRICS_LOG
+
+# Job statistics to record, by QueryJob attribute
+JOB_STATISTICS = ("total_bytes_processed", "total_bytes_billed", "slot_millis", "cache_hit")
+
+
+class BudgetExceeded(Exception):
+    """A query's dry-run estimate is over the bytes budget, so it wasn't run."""
+
+    def __init__(self, step: str, estimated_bytes: int, budget_bytes: int):
+        self.step = step
+        self.estimated_bytes = estimated_bytes
+        self.budget_bytes = budget_bytes
+        super().__init__(f"{step} would process {estimated_bytes / 1e9:.1f} GB, over the budget of "
+                         f"{budget_bytes / 1e9:.1f} GB")
+
+
+class MetricsLog:
+
+    def __init__(self, path: Optional[Union[str, Path]] = METRICS_LOG):
+        """
+        :param path: JSONL file to append to. If ``None``, nothing is recorded.
+        """
+        self.path = Path(path) if path is not None else None
+        self._lock = threading.Lock()
+
+    def record(self, step: str, kind: str, wall_seconds: float, job=None, **fields) -> dict:
+        """
+        Append a record for one query.
+        :param step: What the query was for, e.g. the destination table or summary name.
+        :param kind: ``"write"``, ``"read"`` or ``"query"``.
+        :param wall_seconds: Time from submitting the query to having its result.
+        :param job: The QueryJob, if one ran. Statistics a job (or a fake one) doesn't have are recorded as ``None``.
+        :param fields: Anything else to record, e.g. ``local_cache_hit`` or ``estimated_bytes``.
+        :return: The record.
+        """
+        entry = {
+            "time": datetime.now(timezone.utc).isoformat(),
+            "step": step,
+            "kind": kind,
+            "wall_seconds": round(wall_seconds, 3),
+            "job_id": getattr(job, "job_id", None),
+            **{name: getattr(job, name, None) for name in JOB_STATISTICS},
+            **fields,
+        }
+        if self.path is not None:
+            line = json.dumps(entry, default=str) + "\n"
+            with self._lock:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with self.path.open("a") as f:
+                    f.write(line)
+        return entry
+
+    def read(self) -> pd.DataFrame:
+        """Read every record, oldest first."""
+        if self.path is None or not self.path.exists():
+            return pd.DataFrame(columns=["time", "step", "kind", "wall_seconds", "job_id", *JOB_STATISTICS])
+        with self.path.open() as f:
+            return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+
+
+def summarize(log: pd.DataFrame, since: Optional[str] = None) -> pd.DataFrame:
+    """
+    Total cost and latency by step, most bytes billed first.
+    :param log: Records from :meth:`MetricsLog.read`.
+    :param since: Only include records from this ISO date or time onwards.
+    :return: ``step``, ``runs``, ``total_bytes_processed``, ``total_bytes_billed``, ``slot_millis`` and
+        ``wall_seconds``.
+    """
+    if since is not None:
+        log = log[log["time"] >= since]
+    totals = ["total_bytes_processed", "total_bytes_billed", "slot_millis", "wall_seconds"]
+    df = log.groupby("step", as_index=False).agg(runs=("kind", "size"), **{c: (c, "sum") for c in totals})
+    return df.sort_values(["total_bytes_billed", "wall_seconds"], ascending=False, ignore_index=True)
+
+
+def compare(log: pd.DataFrame, at: str) -> pd.DataFrame:
+    """
+    Bytes processed per run of each query before and after a change, largest saving first. Queries that only ran on
+    one side of the change come last. Runs answered from a cache, which process nothing, are left out.
+    :param log: Records from :meth:`MetricsLog.read`.
+    :param at: ISO date or time of the change.
+    :return: ``step``, ``runs_before``, ``bytes_before``, ``runs_after``, ``bytes_after`` and ``saving``, the fraction
+        of the bytes per run saved.
+    """
+    cached = log["cache_hit"].fillna(False).astype(bool)
+    if "local_cache_hit" in log:
+        cached |= log["local_cache_hit"].fillna(False).astype(bool)
+    log = log[~cached & log["kind"].isin(["read", "query"]) & log["total_bytes_processed"].notna()]
+    after = log["time"] >= at
+    periods = [log[~after].groupby("step")["total_bytes_processed"].agg(runs_before="size", bytes_before="mean"),
+               log[after].groupby("step")["total_bytes_processed"].agg(runs_after="size", bytes_after="mean")]
+    df = pd.concat(periods, axis=1).reset_index()
+    df["saving"] = 1 - df["bytes_after"] / df["bytes_before"]
+    return df.sort_values(["saving", "step"], ascending=[False, True], na_position="last", ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--log", type=str, default=str(METRICS_LOG), help="Metrics log to read.")
+    parser.add_argument("--since", type=str, help="Only include queries from this ISO date or time onwards.")
+    parser.add_argument("--compare-at", type=str,
+                        help="Compare bytes processed per query before and after this ISO date or time.")
+    args = parser.parse_args()
+    log = MetricsLog(args.log).read()
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(compare(log, args.compare_at) if args.compare_at else summarize(log, args.since))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""Render every chart from the by-year summaries, headlessly and in parallel.
+
+frame_by_year.py and frame_counts.py draw one chart per run, from CSVs laid out by hand. Here the summaries main.py
+computes (or saved to ``analysis``) go straight to every chart:
+
+- ``by_year`` and ``percent_ai_by_year``: every frame side by side, as frame_by_year.py draws them
+- ``<frame>_by_year`` and ``<frame>_percent_ai_by_year``: one frame each
+- ``total_counts`` and ``percent_counts``: each frame's total, and its share of every AI article, as frame_counts.py
+  draws them
+
+Charts are drawn with the Agg backend in a process pool. Each worker loads matplotlib and the font once. Axes cover the
+years in the data. Each chart's inputs are fingerprinted, and a chart whose data, font and drawing code haven't changed
+since it was last drawn (per ``.render_manifest.json`` next to the charts) isn't drawn again.
+
+    python3 render_charts.py [--frames competition killer_robots] [--workers 4] [--font-path Roboto-Regular.ttf]
+"""
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+import textwrap
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+import pandas as pd
+
+from settings import CHART_DIR
+
+CHART_MANIFEST = ".render_manifest.json"
+# Summaries the charts are drawn from
+CHART_SUMMARIES = ("by_year", "percent_ai_by_year")
+
+_font_path = None
+
+
+@dataclass
+class Chart:
+    """A chart and the data it's drawn from."""
+    # Output file name, without the extension
+    name: str
+    # "by_year" for frame_by_year.py's line charts, "counts" for frame_counts.py's bar chart
+    kind: str
+    percent: bool
+    frames: List[str]
+    # Years, for by_year charts, or bar labels
+    x: list
+    # One list of values per frame for by_year charts, or one value per bar
+    y: list
+
+    def fingerprint(self, font_path: str) -> str:
+        content = json.dumps([asdict(self), font_path, _code_version()], sort_keys=True, default=str)
+        return hashlib.sha256(content.encode()).hexdigest()[:16]
+
+
+def chart_specs(summaries: Dict[str, Dict[str, Union[pd.DataFrame, Iterable[pd.DataFrame]]]],
+                ai_by_year: Optional[pd.DataFrame] = None) -> List[Chart]:
+    """
+    Every chart the summaries can be drawn as.
+    :param summaries: Frame -> summary CSV suffix (e.g. ``"by_year"``) -> summary, as main.py computes them. Lazy
+        iterators of DataFrames, from ``main.py --stream``, are read in full.
+    :param ai_by_year: The ``artificial_intelligence`` table's by-year summary, for ``percent_counts``. If missing, that
+        chart is left out.
+    :return: Charts.
+    """
+    frames = [frame for frame in summaries if "by_year" in summaries[frame]]
+    by_year = {frame: _dataframe(summaries[frame]["by_year"]) for frame in frames}
+    percents = {frame: _dataframe(summaries[frame]["percent_ai_by_year"]) for frame in frames
+                if "percent_ai_by_year" in summaries[frame]}
+    charts = []
+    for kind, data, column in (("by_year", by_year, "count"), ("percent_ai_by_year", percents, "percent")):
+        if not data:
+            continue
+        # Every frame over the same years, so the subplots line up
+        years = sorted(set().union(*(df["year"].dropna().astype(int) for df in data.values())))
+        values = {frame: _by_year_values(df, years, column) for frame, df in data.items()}
+        percent = column == "percent"
+        charts.append(Chart(kind, "by_year", percent, list(data), years, list(values.values())))
+        for frame, y in values.items():
+            charts.append(Chart(f"{frame}_{kind}", "by_year", percent, [frame], years, [y]))
+    totals = [int(by_year[frame]["count"].sum()) for frame in frames]
+    labels = [_bar_label(frame) for frame in frames]
+    if frames:
+        charts.append(Chart("total_counts", "counts", False, frames, labels, totals))
+    if frames and ai_by_year is not None:
+        ai_total = _dataframe(ai_by_year)["count"].sum()
+        charts.append(Chart("percent_counts", "counts", True, frames, labels,
+                            [float(total / ai_total * 100) for total in totals]))
+    return charts
+
+
+def render_charts(summaries: Dict[str, Dict[str, Union[pd.DataFrame, Iterable[pd.DataFrame]]]],
+                  ai_by_year: Optional[pd.DataFrame] = None,
+                  output_dir: Union[str, Path] = CHART_DIR,
+                  font_path: Optional[str] = None,
+                  workers: Optional[int] = None,
+                  force=False) -> List[Path]:
+    """
+    Draw every chart of the summaries whose inputs changed since it was last drawn.
+    :param summaries: Frame -> summary CSV suffix -> summary; see :func:`chart_specs`.
+    :param ai_by_year: The ``artificial_intelligence`` table's by-year summary, for ``percent_counts``.
+    :param output_dir: Directory to write the PNGs to.
+    :param font_path: Font file. Defaults to matplotlib's DejaVu Sans.
+    :param workers: Number of worker processes. Defaults to the number of CPUs.
+    :param force: Draw every chart, even if it's up to date.
+    :return: Charts drawn.
+    """
+    return render(chart_specs(summaries, ai_by_year), output_dir, font_path, workers, force)
+
+
+def render(charts: List[Chart],
+           output_dir: Union[str, Path] = CHART_DIR,
+           font_path: Optional[str] = None,
+           workers: Optional[int] = None,
+           force=False) -> List[Path]:
+    """
+    Draw charts in a process pool, skipping charts that are up to date.
+    :param charts: Charts from :func:`chart_specs`.
+    :param output_dir: Directory to write the PNGs to.
+    :param font_path: Font file. Defaults to matplotlib's DejaVu Sans.
+    :param workers: Number of worker processes. Defaults to the number of CPUs.
+    :param force: Draw every chart, even if it's up to date.
+    :return: Charts drawn.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    font_path = font_path or default_font_path()
+    manifest_path = output_dir / CHART_MANIFEST
+    manifest = _read_manifest(manifest_path)
+    fingerprints = {chart.name: chart.fingerprint(font_path) for chart in charts}
+    stale = [chart for chart in charts
+             if force or manifest.get(chart.name) != fingerprints[chart.name]
+             or not (output_dir / f"{chart.name}.png").exists()]
+    if not stale:
+        return []
+    workers = min(workers or os.cpu_count(), len(stale))
+    # Spawned rather than forked, since this may be called from a thread (e.g. by pipeline.py)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"), initializer=_init_worker,
+                             initargs=(font_path,)) as executor:
+        paths = list(executor.map(_render, stale, [output_dir] * len(stale)))
+    manifest.update({chart.name: fingerprints[chart.name] for chart in stale})
+    _write_manifest(manifest_path, manifest)
+    return paths
+
+
+def load_summaries(frames: Optional[List[str]] = None) -> Dict[str, Dict[str, pd.DataFrame]]:
+    """
+    Read the latest by-year summaries of some frames, and of the ``artificial_intelligence`` table, from ``analysis``.
+    :param frames: Frames. Defaults to every frame in the frame spec.
+    :return: Frame -> summary CSV suffix -> summary, including :data:`main.AI_TABLE`. Frames without a by-year
+        summary are left out.
+    """
+    from main import AI_TABLE, FRAMES, latest_summary_path
+    summaries = {}
+    for table_name in (frames or FRAMES) + [AI_TABLE]:
+        paths = {suffix: latest_summary_path(table_name, suffix) for suffix in CHART_SUMMARIES}
+        summaries[table_name] = {suffix: _read_summary(path) for suffix, path in paths.items() if path is not None}
+    return {table_name: tables for table_name, tables in summaries.items() if "by_year" in tables}
+
+
+def render_saved_charts(frames: Optional[List[str]] = None, **kw) -> List[Path]:
+    """
+    Draw every chart of the latest saved summaries of some frames.
+    :param frames: Frames. Defaults to every frame in the frame spec.
+    :param kw: Passed to :func:`render_charts`.
+    :return: Charts drawn.
+    """
+    from main import AI_TABLE
+    summaries = load_summaries(frames)
+    ai = summaries.pop(AI_TABLE, {})
+    return render_charts(summaries, ai.get("by_year"), **kw)
+
+
+def default_font_path() -> str:
+    import matplotlib
+    return str(Path(matplotlib.get_data_path(), "fonts", "ttf", "DejaVuSans.ttf"))
+
+
+def _init_worker(font_path: str):
+    global _font_path
+    import matplotlib
+    matplotlib.use("Agg")
+    import frame_by_year
+    import frame_counts  # noqa: F401
+    _font_path = font_path
+    # Parse the font once per worker; the charts reuse the cached FontProperties
+    for size in (15, 16):
+        frame_by_year.font_properties(font_path, size)
+
+
+def _render(chart: Chart, output_dir: Path) -> Path:
+    import matplotlib.pyplot as plt
+    import frame_by_year
+    import frame_counts
+    path = output_dir / f"{chart.name}.png"
+    if chart.kind == "by_year":
+        fig = frame_by_year.plot_data(chart.x, chart.y, chart.percent, chart.frames, _font_path, str(path),
+                                      show=False)
+    else:
+        fig = frame_counts.make_chart(chart.x, chart.y, chart.percent, _font_path, str(path), show=False)
+    plt.close(fig)
+    return path
+
+
+def _dataframe(summary: Union[pd.DataFrame, Iterable[pd.DataFrame]]) -> pd.DataFrame:
+    if isinstance(summary, pd.DataFrame):
+        return summary
+    return pd.concat(list(summary), ignore_index=True)
+
+
+def _read_summary(path: Path) -> pd.DataFrame:
+    return pd.read_parquet(path) if path.suffix == ".parquet" else pd.read_csv(path)
+
+
+def _by_year_values(df: pd.DataFrame, years: List[int], column: str) -> List[float]:
+    # Years without articles are 0, like the 2013 row some of the percent queries add
+    values = df.dropna(subset=["year"]).astype({"year": int}).set_index("year")[column]
+    values = values.reindex(years, fill_value=0)
+    if column == "percent":
+        return [float(value) * 100 for value in values]
+    return [int(value) for value in values]
+
+
+def _bar_label(frame: str) -> str:
+    # e.g. "Economic Gold\nRush", so the bar labels don't overlap
+    return textwrap.fill(" ".join(frame.split("_")).title(), 13)
+
+
+def _code_version() -> str:
+    import frame_by_year
+    import frame_counts
+    source = inspect.getsource(frame_by_year) + inspect.getsource(frame_counts)
+    return hashlib.sha256(source.encode()).hexdigest()[:16]
+
+
+def _read_manifest(path: Path) -> Dict[str, str]:
+    try:
+        return json.loads(path.read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_manifest(path: Path, manifest: Dict[str, str]):
+    with tempfile.NamedTemporaryFile("w", dir=path.parent, suffix=".tmp", delete=False) as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(f.name, path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", nargs="*", help="Frames to chart. Defaults to every frame in the frame spec.")
+    parser.add_argument("--output-dir", type=str, default=str(CHART_DIR), help="Directory to write the charts to.")
+    parser.add_argument("--font-path", type=str, help="Font for the charts, e.g. Roboto-Regular.ttf.")
+    parser.add_argument("--workers", type=int, help="Number of worker processes. Defaults to the number of CPUs.")
+    parser.add_argument("--force", action="store_true", help="Draw every chart, even if it's up to date.")
+    args = parser.parse_args()
+    paths = render_saved_charts(args.frames, output_dir=args.output_dir, font_path=args.font_path,
+                                workers=args.workers, force=args.force)
+    print(f"Drew {len(paths)} charts" + "".join(f"\n{path}" for path in paths))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,22 @@ from pathlib import Path
 PROJECT_DIR = Path(__file__).parent.resolve().expanduser().absolute()
 SQL_DIR = PROJECT_DIR / "data"
 ANALYSIS_DIR = PROJECT_DIR / "analysis"
+CHART_DIR = ANALYSIS_DIR / "charts"
+CACHE_DIR = PROJECT_DIR / ".query_cache"
+ALIAS_INDEX_DIR = PROJECT_DIR / ".alias_index"
+KEYWORD_INDEX_DIR = PROJECT_DIR / ".keyword_index"
+METRICS_LOG = PROJECT_DIR / "query_metrics.jsonl"
+# Fingerprints of what each pipeline.py step last read and wrote
+PIPELINE_STATE = PROJECT_DIR / ".pipeline_state.json"
+BENCHMARK_DIR = PROJECT_DIR / "benchmarks"
+# Parquet tables for the local query backend, one directory per dataset
+LOCAL_DATA_DIR = PROJECT_DIR / "local_data"
 
 PROJECT_ID = "gcp-cset-projects"
 DATASET_ID = "rhetorical_frames"
+
+# Size limit for the local query result cache, above which least recently used results are evicted
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# Queries whose dry-run estimate is over this many bytes aren't run. None means no limit.
+QUERY_BUDGET_BYTES = None
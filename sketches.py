@@ -0,0 +1,190 @@
+"""Approximate distinct article counts from mergeable HyperLogLog++ sketches.
+
+Every exact summary counts ``COUNT(DISTINCT duplicateGroupId)`` over a frame table, and the percent-of-AI summaries
+over the whole ``artificial_intelligence`` table too. The ``frame_sketches`` table instead keeps one
+``HLL_COUNT.INIT`` sketch of the duplicateGroupIds in each frame (and in the AI set, as frame
+``artificial_intelligence``) per year and source. Sketches merge, so the count for any combination of those, e.g. a
+frame by year, a frame by source, or a frame's total, is ``HLL_COUNT.MERGE`` over a few of its small rows, without
+reading any articles.
+
+A count from a sketch of precision ``p`` has a relative standard error of about ``1.04 / sqrt(2 ** p)``: 0.81% at the
+default precision of 14, so about 95% of counts are within 1.6% of the exact count. Small counts are kept in HLL++'s
+more precise sparse representation and tend to be closer, but no count from a sketch is guaranteed to be exact. A
+percentage of AI articles divides two such estimates, so its relative error is at most about the sum of theirs. Use
+the exact summaries in main.py for published numbers.
+
+With the local backend, sketches are lists of the distinct values and every count is exact.
+
+    python3 sketches.py competition --by year source_name [--percent-ai]
+"""
+import argparse
+import math
+from typing import Iterable, List, Optional, Sequence
+
+import pandas as pd
+
+from bq import make_table_incremental, partition_signature_sql, read_query
+from frames import load_frames
+from settings import DATASET_ID, PROJECT_ID
+
+SKETCH_TABLE = "frame_sketches"
+# The frame column value for the sketches of every AI article
+AI_FRAME = "artificial_intelligence"
+# Sketches have 2 ** precision registers; BigQuery allows 10 to 24
+SKETCH_PRECISION = 14
+# Columns counts can be broken down by
+DIMENSIONS = ("year", "source_name")
+
+_approximate = False
+
+
+def set_approximate(enabled: bool):
+    """Compute main.py's year, source and percent-of-AI summaries from the sketches rather than exactly."""
+    global _approximate
+    _approximate = enabled
+
+
+def approximate_enabled() -> bool:
+    return _approximate
+
+
+def relative_error(precision: int = SKETCH_PRECISION) -> float:
+    """Relative standard error of a count from a sketch of this precision."""
+    return 1.04 / math.sqrt(2 ** precision)
+
+
+def sketch_table_sql(frames: Optional[Iterable[str]] = None, precision: int = SKETCH_PRECISION) -> str:
+    """
+    Query for the sketch table.
+    :param frames: Frames to sketch. Defaults to every frame in the frame spec.
+    :param precision: Sketch precision.
+    :return: Query SQL.
+    """
+    frames = list(frames or load_frames())
+    labels = ",\n".join([f'        "{AI_FRAME}"'] + [f'        IF({frame}, "{frame}", NULL)' for frame in frames])
+    return f"""\
+    -- One sketch of distinct articles per frame, year and source. Every row of frame_membership is an AI article.
+    SELECT
+      membership.year,
+      membership.source_name,
+      frame,
+      HLL_COUNT.INIT(membership.duplicateGroupId, {precision}) AS sketch
+    FROM
+      `{PROJECT_ID}.{DATASET_ID}.frame_membership` AS membership
+    CROSS JOIN
+      UNNEST([
+{labels}
+      ]) AS frame
+    WHERE
+      frame IS NOT NULL
+      -- make_table_incremental() narrows this to the year it rebuilds
+      AND /* year: membership.year */ TRUE
+    GROUP BY
+      membership.year,
+      membership.source_name,
+      frame
+    """
+
+
+def make_sketch_table() -> List[int]:
+    """
+    Build the sketch table from frame_membership, rebuilding only the years of frame_membership that changed.
+    :return: Years that were (re)built.
+    """
+    return make_table_incremental(SKETCH_TABLE, partition_signature_sql("frame_membership"), sql=sketch_table_sql())
+
+
+def approximate_counts(frame: str, by: Sequence[str] = ("year",)) -> pd.DataFrame:
+    """
+    Approximate number of distinct articles in a frame, broken down by some dimensions.
+    :param frame: Frame name, or :data:`AI_FRAME`.
+    :param by: Columns from :data:`DIMENSIONS`. If empty, the frame's total.
+    :return: The ``by`` columns and ``count``.
+    """
+    columns = _dimensions(by)
+    group_by = f"GROUP BY\n      {', '.join(columns)}" if columns else ""
+    sql = f"""\
+    SELECT
+      {"".join(f"{column}, " for column in columns)}HLL_COUNT.MERGE(sketch) AS count
+    FROM
+      `{PROJECT_ID}.{DATASET_ID}.{SKETCH_TABLE}`
+    WHERE
+      frame = "{frame}"
+    {group_by}
+    """
+    df = read_query(sql, step=f"{frame} approximate counts").to_pandas()
+    return df.sort_values(columns, ignore_index=True) if columns else df
+
+
+def approximate_percent_ai(frame: str, by: Sequence[str] = ("year",)) -> pd.DataFrame:
+    """
+    Approximate share of AI articles that are in a frame, broken down by some dimensions.
+    :param frame: Frame name.
+    :param by: Columns from :data:`DIMENSIONS`. If empty, the share over every year and source.
+    :return: The ``by`` columns, ``count``, ``ai_count`` and ``percent``, a fraction of ``ai_count``.
+    """
+    columns = _dimensions(by)
+    # NULL sources are a group of their own
+    join = " AND ".join(f"frame_counts.{column} IS NOT DISTINCT FROM ai_counts.{column}" for column in columns)
+    sql = f"""\
+    WITH
+      counts AS (
+      SELECT
+        {", ".join(["frame"] + columns)},
+        HLL_COUNT.MERGE(sketch) AS count
+      FROM
+        `{PROJECT_ID}.{DATASET_ID}.{SKETCH_TABLE}`
+      WHERE
+        frame IN ("{frame}", "{AI_FRAME}")
+      GROUP BY
+        {", ".join(["frame"] + columns)})
+    SELECT
+      {"".join(f"frame_counts.{column}, " for column in columns)}frame_counts.count,
+      ai_counts.count AS ai_count,
+      -- A fraction rather than a percentage, like the exact summary
+      frame_counts.count / ai_counts.count AS percent
+    FROM
+      counts AS frame_counts
+    INNER JOIN
+      counts AS ai_counts
+    ON
+      {join or "TRUE"}
+    WHERE
+      frame_counts.frame = "{frame}"
+      AND ai_counts.frame = "{AI_FRAME}"
+    """
+    df = read_query(sql, step=f"{frame} approximate percent of AI").to_pandas()
+    return df.sort_values(columns, ignore_index=True) if columns else df
+
+
+def _dimensions(by: Sequence[str]) -> List[str]:
+    unknown = set(by) - set(DIMENSIONS)
+    if unknown:
+        raise ValueError(f"Can't break counts down by {', '.join(sorted(unknown))}; use {', '.join(DIMENSIONS)}")
+    return list(by)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("frames", nargs="*", help="Frames to count.")
+    parser.add_argument("--by", nargs="*", default=["year"], choices=DIMENSIONS,
+                        help="Columns to break counts down by.")
+    parser.add_argument("--percent-ai", action="store_true", help="Show the share of AI articles in each frame.")
+    parser.add_argument("--build", action="store_true", help="Rebuild the sketch table from frame_membership first.")
+    parser.add_argument("--local", type=str, help="Query the local Parquet tables in this directory.")
+    args = parser.parse_args()
+    if args.local is not None:
+        from backends import LocalBackend
+        from bq import set_backend
+        set_backend(LocalBackend(args.local))
+    if args.build:
+        make_sketch_table()
+    print(f"Counts are within ±{relative_error():.2%} (one standard error)")
+    for frame in args.frames:
+        df = approximate_percent_ai(frame, args.by) if args.percent_ai else approximate_counts(frame, args.by)
+        print(frame)
+        print(df.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""Compute every summary of a frame in memory, from one download of the frame table.
+
+The ``summarize_*`` functions in main.py each run their own ``COUNT(DISTINCT duplicateGroupId)`` query against the
+frame table. Here the frame's articles and entity mentions are downloaded once, with duplicateGroupId, year, source,
+author and mention columns stored as categorical codes, and each summary is a vectorized distinct count over those
+codes. Ad-hoc breakdowns can be computed from the same extract without querying again.
+
+Output CSVs have the same names and columns as main.py's. Rows with equal counts are ordered by name, where BigQuery
+leaves their order arbitrary.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from authors import count_authors
+from bq import create_bqstorage_client, create_client, read_query, using_bigquery
+from main import AI_DENOMINATORS_TABLE, ENTITY_MENTIONS_TABLE, save_summary
+from org_aliases import AliasIndex, current_index
+from settings import DATASET_ID, PROJECT_ID
+
+ORGANIZATION_TYPES = ("Organization", "Company")
+
+
+class FrameExtract:
+    """A frame's articles and entity mentions, with categorical-coded columns."""
+
+    def __init__(self, articles: pd.DataFrame, mentions: pd.DataFrame, ai_counts: pd.DataFrame,
+                 alias_index: Optional[AliasIndex] = None):
+        """
+        :param articles: ``duplicateGroupId``, ``year``, ``source_name`` and ``author`` of each frame article.
+        :param mentions: Distinct ``duplicateGroupId``, ``entity_type`` and ``value`` of person and organization
+            mentions in the frame.
+        :param ai_counts: ``year`` and ``ai_count``, the number of distinct AI articles by year.
+        :param alias_index: Index for resolving organization mentions to canonical names. Defaults to
+            :func:`org_aliases.current_index`.
+        """
+        self.articles = articles.astype("category")
+        self.mentions = mentions.astype("category")
+        self.ai_counts = ai_counts
+        self.alias_index = alias_index
+
+    @classmethod
+    def download(cls, table_name) -> "FrameExtract":
+        """
+        Download a frame's extract, running its queries concurrently.
+        :param table_name: Frame table.
+        :return: Extract.
+        """
+        queries = {
+            "articles": _articles_sql(table_name),
+            "mentions": _mentions_sql(table_name),
+            "ai_counts": _ai_counts_sql(),
+        }
+        if using_bigquery():
+            create_client()
+            create_bqstorage_client()
+        with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+            futures = {name: executor.submit(read_query, sql, step=f"{table_name} {name}")
+                       for name, sql in queries.items()}
+            alias_index = current_index()
+            tables = {name: future.result().to_pandas() for name, future in futures.items()}
+        return cls(**tables, alias_index=alias_index)
+
+    def by_year(self) -> pd.DataFrame:
+        df = distinct_counts(self.articles["year"], self.articles["duplicateGroupId"], "year")
+        df["percent"] = df["count"] / df["count"].sum()
+        return df.sort_values("year", ignore_index=True)
+
+    def percent_ai_by_year(self) -> pd.DataFrame:
+        counts = distinct_counts(self.articles["year"], self.articles["duplicateGroupId"], "year")
+        counts["year"] = counts["year"].astype(self.ai_counts["year"].dtype)
+        df = counts.merge(self.ai_counts, on="year", how="inner")
+        df["percent"] = df["count"] / df["ai_count"]
+        return df[["year", "percent"]].sort_values("year", ignore_index=True)
+
+    def by_source(self) -> pd.DataFrame:
+        return _by_count(distinct_counts(self.articles["source_name"], self.articles["duplicateGroupId"],
+                                         "source_name"))
+
+    def by_author(self) -> pd.DataFrame:
+        return _by_count(distinct_counts(self.articles["author"], self.articles["duplicateGroupId"], "author"))
+
+    def by_clean_author(self) -> pd.DataFrame:
+        authors = self.articles["author"].astype(str).str.lower().where(self.articles["author"].notna())
+        counts = distinct_counts(authors.astype("category"), self.articles["duplicateGroupId"], "author")
+        return count_authors(counts["author"].where(counts["author"].notna(), None), counts["count"])
+
+    def by_person_mention(self) -> pd.DataFrame:
+        people = self.mentions[self.mentions["entity_type"] == "Person"]
+        return _by_count(distinct_counts(people["value"], people["duplicateGroupId"], "value"))
+
+    def by_organization_mention(self) -> pd.DataFrame:
+        organizations = self.mentions[self.mentions["entity_type"].isin(ORGANIZATION_TYPES)]
+        lowered = organizations["value"].astype(str).str.lower().where(organizations["value"].notna())
+        df = distinct_counts(lowered.astype("category"), organizations["duplicateGroupId"], "organization")
+        alias_index = self.alias_index if self.alias_index is not None else current_index()
+        df["organization"] = alias_index.resolve(df["organization"])
+        # Combining counts of all organizations with the same alias
+        df = df.groupby("organization", dropna=False, sort=False, as_index=False)["count"].sum()
+        return _by_count(df)
+
+    def summaries(self) -> Dict[str, pd.DataFrame]:
+        """
+        Compute every summary.
+        :return: main.py's summary CSV suffix -> summary.
+        """
+        return {
+            "by_year": self.by_year(),
+            "percent_ai_by_year": self.percent_ai_by_year(),
+            "by_source": self.by_source(),
+            "by_person_mention": self.by_person_mention(),
+            "by_author": self.by_author(),
+            "by_clean_author": self.by_clean_author(),
+            "by_organization_mention": self.by_organization_mention(),
+        }
+
+
+def summarize(table_name) -> Dict[str, pd.DataFrame]:
+    """
+    Download a frame once, compute every summary, and save them where main.py would.
+    :param table_name: Frame table.
+    :return: Summary CSV suffix -> summary.
+    """
+    summaries = FrameExtract.download(table_name).summaries()
+    for save_suffix, df in summaries.items():
+        save_summary(df, table_name, save_suffix)
+    return summaries
+
+
+def distinct_counts(keys: pd.Series, ids: pd.Series, name: str) -> pd.DataFrame:
+    """
+    Vectorized ``SELECT keys, COUNT(DISTINCT ids) AS count ... GROUP BY keys``.
+
+    As in SQL, NULL keys form their own group and NULL ids aren't counted.
+    :param keys: Categorical grouping column.
+    :param ids: Categorical column of ids to count.
+    :param name: Name for the grouping column in the output.
+    :return: Grouping column and ``count``.
+    """
+    categories = keys.cat.categories
+    # Shift codes so NULL (-1) becomes group 0
+    key_codes = keys.cat.codes.to_numpy().astype(np.int64) + 1
+    id_codes = ids.cat.codes.to_numpy().astype(np.int64)
+    n_groups = len(categories) + 1
+    valid = id_codes >= 0
+    n_ids = max(len(ids.cat.categories), 1)
+    pairs = np.unique(key_codes[valid] * n_ids + id_codes[valid])
+    counts = np.bincount(pairs // n_ids, minlength=n_groups)
+    present = np.bincount(key_codes, minlength=n_groups) > 0
+    values = pd.Series(np.asarray(categories, dtype=object)).reindex(np.arange(-1, n_groups - 1))
+    return pd.DataFrame({name: values.to_numpy()[present], "count": counts[present]})
+
+
+def _by_count(df: pd.DataFrame) -> pd.DataFrame:
+    key = df.columns[0]
+    return df.sort_values(["count", key], ascending=[False, True], ignore_index=True)
+
+
+def _articles_sql(table_name) -> str:
+    return f"""\
+    SELECT
+      duplicateGroupId,
+      year,
+      source_name,
+      author
+    FROM
+      `{PROJECT_ID}.{DATASET_ID}.{table_name}`
+    """
+
+
+def _mentions_sql(table_name) -> str:
+    return f"""\
+    SELECT DISTINCT
+      frame.duplicateGroupId,
+      -- The entity type, e.g. "Person"
+      mentions.entity_type,
+      -- The names of the entities mentioned
+      mentions.value
+    FROM
+      `{PROJECT_ID}.{DATASET_ID}.{table_name}` AS frame
+    INNER JOIN
+      `{PROJECT_ID}.{DATASET_ID}.{ENTITY_MENTIONS_TABLE}` AS mentions
+    ON
+      mentions.id = frame.id
+    """
+
+
+def _ai_counts_sql() -> str:
+    return f"""\
+    SELECT
+      year,
+      ai_count
+    FROM
+      `{PROJECT_ID}.{DATASET_ID}.{AI_DENOMINATORS_TABLE}`
+    WHERE
+      breakdown = "year"
+    """
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("table_name", type=str, help="The frame table to summarize.")
+    args = parser.parse_args()
+    summarize(args.table_name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""Seeded synthetic `gcp_cset_lexisnexis.raw_news` records, for testing and benchmarking without BigQuery.
+
+Records have the fields the frame queries and frame_matcher.py read, nested as in raw_news: title, subTitle, content,
+language, publishedDate, source (name, category, editorialRank, location.country), author.name and
+semantics.entities[].properties. The text is filler with phrases from the frames' keyword lists planted at fixed rates,
+so every frame and the AI test get hits, and entity mentions include organization aliases that resolve to the same
+name. Most records are in the analytic corpus; the rest fail one of its filters.
+
+The same seed and size always give the same records:
+
+    python3 synthetic.py raw_news.parquet -n 1000000 --seed 0
+"""
+import argparse
+import json
+from datetime import datetime, timedelta, timezone
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Iterator, List, Union
+
+import numpy as np
+
+from frames import COUNTRY, FIRST_YEAR, LANGUAGE, LAST_YEAR
+
+DEFAULT_CHUNK_SIZE = 10_000
+
+# Phrases that set frame keywords, and the probability of planting each one in an article
+FRAME_PHRASES = (
+    "artificial intelligence",
+    "ai revolution",
+    "golden opportunity",
+    "transform the economy",
+    "productivity dividend",
+    "killer robots",
+    "lethal autonomous weapons",
+    "existential risk",
+    "automation will cost jobs",
+    "ai will replace jobs",
+    "unemployment",
+    "reskill",
+    "blue collar",
+    "white collar",
+    "ai arms race",
+    "sputnik moment",
+    "foreign adversaries",
+    "ai dominance",
+    "competition in ai",
+)
+PHRASE_RATE = 0.04
+# Probability of mentioning AI, which every frame requires
+AI_RATE = 0.6
+
+SOURCES = (
+    ("The New York Times", "National", 1),
+    ("The Washington Post", "National", 1),
+    ("USA Today", "National", 1),
+    ("PR Newswire", "Press Wire", 2),
+    ("Business Wire", "Press Wire", 2),
+    ("Defense News", "Trade", 2),
+    ("Wired", "Trade", 1),
+    ("Computerworld", "Trade", 2),
+    ("CQ Congressional Testimony", "National", 2),
+    ("Some Blog", "Blog", 3),
+)
+OTHER_LANGUAGES = ("German", "French", "Spanish")
+OTHER_COUNTRIES = ("United Kingdom", "Canada", "India")
+# Share of records that fail the corpus filter on language, country or year
+OUT_OF_CORPUS_RATE = 0.1
+
+PEOPLE = ("Elon Musk", "Sundar Pichai", "Xi Jinping", "Vladimir Putin", "Andrew Ng", "Fei-Fei Li", "Kai-Fu Lee",
+          "Eric Schmidt", "Stuart Russell", "Demis Hassabis", "Satya Nadella", "Jeff Bezos")
+# Several aliases of the same organizations, as in Lexis Nexis entity data
+ORGANIZATIONS = ("Google", "Alphabet Inc", "Google LLC", "Microsoft", "Microsoft Corp", "OpenAI", "DeepMind",
+                 "Pentagon", "Department of Defense", "DARPA", "MIT", "Massachusetts Institute of Technology",
+                 "Stanford University", "Baidu", "Tencent", "Amazon", "IBM", "United Nations")
+# Canonical names of the organizations above, in the shape of org_aliases.ALIAS_SQL's output
+ORGANIZATION_ALIASES = (
+    ("google", "Alphabet"),
+    ("alphabet inc", "Alphabet"),
+    ("google llc", "Alphabet"),
+    ("microsoft corp", "Microsoft"),
+    ("pentagon", "United States Department of Defense"),
+    ("department of defense", "United States Department of Defense"),
+    ("mit", "Massachusetts Institute of Technology"),
+)
+LOCATIONS = ("Washington", "Beijing", "Silicon Valley", "Geneva", "Moscow")
+
+FIRST_NAMES = ("jane", "john", "maria", "wei", "ahmed", "olga", "sam", "abby", "priya", "luis", "kenji", "ada")
+LAST_NAMES = ("doe", "roe", "smith", "chen", "khan", "ivanova", "lee", "garcia", "patel", "nguyen", "okafor", "berg")
+BYLINES = ("{}", "By {}", "{}, CNN", "{} Staff Writer", "{} and {}", "{}, {}", "{} (Forbes Councils Member)",
+           "{}, Correspondent")
+NO_AUTHOR_RATE = 0.05
+
+SYLLABLES = ("ta", "ri", "mon", "el", "sa", "ko", "ven", "du", "la", "pre", "st", "ng", "or", "ex", "qu", "bi")
+VOCABULARY_SIZE = 5_000
+CONTENT_WORDS = 80
+TITLE_WORDS = 8
+
+# This process's generator, for _serialize_chunk
+_generator = None
+
+
+class ArticleGenerator:
+    """Generates synthetic raw_news records from a seed."""
+
+    def __init__(self, seed=0):
+        """
+        :param seed: Random seed. Every record depends on it and on nothing else.
+        """
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        lengths = rng.integers(1, 4, VOCABULARY_SIZE)
+        self.vocabulary = np.array(["".join(rng.choice(SYLLABLES, k)) for k in lengths], dtype=object)
+        names = [f"{first} {last}" for first in FIRST_NAMES for last in LAST_NAMES]
+        self.authors = np.array([byline.format(*(names[i].title() for i in rng.integers(0, len(names), 2)))
+                                 for byline in BYLINES for _ in range(50)], dtype=object)
+
+    def chunks(self, n: int, chunk_size=DEFAULT_CHUNK_SIZE) -> Iterator[List[dict]]:
+        """
+        Generate records in chunks.
+        :param n: Number of records.
+        :param chunk_size: Records per chunk.
+        :return: Iterator of lists of records.
+        """
+        for start in range(0, n, chunk_size):
+            yield self.chunk(start, min(chunk_size, n - start))
+
+    def chunk(self, start: int, size: int) -> List[dict]:
+        """
+        Generate the records numbered ``start`` to ``start + size``, independently of any other chunk.
+        :param start: Number of the first record.
+        :param size: Number of records.
+        :return: Records.
+        """
+        rng = np.random.default_rng([self.seed, start])
+        words = self.vocabulary[rng.integers(0, VOCABULARY_SIZE, (size, TITLE_WORDS + CONTENT_WORDS))]
+        phrases = rng.random((size, len(FRAME_PHRASES))) < PHRASE_RATE
+        mentions_ai = rng.random(size) < AI_RATE
+        sources = rng.integers(0, len(SOURCES), size)
+        out_of_corpus = np.where(rng.random(size) < OUT_OF_CORPUS_RATE, rng.integers(1, 4, size), 0)
+        years = rng.integers(FIRST_YEAR, LAST_YEAR + 1, size)
+        seconds = rng.integers(0, 365 * 24 * 3600, size)
+        authors = rng.integers(0, len(self.authors), size)
+        no_author = rng.random(size) < NO_AUTHOR_RATE
+        n_entities = rng.integers(0, 7, size)
+        entity_starts = np.concatenate([[0], np.cumsum(n_entities)])
+        entities = _entities(rng, int(entity_starts[-1]))
+        # Where in the content each planted phrase goes, as a fraction of its length
+        positions = rng.random((size, len(FRAME_PHRASES) + 1))
+        ai_terms = rng.choice(["AI", "artificial intelligence"], size)
+        # Roughly 1 in 10 articles is a near-duplicate of an earlier one
+        duplicate_of = np.where(rng.random(size) < 0.1, rng.integers(0, start + size, size), -1)
+
+        records = []
+        for i in range(size):
+            article_number = start + i
+            content = list(words[i, TITLE_WORDS:])
+            planted = [FRAME_PHRASES[p] for p in np.flatnonzero(phrases[i])]
+            if mentions_ai[i]:
+                planted.append(ai_terms[i])
+            for phrase, position in zip(planted, positions[i]):
+                content.insert(int(position * (len(content) + 1)), phrase)
+            source_name, category, rank = SOURCES[sources[i]]
+            year = int(years[i])
+            language, country = LANGUAGE, COUNTRY
+            if out_of_corpus[i] == 1:
+                language = OTHER_LANGUAGES[i % len(OTHER_LANGUAGES)]
+            elif out_of_corpus[i] == 2:
+                country = OTHER_COUNTRIES[i % len(OTHER_COUNTRIES)]
+            elif out_of_corpus[i] == 3:
+                year = FIRST_YEAR - 1 - i % 3
+            published = datetime(year, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=int(seconds[i]))
+            group = duplicate_of[i] if duplicate_of[i] >= 0 else article_number
+            records.append({
+                "id": f"synthetic-{self.seed}-{article_number}",
+                "duplicateGroupId": f"group-{self.seed}-{group}",
+                "title": " ".join(words[i, :TITLE_WORDS]).capitalize(),
+                "url": f"https://example.com/{self.seed}/{article_number}",
+                "subTitle": None if i % 3 else " ".join(words[i, :3]),
+                "content": " ".join(content).capitalize() + ".",
+                "language": language,
+                "publishedDate": published,
+                "source": {
+                    "name": source_name,
+                    "category": category,
+                    "editorialRank": int(rank),
+                    "location": {"country": country},
+                },
+                "author": {"name": None if no_author[i] else self.authors[authors[i]]},
+                "semantics": {"entities": entities[entity_starts[i]:entity_starts[i + 1]]},
+            })
+        return records
+
+
+ENTITY_TYPES = ("Person", "Organization", "Company", "Location")
+ENTITY_TYPE_RATES = (0.35, 0.3, 0.25, 0.1)
+
+
+def _entities(rng: np.random.Generator, n: int) -> List[dict]:
+    kinds = rng.choice(len(ENTITY_TYPES), n, p=ENTITY_TYPE_RATES)
+    values = rng.integers(0, 1 << 30, n)
+    pools = {"Person": PEOPLE, "Organization": ORGANIZATIONS, "Company": ORGANIZATIONS, "Location": LOCATIONS}
+    entities = []
+    for kind, value in zip(kinds, values):
+        kind = ENTITY_TYPES[kind]
+        pool = pools[kind]
+        entities.append({"properties": [{"name": "type", "value": kind},
+                                        {"name": "value", "value": pool[value % len(pool)]}]})
+    return entities
+
+
+def raw_news_schema():
+    """Arrow schema of the records, for writing Parquet."""
+    import pyarrow as pa
+    properties = pa.list_(pa.struct([("name", pa.string()), ("value", pa.string())]))
+    return pa.schema([
+        ("id", pa.string()),
+        ("duplicateGroupId", pa.string()),
+        ("title", pa.string()),
+        ("url", pa.string()),
+        ("subTitle", pa.string()),
+        ("content", pa.string()),
+        ("language", pa.string()),
+        ("publishedDate", pa.timestamp("us", tz="UTC")),
+        ("source", pa.struct([
+            ("name", pa.string()),
+            ("category", pa.string()),
+            ("editorialRank", pa.int64()),
+            ("location", pa.struct([("country", pa.string())])),
+        ])),
+        ("author", pa.struct([("name", pa.string())])),
+        ("semantics", pa.struct([("entities", pa.list_(pa.struct([("properties", properties)])))])),
+    ])
+
+
+def write_articles(path: Union[str, Path], n: int, seed=0, chunk_size=DEFAULT_CHUNK_SIZE, workers=1) -> Path:
+    """
+    Write synthetic records to a file, one chunk at a time.
+
+    Chunks don't depend on each other, so they can be generated in a process pool; the output is the same either way.
+    :param path: Output file, JSONL or (with a ``.parquet`` suffix) Parquet with a row group per chunk.
+    :param n: Number of records.
+    :param seed: Random seed.
+    :param chunk_size: Records per chunk.
+    :param workers: Number of processes generating chunks.
+    :return: The output path.
+    """
+    path = Path(path)
+    parquet = path.suffix == ".parquet"
+    tasks = [(seed, start, min(chunk_size, n - start), parquet) for start in range(0, n, chunk_size)]
+    pool = Pool(workers) if workers > 1 else None
+    chunks = pool.imap(_serialize_chunk, tasks) if pool is not None else map(_serialize_chunk, tasks)
+    try:
+        if parquet:
+            import pyarrow.parquet as pq
+            with pq.ParquetWriter(str(path), raw_news_schema()) as writer:
+                for table in chunks:
+                    writer.write_table(table)
+        else:
+            with path.open("w") as f:
+                f.writelines(chunks)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return path
+
+
+def _serialize_chunk(task):
+    global _generator
+    seed, start, size, parquet = task
+    if _generator is None or _generator.seed != seed:
+        _generator = ArticleGenerator(seed)
+    records = _generator.chunk(start, size)
+    if parquet:
+        import pyarrow as pa
+        schema = raw_news_schema()
+        # Table.from_pylist needs pyarrow 7
+        return pa.Table.from_pydict({name: [record.get(name) for record in records] for name in schema.names},
+                                    schema=schema)
+    return "".join(json.dumps(record, default=str) + "\n" for record in records)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("output", type=str, help="Output file: .jsonl, or .parquet for Parquet.")
+    parser.add_argument("-n", "--articles", type=int, default=10_000, help="Number of articles.")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="Random seed.")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="Number of processes generating chunks.")
+    args = parser.parse_args()
+    write_articles(args.output, args.articles, args.seed, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+import pyarrow as pa
+import pytest
+from google.cloud import bigquery
+
+# The modules under test are top-level scripts in the repo root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+class FakeJob:
+    """A finished QueryJob with the statistics BigQuery reports."""
+
+    def __init__(self, job_id: str, result: pa.Table = None, referenced_tables=(), total_bytes_processed: int = 0,
+                 total_bytes_billed: int = 0, slot_millis: int = 0):
+        self.job_id = job_id
+        self.referenced_tables = list(referenced_tables)
+        self.total_bytes_processed = total_bytes_processed
+        self.total_bytes_billed = total_bytes_billed
+        self.slot_millis = slot_millis
+        self.cache_hit = False
+        self._result = result
+
+    def result(self, **kw):
+        return SimpleNamespace(to_arrow=lambda bqstorage_client=None: self._result)
+
+
+class FakeClient:
+    """Stands in for ``bigquery.Client``: every query reads ``tables`` and returns ``result``."""
+
+    def __init__(self, result: pa.Table, tables=("proj.news.raw_news",), bytes_processed: int = 1000):
+        self.result = result
+        self.modified = {table: datetime(2021, 6, 1, tzinfo=timezone.utc) for table in tables}
+        self.bytes_processed = bytes_processed
+        self.dry_runs = 0
+        self.runs = []
+
+    def query(self, sql: str, job_config: bigquery.QueryJobConfig = None) -> FakeJob:
+        if job_config is not None and job_config.dry_run:
+            self.dry_runs += 1
+            return FakeJob(f"dry_run_{self.dry_runs}",
+                           referenced_tables=[bigquery.TableReference.from_string(t) for t in self.modified],
+                           total_bytes_processed=self.bytes_processed)
+        self.runs.append(sql)
+        return FakeJob(f"job_{len(self.runs)}", self.result, total_bytes_processed=self.bytes_processed,
+                       total_bytes_billed=self.bytes_processed * 2, slot_millis=10 * len(self.runs))
+
+    def get_table(self, table_id: str):
+        return SimpleNamespace(modified=self.modified[table_id])
+
+
+@pytest.fixture
+def fake_client(monkeypatch, tmp_path) -> FakeClient:
+    """Run bq.py's queries on a :class:`FakeClient`, with a cache and metrics log under ``tmp_path``."""
+    import bq
+    from backends import BigQueryBackend
+    from query_cache import QueryCache
+    from query_metrics import MetricsLog
+
+    client = FakeClient(pa.table({"source": ["a", "b"], "count": [3, 4]}))
+    for name in ("_client", "_bqstorage_client", "_clients_set"):
+        monkeypatch.setattr(bq, name, getattr(bq, name))
+    monkeypatch.setattr(bq, "_backend", BigQueryBackend())
+    monkeypatch.setattr(bq, "_cache", QueryCache(tmp_path / "cache"))
+    monkeypatch.setattr(bq, "_cache_enabled", True)
+    monkeypatch.setattr(bq, "_metrics", MetricsLog(tmp_path / "metrics.jsonl"))
+    monkeypatch.setattr(bq, "_budget_bytes", None)
+    bq.set_client(client)
+    return client
@@ -0,0 +1,45 @@
+import random
+
+import pytest
+
+from authors import (NO_AUTHOR, REPLACEMENTS, compile_rules, count_authors, count_authors_loop, normalize_author,
+                     synthetic_authors)
+
+
+def _sequential(replacements):
+    def apply(text):
+        for old, new in replacements:
+            text = text.replace(old, new)
+        return text
+
+    return apply
+
+
+def test_count_authors_matches_loop():
+    authors, counts = synthetic_authors(20_000, n_distinct=2_000, seed=1)
+    normalize_author.cache_clear()
+    result = count_authors(authors, counts)
+    assert list(zip(result["author"], result["count"])) == count_authors_loop(authors, counts).most_common()
+
+
+def test_normalize_author():
+    assert normalize_author("by jane doe and john roe, cnn") == ("jane doe", "john roe")
+    assert normalize_author("abby and co") == ("abby", "co")
+    assert normalize_author("sam lee (forbes councils member)") == ("sam lee",)
+    assert normalize_author(None) == (NO_AUTHOR,)
+
+
+@pytest.mark.parametrize("text", ["abby and co", "b, cnny jane", "by (jane) doe staff writer, inc", "((x))"])
+def test_compiled_rules_match_sequential_replaces(text):
+    assert compile_rules()(text) == _sequential(REPLACEMENTS)(text)
+
+
+def test_compiled_rules_match_sequential_replaces_on_random_rules():
+    rng = random.Random(0)
+    alphabet = "ab; "
+    for _ in range(2000):
+        replacements = [("".join(rng.choices(alphabet, k=rng.randint(1, 3))),
+                         "".join(rng.choices(alphabet, k=rng.randint(0, 2))))
+                        for _ in range(rng.randint(1, 5))]
+        text = "".join(rng.choices(alphabet, k=rng.randint(0, 12)))
+        assert compile_rules(replacements)(text) == _sequential(replacements)(text), (replacements, text)
@@ -0,0 +1,69 @@
+import re
+
+import pyarrow as pa
+import pytest
+
+from backends import Backend, compare, translate
+from frame_compiler import MEMBERSHIP_SQL
+
+
+class _FixedBackend(Backend):
+    """Answers every query with the same table, standing in for BigQuery."""
+
+    def __init__(self, table: pa.Table):
+        self.table = table
+
+    def read_query(self, sql, use_cache=None, step=None, **config_kw):
+        return self.table
+
+
+@pytest.mark.parametrize("sql, expected", [
+    (r"select r'\bai\b' as p", r"select '\bai\b' as p"),
+    (r"""select "it's", 'it\'s', 'a\nb'""", "select 'it''s', 'it''s', 'a\nb'"),
+    ("select * from `gcp-cset-projects.rhetorical_frames.frame_membership`",
+     'select * from "rhetorical_frames"."frame_membership"'),
+    ("select * from `other-project.news.raw_news`", 'select * from "other-project"."news"."raw_news"'),
+    ("select REGEXP_CONTAINS(content, r'ai') from t", "select regexp_matches(content, 'ai') from t"),
+    ("select cast(x as INT64), cast(y as float64)", "select cast(x as BIGINT), cast(y as DOUBLE)"),
+    ("select HLL_COUNT.MERGE(sketch), hll_count.init(id, 14)",
+     "select hll_count_merge(sketch), hll_count_init(id, 14)"),
+    ("select e.name from t cross join unnest(t.entities) as e where e.type = 'x'",
+     "select e.name from t cross join unnest(t.entities) AS e(e) where e.type = 'x'"),
+    ("select p from t, UNNEST(f(t.a, t.b)) p", "select p from t, UNNEST(f(t.a, t.b)) AS p(p)"),
+    ("select array_concat(a, if(b, ['x'], []), c)", "select flatten([a, if(b, ['x'], []), c])"),
+])
+def test_translate(sql, expected):
+    assert translate(sql) == expected
+
+
+def test_translate_leaves_strings_and_comments():
+    sql = "-- REGEXP_CONTAINS(`a.b`, r'x')\nselect 'REGEXP_CONTAINS(x)', \"INT64\" /* unnest(a) b */"
+    assert translate(sql) == "-- REGEXP_CONTAINS(`a.b`, r'x')\nselect 'REGEXP_CONTAINS(x)', 'INT64' /* unnest(a) b */"
+
+
+def test_translate_frame_sql():
+    sql = MEMBERSHIP_SQL.read_text()
+    translated = translate(sql)
+    code = re.sub(r"'(?:[^']|'')*'|--[^\n]*|/\*.*?\*/", "", translated, flags=re.DOTALL)
+    assert "`" not in code
+    assert not re.search(r"regexp_contains|array_concat", code, re.IGNORECASE)
+    patterns = re.findall(r"\br'([^']*)'", sql)
+    assert patterns
+    for pattern in patterns:
+        # Each keyword pattern keeps its backslashes, as a plain DuckDB string
+        assert "'" + pattern + "'" in translated
+
+
+def test_compare(tmp_path):
+    pytest.importorskip("duckdb")
+    from backends import LocalBackend
+    local = LocalBackend(tmp_path, metrics_log=None)
+    sql = "SELECT x, CAST(x AS FLOAT64) / 3 AS third FROM UNNEST([1, 2, 3]) AS x"
+    same = pa.table({"x": [3, 1, 2], "third": [1.0, 1 / 3, 2 / 3]})
+    assert compare(sql, local, _FixedBackend(same)) == (True, [])
+    matches, differences = compare(sql, local, _FixedBackend(pa.table({"x": [1, 2], "third": [1 / 3, 0.5]})))
+    assert not matches
+    assert differences[0] == "2 rows in BigQuery, 3 locally"
+    assert differences[1].startswith("1 rows only in BigQuery") and differences[2].startswith("2 rows only local")
+    assert compare(sql, local, _FixedBackend(pa.table({"x": [1]}))) == (
+        False, ["columns differ: ['x'] vs ['x', 'third']"])
@@ -0,0 +1,18 @@
+import pytest
+
+from bq import YEAR_FILTER_RE, read_sql, year_sql
+
+
+def test_year_sql_narrows_year_filters():
+    sql = "select * from t where a and /* year: extract(year from publishedDate) */ TRUE and /* year: t.year */ true"
+    assert year_sql(sql, 2019) == ("select * from t where a and (extract(year from publishedDate)) = 2019 "
+                                   "and (t.year) = 2019")
+
+
+def test_year_sql_without_filters():
+    assert year_sql("select year from t", 2019) == "SELECT * FROM (\nselect year from t\n) WHERE year = 2019"
+
+
+@pytest.mark.parametrize("table", ["frame_membership", "article_entities", "entity_mentions", "ai_denominators"])
+def test_incremental_tables_mark_their_inputs(table):
+    assert YEAR_FILTER_RE.search(read_sql(table))
@@ -0,0 +1,51 @@
+import json
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("matplotlib")
+
+from frame_by_year import year_ticks  # noqa: E402
+from render_charts import CHART_MANIFEST, chart_specs, render  # noqa: E402
+
+
+def _summaries(counts=(5, 7, 9), years=(2018, 2019, 2020)):
+    by_year = pd.DataFrame({"year": list(years), "count": list(counts)})
+    return {"competition": {"by_year": by_year}, "killer_robots": {"by_year": by_year.assign(count=1)}}
+
+
+def test_year_ticks():
+    ticks, labels = year_ticks(list(range(2012, 2021)))
+    assert list(ticks) == [2012, 2014, 2016, 2018, 2020]
+    assert labels == [2012, None, 2016, None, 2020]
+    ticks, labels = year_ticks([2019])
+    assert list(ticks) == [2019] and labels == [2019]
+
+
+def test_year_ticks_without_years():
+    ticks, labels = year_ticks([])
+    assert len(ticks) == 0 and labels == []
+
+
+def test_empty_years_still_draw(tmp_path):
+    empty = pd.DataFrame({"year": pd.Series([], dtype=int), "count": pd.Series([], dtype=int)})
+    charts = [chart for chart in chart_specs({"competition": {"by_year": empty}}) if chart.kind == "by_year"]
+    assert charts and all(chart.x == [] for chart in charts)
+    drawn = render(charts, tmp_path, workers=1)
+    assert all(path.exists() for path in drawn) and len(drawn) == len(charts)
+
+
+def test_manifest_skips_unchanged_charts(tmp_path):
+    charts = chart_specs(_summaries())
+    names = {chart.name for chart in charts}
+    assert {path.stem for path in render(charts, tmp_path, workers=2)} == names
+    assert set(json.loads((tmp_path / CHART_MANIFEST).read_text())) == names
+    assert render(chart_specs(_summaries()), tmp_path, workers=2) == []
+    # New data for one frame redraws its charts and the ones it shares, not the other frame's
+    redrawn = render(chart_specs(_summaries(counts=(5, 7, 10))), tmp_path, workers=2)
+    assert {path.stem for path in redrawn} == {"by_year", "competition_by_year", "total_counts"}
+    # A missing chart is redrawn even if the manifest has it
+    (tmp_path / "killer_robots_by_year.png").unlink()
+    assert [path.stem for path in render(chart_specs(_summaries(counts=(5, 7, 10))), tmp_path)] == [
+        "killer_robots_by_year"]
+    assert len(render(charts, tmp_path, workers=2, force=True)) == len(charts)
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from export import export_query, iter_file, sum_by_key, write_batches
+
+
+@pytest.mark.parametrize("export_format", ["csv", "parquet"])
+def test_round_trip(tmp_path, export_format):
+    df = pd.DataFrame({"name": [f"org {i}" for i in range(1_000)], "count": range(1_000)})
+    batches = pa.Table.from_pandas(df, preserve_index=False).to_batches(max_chunksize=90)
+    path = tmp_path / f"summary.{export_format}"
+    assert write_batches(batches, path, export_format, row_group_rows=250) == len(df)
+    if export_format == "parquet":
+        assert pq.ParquetFile(path).num_row_groups == 4
+    chunks = list(iter_file(path, batch_rows=100))
+    assert max(len(chunk) for chunk in chunks) <= 100
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), df)
+
+
+@pytest.mark.parametrize("export_format", ["csv", "parquet"])
+def test_empty_result(tmp_path, monkeypatch, export_format):
+    pytest.importorskip("duckdb")
+    import bq
+    from backends import LocalBackend
+    df = pd.DataFrame({"value": ["google", "openai"], "count": [2, 1]})
+    (tmp_path / "rhetorical_frames").mkdir()
+    df.to_parquet(tmp_path / "rhetorical_frames" / "mentions.parquet")
+    monkeypatch.setattr(bq, "_backend", LocalBackend(tmp_path, metrics_log=None))
+    path = tmp_path / f"empty.{export_format}"
+    sql = "SELECT value, count FROM rhetorical_frames.mentions WHERE FALSE"
+    result = export_query(sql, path)
+    assert result.empty and list(result.columns) == ["value", "count"]
+    # The header alone, as one empty batch
+    chunks = list(iter_file(path))
+    assert len(chunks) == 1
+    assert chunks[0].empty and list(chunks[0].columns) == ["value", "count"]
+
+
+def test_sum_by_key():
+    rng = np.random.default_rng(0)
+    frames = []
+    for _ in range(20):
+        keys = pd.Series([f"org {i}" for i in rng.integers(0, 300, 100)], dtype=object)
+        keys[rng.random(100) < 0.05] = None
+        frames.append(pd.DataFrame({"organization": keys, "count": rng.integers(1, 5, 100)}))
+    batches = list(sum_by_key(iter(frames), "organization", "count", batch_rows=64))
+    assert max(batch.num_rows for batch in batches) <= 64
+    result = pd.concat([batch.to_pandas() for batch in batches], ignore_index=True)
+    expected = pd.concat(frames).groupby("organization", dropna=False, as_index=False)["count"].sum()
+    expected = expected.sort_values(["count", "organization"], ascending=[False, True], na_position="last",
+                                    ignore_index=True)
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_sum_by_key_empty():
+    batches = list(sum_by_key(iter([]), "organization", "count"))
+    assert len(batches) == 1 and batches[0].num_rows == 0
+    assert batches[0].schema.names == ["organization", "count"]
@@ -0,0 +1,101 @@
+import json
+import re
+from datetime import date
+
+import pyarrow.parquet as pq
+import pytest
+
+import frame_matcher
+from frame_matcher import (ENTITY_TABLE, FRAME_TABLE_COLUMNS, in_corpus, load_batch, match_batch, match_file,
+                           published_year, read_batches)
+from frames import AI_GATE, article_text, load_frames
+from synthetic import write_articles
+
+
+def _article(**fields):
+    article = {
+        "id": "1",
+        "duplicateGroupId": "g1",
+        "publishedDate": "2016-05-01T00:00:00",
+        "language": "English",
+        "source": {"name": "Daily", "category": "National", "editorialRank": 1,
+                   "location": {"country": "United States"}},
+        "semantics": {"entities": [{"properties": [{"name": "type", "value": "Organization"}]}]},
+    }
+    article.update(fields)
+    return article
+
+
+def _expected(articles):
+    # The same matching as match_batch, one article at a time in this process
+    frames = {name: frame.compile() for name, frame in load_frames().items()}
+    ai_gate = re.compile(AI_GATE, re.ASCII)
+    expected = {name: [] for name in [*frames, ENTITY_TABLE]}
+    for article in articles:
+        if not in_corpus(article):
+            continue
+        source_name = article["source"]["name"]
+        for name, frame in frames.items():
+            text = article_text(article["title"], article["subTitle"], article["content"], frame.frame.trim_text)
+            if frame.matches(text, source_name):
+                expected[name].append(article["id"])
+        if ai_gate.search(article_text(article["title"], article["subTitle"], article["content"])):
+            expected[ENTITY_TABLE].extend(article["id"] for _ in article["semantics"]["entities"])
+    return expected
+
+
+def test_in_corpus():
+    assert in_corpus(_article())
+    assert not in_corpus(_article(publishedDate="2011-12-31T23:59:59"))
+    assert in_corpus(_article(publishedDate="2020-12-31T23:59:59"))
+    assert not in_corpus(_article(publishedDate=None))
+    assert not in_corpus(_article(language="French"))
+    assert not in_corpus(_article(semantics={"entities": []}))
+    assert not in_corpus(_article(source={"name": "Daily", "category": "Blog", "editorialRank": 1,
+                                          "location": {"country": "United States"}}))
+    assert not in_corpus(_article(source=None))
+
+
+def test_published_year():
+    assert published_year("2016-05-01T00:00:00") == 2016
+    assert published_year(date(2019, 1, 2)) == 2019
+    assert published_year(None) is None
+
+
+def test_read_batches_jsonl(tmp_path):
+    path = tmp_path / "raw_news.jsonl"
+    path.write_text("".join(json.dumps({"id": str(i)}) + "\n" + ("\n" if i % 3 == 0 else "") for i in range(7)))
+    batches = list(read_batches(path, batch_size=3))
+    assert [len(lines) for kind, lines in batches] == [3, 3, 1]
+    assert [article["id"] for batch in batches for article in load_batch(batch)] == [str(i) for i in range(7)]
+
+
+@pytest.mark.parametrize("suffix", ["jsonl", "parquet"])
+def test_match_file_matches_in_process(tmp_path, suffix):
+    extract = write_articles(tmp_path / f"raw_news.{suffix}", 2_000, seed=2, chunk_size=500)
+    articles = [article for batch in read_batches(extract) for article in load_batch(batch)]
+    expected = _expected(articles)
+    counts = match_file(extract, tmp_path / "out", workers=2, batch_size=300, output_format="parquet")
+    assert counts == {name: len(ids) for name, ids in expected.items()}
+    for name, ids in expected.items():
+        table = pq.read_table(tmp_path / "out" / f"{name}.parquet")
+        # Results come back in input order
+        assert table.column("id").to_pylist() == ids, name
+        if name != ENTITY_TABLE:
+            assert table.schema.names == FRAME_TABLE_COLUMNS
+        # The sample should exercise every table
+        assert ids, name
+
+
+def test_match_batch_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(frame_matcher, "_frames", None)
+    monkeypatch.setattr(frame_matcher, "_ai_gate", None)
+    frame_matcher._init_worker(["competition"])
+    text = "The artificial intelligence arms race with China heats up. " * 3
+    article = _article(title="AI arms race", subTitle=None, content=text, url="u", author={"name": "jane doe"})
+    n, hits = match_batch(("jsonl", [json.dumps(article).encode()]))
+    assert n == 1
+    assert hits["competition"] == [{"id": "1", "duplicateGroupId": "g1", "title": "AI arms race", "url": "u",
+                                    "year": 2016, "source_name": "Daily", "author": "jane doe"}]
+    assert hits[ENTITY_TABLE] == [{"id": "1", "duplicateGroupId": "g1",
+                                   "semantic_info": [{"name": "type", "value": "Organization"}]}]
@@ -0,0 +1,73 @@
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from frame_overlap import FrameSets
+
+
+def test_null_duplicate_groups_are_left_out():
+    articles = pd.DataFrame({"duplicateGroupId": ["a", "b", None, "c"], "year": [2019, 2019, 2019, 2020],
+                             "f1": [True, False, True, False], "f2": [False, True, False, True]})
+    sets = FrameSets.from_articles(articles, ["f1", "f2"])
+    assert sets.count(["f1"]) == 1
+    assert sets.count(["f2"]) == 2
+    assert sets.count(["f1", "f2"]) == 0
+    assert sets.count(["f1", "f2"], year=2019) == 0
+    assert list(sets.members(["f2"])) == ["b", "c"]
+
+
+@pytest.fixture
+def random_articles():
+    rng = np.random.default_rng(0)
+    n = 2_000
+    articles = pd.DataFrame({
+        "duplicateGroupId": pd.Series(rng.integers(0, 700, n).astype(str), dtype=object),
+        "year": pd.array(rng.integers(2012, 2021, n), dtype="Int64"),
+    })
+    articles.loc[rng.random(n) < 0.02, "duplicateGroupId"] = None
+    articles.loc[rng.random(n) < 0.02, "year"] = pd.NA
+    for frame, rate in (("f1", 0.3), ("f2", 0.2), ("f3", 0.1)):
+        articles[frame] = rng.random(n) < rate
+    return articles
+
+
+def _groups(articles, frames, year=None):
+    # Set arithmetic over the duplicate groups of each frame, as COUNT(DISTINCT duplicateGroupId) would count them
+    articles = articles[articles["duplicateGroupId"].notna()]
+    if year is not None:
+        articles = articles[articles["year"] == year]
+    return set.intersection(*(set(articles.loc[articles[frame], "duplicateGroupId"]) for frame in frames))
+
+
+def test_counts_match_set_arithmetic(random_articles):
+    frames = ["f1", "f2", "f3"]
+    sets = FrameSets.from_articles(random_articles, frames)
+    for order in (1, 2, 3):
+        for combination in combinations(frames, order):
+            expected = _groups(random_articles, combination)
+            assert sets.count(combination) == len(expected)
+            assert set(sets.members(combination)) == expected
+            for year in (2012, 2016, 2020, 2030):
+                assert sets.count(combination, year) == len(_groups(random_articles, combination, year))
+
+
+def test_summaries(random_articles):
+    frames = ["f1", "f2", "f3"]
+    sets = FrameSets.from_articles(random_articles, frames)
+    pairwise = sets.pairwise()
+    jaccard = sets.jaccard()
+    for a in frames:
+        for b in frames:
+            both = len(_groups(random_articles, [a, b]))
+            either = len(_groups(random_articles, [a]) | _groups(random_articles, [b]))
+            assert pairwise.loc[a, b] == both
+            assert jaccard.loc[a, b] == pytest.approx(both / either)
+    overlaps = sets.overlaps()
+    assert overlaps["order"].tolist() == [2, 2, 2, 3]
+    by_year = sets.by_year(max_order=None)
+    for row in by_year.itertuples():
+        assert row.count == len(_groups(random_articles, row.frames.split(" & "), row.year))
+    with pytest.raises(ValueError):
+        sets.count(["f4"])
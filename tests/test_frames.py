@@ -0,0 +1,106 @@
+import re
+import subprocess
+import sys
+
+import pytest
+
+from frame_compiler import MEMBERSHIP_SQL, prefilter_literals, required_literals
+from frame_matcher import in_corpus, load_batch, read_batches
+from frames import AI_GATE, article_text, load_frames, near_pattern
+from settings import PROJECT_DIR
+from synthetic import write_articles
+
+
+def test_membership_sql_is_up_to_date():
+    result = subprocess.run([sys.executable, "frame_compiler.py", "--check"], cwd=PROJECT_DIR, capture_output=True,
+                            text=True)
+    assert result.returncode == 0, result.stderr
+
+
+@pytest.mark.parametrize("pattern, literals", [
+    ("arms race", {"arms race"}),
+    ("sputnik|space race", {"sputnik", "space race"}),
+    (r"\bai\b.{0,20}arms race", {"arms race"}),
+    # The longest factor every match contains
+    ("(?:ai|artificial intelligence) dominance", {" dominance"}),
+    ("(?:military|economic) (?:ai|artificial intelligence)", {"military", "economic"}),
+    ("colou?r", {"colo"}),
+    # A repeated character ends the run it was in
+    ("ab{2,}c", {"abb"}),
+    ("[abc]def", {"def"}),
+    (r"u\.s\. military", {"u.s. military"}),
+    ("^the end$", {"the end"}),
+])
+def test_required_literals(pattern, literals):
+    assert required_literals(pattern) == literals
+
+
+@pytest.mark.parametrize("pattern", [
+    # A branch or pattern with no literal at all
+    "ai|.*",
+    "a?",
+    r"\w+",
+    # Syntax that isn't analyzed
+    "(?i)ai",
+    "(?P<name>ai)",
+    "ai)",
+    "[ai",
+    "*ai",
+])
+def test_required_literals_none(pattern):
+    assert required_literals(pattern) is None
+
+
+def test_prefilter_literals():
+    assert prefilter_literals(["arms race", "race to the bottom"]) == ["arms race", "race to the bottom"]
+    # "race" is in every match of both, so the longer literals are redundant
+    assert prefilter_literals(["race", "arms race"]) == ["race"]
+    # Too short to be worth checking first
+    assert prefilter_literals(["arms race", r"\bai\b"]) is None
+
+
+def test_near_pattern():
+    assert near_pattern(["ai", "arms race"], 20) == ["ai.{0,20}arms race"]
+    assert near_pattern(["ai|artificial intelligence", "race"], 10) == ["(?:ai|artificial intelligence).{0,10}race"]
+    assert near_pattern(["a", "b"], 5, ordered=False) == ["a.{0,5}b", "b.{0,5}a"]
+    assert near_pattern(["a", "b", "c"], 5) == ["a.{0,5}b.{0,5}c"]
+    with pytest.raises(ValueError):
+        near_pattern(["a", "b", "c"], 5, ordered=False)
+
+
+def test_near_pattern_distance():
+    pattern, reverse = near_pattern([r"\bai\b", "arms race"], 10, ordered=False)
+    assert re.search(pattern, "ai in an arms race")
+    assert not re.search(pattern, "ai is not part of any arms race")
+    assert not re.search(pattern, "arms race in ai")
+    assert re.search(reverse, "arms race in ai")
+
+
+def test_membership_sql_matches_compiled_frames(tmp_path):
+    pytest.importorskip("duckdb")
+    from backends import LocalBackend
+    raw_news = tmp_path / "gcp_cset_lexisnexis" / "raw_news.parquet"
+    raw_news.parent.mkdir()
+    write_articles(raw_news, 3_000, seed=1, chunk_size=1_000)
+    membership = LocalBackend(tmp_path, metrics_log=None).read_query(MEMBERSHIP_SQL.read_text()).to_pandas()
+
+    frames = {name: frame.compile() for name, frame in load_frames().items()}
+    ai_gate = re.compile(AI_GATE, re.ASCII)
+    expected = {name: set() for name in ["ai", *frames]}
+    for batch in read_batches(raw_news):
+        for article in load_batch(batch):
+            if not in_corpus(article):
+                continue
+            source_name = article["source"]["name"]
+            if ai_gate.search(article_text(article["title"], article["subTitle"], article["content"])):
+                expected["ai"].add(article["id"])
+            for name, frame in frames.items():
+                text = article_text(article["title"], article["subTitle"], article["content"], frame.frame.trim_text)
+                if frame.matches(text, source_name):
+                    expected[name].add(article["id"])
+
+    assert set(membership["id"]) == expected["ai"]
+    for name in frames:
+        assert set(membership.loc[membership[name], "id"]) == expected[name], name
+        # The sample should exercise every frame
+        assert expected[name], name
@@ -0,0 +1,89 @@
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from frames import AI_GATE, article_text, load_frames
+from keyword_index import write_index
+from synthetic import ArticleGenerator
+
+TEXTS = [
+    "the ai arms race is on",
+    "an a.i. arms-race, in all but name",
+    "a sputnik moment for artificial intelligence",
+    "killer robots and a lethal robot",
+    "ai domination of the racecar market",
+    "the u.s. military is buying ai",
+    "ai" + " filler" * 10 + " arms race",
+    "",
+]
+
+
+def _brute_force(texts, patterns):
+    regex = re.compile("|".join(f"(?:{p})" for p in patterns), re.ASCII)
+    return np.flatnonzero([regex.search(text) is not None for text in texts])
+
+
+@pytest.fixture(scope="module")
+def small_index(tmp_path_factory):
+    articles = pd.DataFrame({"id": [str(i) for i in range(len(TEXTS))], "duplicateGroupId": "g", "source_name": "s",
+                             "text": TEXTS})
+    return write_index(articles, tmp_path_factory.mktemp("small"), "v1")
+
+
+@pytest.fixture(scope="module")
+def synthetic_index(tmp_path_factory):
+    # The AI articles of a synthetic sample, with their text as frame_membership has it
+    gate = re.compile(AI_GATE, re.ASCII)
+    rows = []
+    for article in ArticleGenerator(seed=2).chunk(0, 3_000):
+        text = article_text(article["title"], article["subTitle"], article["content"], trim=True)
+        if gate.search(text):
+            rows.append({"id": article["id"], "duplicateGroupId": article["duplicateGroupId"],
+                         "source_name": article["source"]["name"], "text": text})
+    articles = pd.DataFrame(rows)
+    return articles, write_index(articles, tmp_path_factory.mktemp("synthetic"), "v1")
+
+
+@pytest.mark.parametrize("pattern", [
+    r"\bai\b",
+    "arms race",
+    r"\bai\b.{0,20}arms race",
+    r"arms.race",
+    "u.s. military",
+    r"u\.s\. military",
+    r"(?:killer|lethal) robots?\b",
+    "sputnik|arms race",
+    r"\bdomina",
+    r"race\b",
+    "acecar",
+    "robot.*robot",
+    ".*",
+    "nothing like this",
+])
+def test_search_matches_brute_force(small_index, pattern):
+    assert np.array_equal(small_index.search(pattern), _brute_force(TEXTS, [pattern]))
+
+
+def test_candidates_are_a_superset(small_index):
+    for pattern in [r"\bai\b.{0,20}arms race", "sputnik|arms race", r"(?:killer|lethal) robots?\b"]:
+        assert set(_brute_force(TEXTS, [pattern])) <= set(small_index.candidates(pattern))
+
+
+def test_frame_keywords_match_brute_force(synthetic_index):
+    articles, index = synthetic_index
+    texts = articles["text"].tolist()
+    for frame in load_frames().values():
+        for keyword, patterns in frame.keywords.items():
+            assert np.array_equal(index.search(patterns), _brute_force(texts, patterns)), (frame.name, keyword)
+
+
+def test_frame_members_match_compiled_frames(synthetic_index):
+    articles, index = synthetic_index
+    for frame in load_frames().values():
+        compiled = frame.compile()
+        expected = np.flatnonzero([compiled.matches(text, source_name)
+                                   for text, source_name in zip(articles["text"], articles["source_name"])])
+        assert len(expected), frame.name
+        assert np.array_equal(index.frame_members(frame), expected), frame.name
@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import org_aliases
+from org_aliases import ALIAS_SQL, load_index, write_index
+
+ORGANIZATIONS = pa.table({
+    "name": ["Alphabet Inc.", "Google LLC", "OpenAI"],
+    "aliases": [[{"alias": "google"}, {"alias": "alphabet"}], [{"alias": "google"}], [{"alias": "openai"}]],
+})
+GRID_ALIASES = pa.table({"grid_id": ["grid.1", "grid.2", "grid.3"], "alias": ["google", "mit", "openai"]})
+API_GRID = pa.table({"id": ["grid.1", "grid.2", "grid.3"],
+                     "name": ["Google (United States)", "Massachusetts Institute of Technology", "OpenAI (GRID)"]})
+
+
+@pytest.fixture
+def aliases(tmp_path) -> pd.DataFrame:
+    pytest.importorskip("duckdb")
+    from backends import LocalBackend
+    for table_id, table in [("high_resolution_entities.organizations", ORGANIZATIONS),
+                            ("gcp_cset_grid.grid_aliases", GRID_ALIASES), ("gcp_cset_grid.api_grid", API_GRID)]:
+        dataset, name = table_id.split(".")
+        (tmp_path / "data" / dataset).mkdir(parents=True, exist_ok=True)
+        pq.write_table(table, tmp_path / "data" / dataset / f"{name}.parquet")
+    return LocalBackend(tmp_path / "data", metrics_log=None).read_query(ALIAS_SQL).to_pandas()
+
+
+def test_resolve_precedence(aliases, tmp_path):
+    index = write_index(aliases, tmp_path / "index", "v1")
+    mentions = ["google", "alphabet", "mit", "openai", "anthropic", None, "google"]
+    assert index.resolve(mentions).tolist() == [
+        # A high resolution entity alias wins over GRID, and of several names the first in sort order
+        "Alphabet Inc.",
+        "Alphabet Inc.",
+        # GRID when no high resolution entity has the alias
+        "Massachusetts Institute of Technology",
+        "OpenAI",
+        # Mentions without an alias keep their own text
+        "anthropic",
+        None,
+        "Alphabet Inc.",
+    ]
+    assert len(index) == 4
+
+
+def test_resolve_hash_collisions(aliases, tmp_path, monkeypatch):
+    # Every alias has the same hash, so only comparing the alias bytes tells them apart
+    monkeypatch.setattr(org_aliases, "hash_aliases", lambda strings: np.zeros(len(list(strings)), dtype=np.uint64))
+    index = write_index(aliases, tmp_path / "index", "v1")
+    assert index.resolve(["mit", "openai", "googl", "google"]).tolist() == [
+        "Massachusetts Institute of Technology", "OpenAI", "googl", "Alphabet Inc."]
+
+
+def test_load_index_versions(tmp_path):
+    assert load_index(tmp_path) is None
+    write_index(pd.DataFrame({"alias": ["a"], "name": ["A"]}), tmp_path, "v1")
+    write_index(pd.DataFrame({"alias": ["a", None], "name": ["B", "C"]}), tmp_path, "v2")
+    assert load_index(tmp_path).version == "v2"
+    assert load_index(tmp_path).resolve(["a"]).tolist() == ["B"]
+    assert load_index(tmp_path, "v1").resolve(["a"]).tolist() == ["A"]
+    assert load_index(tmp_path, "v3") is None
+
+
+def test_empty_index(tmp_path):
+    index = write_index(pd.DataFrame({"alias": [], "name": []}, dtype=object), tmp_path, "v1")
+    assert len(index) == 0
+    assert index.resolve(["google", None]).tolist() == ["google", None]
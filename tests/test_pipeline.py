@@ -0,0 +1,145 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+import bq
+import pipeline
+from pipeline import Node, Pipeline
+from settings import DATASET_ID
+
+
+class _Steps:
+    """Nodes whose outputs are set by the test, counting how often each runs."""
+
+    def __init__(self):
+        self.outputs = {}
+        self.runs = []
+
+    def node(self, name, inputs=(), fail=False, **kw) -> Node:
+        def run():
+            self.runs.append(name)
+            if fail:
+                raise RuntimeError(f"{name} broke")
+            self.outputs.setdefault(name, "v1")
+
+        return Node(name, run=run, output=lambda: self.outputs.get(name), inputs=inputs, **kw)
+
+
+def _pipeline(steps, state_path, fail=()):
+    dag = Pipeline(state_path)
+    dag.add(steps.node("raw", fail="raw" in fail))
+    dag.add(steps.node("table", ("raw",), always_run=True))
+    dag.add(steps.node("summary", ("table",)))
+    dag.add(steps.node("other_summary", ("table",), fail="other_summary" in fail))
+    dag.add(steps.node("chart", ("summary", "other_summary")))
+    return dag
+
+
+def _statuses(report):
+    return dict(zip(report["node"], report["status"]))
+
+
+def test_rerun_skips_unchanged_nodes(tmp_path):
+    steps = _Steps()
+    state = tmp_path / "state.json"
+    report = _pipeline(steps, state).run(workers=2)
+    assert set(report["status"]) == {"ran"}
+    assert steps.runs.index("raw") < steps.runs.index("table") < steps.runs.index("chart")
+
+    steps.runs.clear()
+    report = _pipeline(steps, state).run(workers=2)
+    # Tables always run, and keep their fingerprint when nothing changed
+    assert _statuses(report) == {"raw": "skipped", "table": "ran", "summary": "skipped", "other_summary": "skipped",
+                                 "chart": "skipped"}
+    assert steps.runs == ["table"]
+
+    # A new input fingerprint reruns the nodes that read it; the chart's inputs came out the same, so it's skipped
+    steps.outputs["table"] = "v2"
+    steps.runs.clear()
+    _pipeline(steps, state).run(workers=2)
+    assert sorted(steps.runs) == ["other_summary", "summary", "table"]
+
+    # A changed output reruns its node, and the nodes after it
+    steps.outputs["summary"] = "v2"
+    steps.runs.clear()
+    _pipeline(steps, state).run(workers=2)
+    assert sorted(steps.runs) == ["chart", "summary", "table"]
+
+    # A missing output reruns its node
+    steps.outputs.pop("other_summary")
+    steps.runs.clear()
+    _pipeline(steps, state).run(workers=2)
+    assert sorted(steps.runs) == ["other_summary", "table"]
+
+    steps.runs.clear()
+    _pipeline(steps, state).run(workers=2, force=True)
+    assert sorted(steps.runs) == ["chart", "other_summary", "raw", "summary", "table"]
+
+
+def test_changed_version_reruns(tmp_path):
+    steps = _Steps()
+    state = tmp_path / "state.json"
+    _pipeline(steps, state).run()
+    dag = _pipeline(steps, state)
+    dag.nodes["summary"].version = "new code"
+    steps.runs.clear()
+    dag.run()
+    assert sorted(steps.runs) == ["summary", "table"]
+
+
+def test_failure_blocks_dependents(tmp_path):
+    steps = _Steps()
+    state = tmp_path / "state.json"
+    report = _pipeline(steps, state, fail=("other_summary",)).run(workers=2)
+    assert _statuses(report) == {"raw": "ran", "table": "ran", "summary": "ran", "other_summary": "failed",
+                                 "chart": "blocked"}
+    assert report.set_index("node").loc["other_summary", "error"] == "RuntimeError: other_summary broke"
+    # The failed and blocked nodes run next time; the rest are skipped
+    steps.runs.clear()
+    report = _pipeline(steps, state).run(workers=2)
+    assert sorted(steps.runs) == ["chart", "other_summary", "table"]
+    assert _statuses(report)["summary"] == "skipped"
+
+
+def test_add_checks_inputs():
+    dag = Pipeline(None)
+    with pytest.raises(ValueError):
+        dag.add(Node("summary", run=lambda: None, output=lambda: None, inputs=("table",)))
+    dag.add(Node("table", run=lambda: None, output=lambda: None))
+    with pytest.raises(ValueError):
+        dag.add(Node("table", run=lambda: None, output=lambda: None))
+
+
+def test_critical_path():
+    steps = _Steps()
+    dag = _pipeline(steps, None)
+    report = pd.DataFrame({"node": ["raw", "table", "summary", "other_summary", "chart"],
+                           "seconds": [1.0, 2.0, 5.0, 3.0, 0.5]})
+    assert dag.critical_path(report) == (8.5, ["raw", "table", "summary", "chart"])
+    report["seconds"] = [1.0, 2.0, 1.0, 3.0, 0.5]
+    assert dag.critical_path(report) == (6.5, ["raw", "table", "other_summary", "chart"])
+    assert Pipeline(None).critical_path(report) == (0.0, [])
+
+
+def test_local_table_fingerprint(tmp_path, monkeypatch):
+    pytest.importorskip("duckdb")
+    from backends import LocalBackend
+    versions = []
+
+    def fingerprint(ids, values):
+        # Each version in a directory of its own, so no reader can mistake one for another
+        root = tmp_path / str(len(versions))
+        (root / DATASET_ID).mkdir(parents=True)
+        table = pa.table({"id": ids, "semantic_info": [[{"name": "type", "value": value}] for value in values]})
+        pq.write_table(table, root / DATASET_ID / "article_entities.parquet")
+        monkeypatch.setattr(bq, "_backend", LocalBackend(root, metrics_log=None))
+        versions.append(pipeline._table_fingerprint("article_entities"))
+        return versions[-1]
+
+    first = fingerprint(["a", "b", "c"], ["x", "y", "z"])
+    # The same rows, rewritten in another order
+    assert fingerprint(["c", "a", "b"], ["z", "x", "y"]) == first
+    assert fingerprint(["a", "b", "c"], ["x", "y", "q"]) != first
+    assert fingerprint(["a", "b", "c", "c"], ["x", "y", "z", "z"]) != first
+    assert pipeline._table_fingerprint("missing") is None
@@ -0,0 +1,80 @@
+import os
+from datetime import datetime, timezone
+
+import pyarrow as pa
+
+import bq
+from query_cache import QueryCache
+
+SQL = "SELECT source, COUNT(*) AS count FROM news.raw_news GROUP BY source"
+
+
+def test_miss_then_hit(fake_client):
+    first = bq.read_query(SQL)
+    second = bq.read_query(SQL)
+    assert fake_client.runs == [SQL]
+    assert second.equals(first)
+    log = bq._metrics.read()
+    assert log["local_cache_hit"].fillna(False).tolist() == [False, True]
+
+
+def test_reindented_query_hits(fake_client):
+    bq.read_query(SQL)
+    bq.read_query("SELECT source,  COUNT(*) AS count\n  FROM news.raw_news\n  GROUP BY source\n")
+    assert len(fake_client.runs) == 1
+
+
+def test_different_config_misses(fake_client):
+    bq.read_query(SQL)
+    bq.read_query(SQL, maximum_bytes_billed=10 ** 9)
+    assert len(fake_client.runs) == 2
+
+
+def test_table_change_invalidates(fake_client):
+    bq.read_query(SQL)
+    fake_client.modified["proj.news.raw_news"] = datetime(2021, 6, 2, tzinfo=timezone.utc)
+    bq.read_query(SQL)
+    bq.read_query(SQL)
+    assert len(fake_client.runs) == 2
+
+
+def test_no_cache_bypasses(fake_client):
+    bq.read_query(SQL)
+    # What --no-cache does
+    bq.set_cache_enabled(False)
+    bq.read_query(SQL)
+    bq.read_query(SQL)
+    assert len(fake_client.runs) == 3
+    # No dry runs to compute keys while the cache is off
+    assert fake_client.dry_runs == 1
+
+
+def test_use_cache_false_bypasses_and_keeps_entry(fake_client):
+    bq.read_query(SQL)
+    bq.read_query(SQL, use_cache=False)
+    bq.read_query(SQL)
+    assert len(fake_client.runs) == 2
+
+
+def test_streamed_read_hits(fake_client):
+    expected = bq.read_query(SQL)
+    batches = list(bq.read_query_batches(SQL, batch_rows=1))
+    assert len(fake_client.runs) == 1
+    assert [batch.num_rows for batch in batches] == [1, 1]
+    assert pa.Table.from_batches(batches).equals(expected)
+
+
+def test_lru_eviction(tmp_path):
+    cache = QueryCache(tmp_path, max_bytes=10 ** 9)
+    table = pa.table({"x": list(range(100))})
+    for age, key in enumerate(["a", "b", "c"]):
+        cache.put(key, table)
+        # Oldest first, without depending on the clock's resolution
+        os.utime(tmp_path / f"{key}.parquet", (1000 + age, 1000 + age))
+    cache.max_bytes = cache.size()
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("a") is not None
+    cache.put("d", table)
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in ["a", "c", "d"])
+    assert cache.size() <= cache.max_bytes
@@ -0,0 +1,110 @@
+import json
+
+import pandas as pd
+import pytest
+from google.cloud import bigquery
+
+import bq
+from conftest import FakeJob
+from query_metrics import BudgetExceeded, MetricsLog, compare, summarize
+
+SQL = "SELECT source, COUNT(*) AS count FROM news.raw_news GROUP BY source"
+
+
+def test_record_appends_job_statistics(tmp_path):
+    log = MetricsLog(tmp_path / "metrics.jsonl")
+    job = FakeJob("job_1", total_bytes_processed=100, total_bytes_billed=10485760, slot_millis=42)
+    log.record("frame_membership", "write", 1.23456, job, estimated_bytes=90)
+    log.record("by_source", "read", 0.5, local_cache_hit=True)
+    lines = [json.loads(line) for line in (tmp_path / "metrics.jsonl").read_text().splitlines()]
+    assert len(lines) == 2
+    assert {k: lines[0][k] for k in ["step", "kind", "wall_seconds", "job_id", "total_bytes_processed",
+                                     "total_bytes_billed", "slot_millis", "cache_hit", "estimated_bytes"]} == {
+        "step": "frame_membership", "kind": "write", "wall_seconds": 1.235, "job_id": "job_1",
+        "total_bytes_processed": 100, "total_bytes_billed": 10485760, "slot_millis": 42, "cache_hit": False,
+        "estimated_bytes": 90,
+    }
+    # Without a job, its statistics are recorded as missing
+    assert lines[1]["job_id"] is None and lines[1]["total_bytes_processed"] is None
+    assert lines[1]["local_cache_hit"] is True
+
+
+def test_no_path_records_nothing(tmp_path):
+    log = MetricsLog(None)
+    assert log.record("by_source", "read", 0.5)["step"] == "by_source"
+    assert log.read().empty
+
+
+def test_queries_are_recorded(fake_client):
+    bq.read_query(SQL, step="by_source")
+    bq.read_query(SQL, step="by_source")
+    log = bq._metrics.read()
+    assert log["step"].tolist() == ["by_source", "by_source"]
+    assert log["job_id"].isna().tolist() == [False, True]
+    assert log.loc[0, "total_bytes_billed"] == 2 * fake_client.bytes_processed
+    assert log["local_cache_hit"].fillna(False).tolist() == [False, True]
+
+
+def test_check_budget_refuses(fake_client, monkeypatch):
+    monkeypatch.setattr(bq, "_budget_bytes", fake_client.bytes_processed - 1)
+    config = bigquery.QueryJobConfig(use_legacy_sql=False)
+    with pytest.raises(BudgetExceeded) as e:
+        bq._check_budget(fake_client, SQL, config, "by_source")
+    assert (e.value.estimated_bytes, e.value.budget_bytes) == (fake_client.bytes_processed,
+                                                               fake_client.bytes_processed - 1)
+    assert fake_client.dry_runs == 1 and fake_client.runs == []
+    refused = bq._metrics.read().iloc[-1]
+    assert (refused["step"], refused["kind"], refused["estimated_bytes"]) == ("by_source", "refused", 1000)
+
+
+def test_check_budget_allows(fake_client, monkeypatch):
+    config = bigquery.QueryJobConfig(use_legacy_sql=False)
+    assert bq._check_budget(fake_client, SQL, config, "by_source") is None
+    assert fake_client.dry_runs == 0
+    monkeypatch.setattr(bq, "_budget_bytes", fake_client.bytes_processed)
+    assert bq._check_budget(fake_client, SQL, config, "by_source") == fake_client.bytes_processed
+
+
+def test_read_over_budget_doesnt_run(fake_client, monkeypatch):
+    monkeypatch.setattr(bq, "_budget_bytes", 1)
+    with pytest.raises(BudgetExceeded):
+        bq.read_query(SQL, use_cache=False)
+    assert fake_client.runs == []
+
+
+def _log(*records):
+    columns = ["time", "step", "kind", "total_bytes_processed", "total_bytes_billed", "slot_millis", "wall_seconds",
+               "cache_hit", "local_cache_hit"]
+    return pd.DataFrame(records, columns=columns)
+
+
+def test_compare_orders_by_saving():
+    log = _log(
+        ("2021-06-01T10:00", "by_source", "read", 100, 100, 1, 1.0, False, None),
+        ("2021-06-02T10:00", "by_source", "read", 50, 50, 1, 1.0, False, None),
+        ("2021-06-01T10:00", "by_year", "read", 100, 100, 1, 1.0, False, None),
+        ("2021-06-01T11:00", "by_year", "read", 300, 300, 1, 1.0, False, None),
+        ("2021-06-02T10:00", "by_year", "read", 20, 20, 1, 1.0, False, None),
+        ("2021-06-02T10:00", "by_year", "read", 0, 0, 1, 1.0, True, None),
+        ("2021-06-02T11:00", "by_year", "read", None, None, None, 0.1, None, True),
+        ("2021-06-01T10:00", "only_before", "read", 10, 10, 1, 1.0, False, None),
+        ("2021-06-02T10:00", "frame_membership", "write", 10, 10, 1, 1.0, False, None),
+        ("2021-06-02T10:00", "a_only_after", "read", 10, 10, 1, 1.0, False, None),
+    )
+    df = compare(log, "2021-06-02")
+    assert df["step"].tolist() == ["by_year", "by_source", "a_only_after", "only_before"]
+    assert df.loc[0, ["runs_before", "bytes_before", "runs_after", "bytes_after"]].tolist() == [2, 200, 1, 20]
+    assert df["saving"].tolist()[:2] == [0.9, 0.5]
+    assert df["saving"].isna().tolist()[2:] == [True, True]
+
+
+def test_summarize_orders_by_bytes_billed():
+    log = _log(
+        ("2021-06-01T10:00", "by_source", "read", 100, 100, 1, 1.0, False, None),
+        ("2021-06-02T10:00", "by_source", "read", 100, 100, 1, 2.0, False, None),
+        ("2021-06-01T10:00", "frame_membership", "write", 500, 500, 5, 9.0, False, None),
+    )
+    df = summarize(log)
+    assert df["step"].tolist() == ["frame_membership", "by_source"]
+    assert df.loc[1, ["runs", "total_bytes_billed", "wall_seconds"]].tolist() == [2, 200, 3.0]
+    assert summarize(log, since="2021-06-02")["runs"].tolist() == [1]
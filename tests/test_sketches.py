@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import bq
+import sketches
+from frames import load_frames
+from settings import DATASET_ID
+
+
+@pytest.fixture
+def membership(tmp_path, monkeypatch) -> pd.DataFrame:
+    # frame_membership with several rows per duplicateGroupId and some NULL sources, on the local backend
+    pytest.importorskip("duckdb")
+    from backends import LocalBackend
+    rng = np.random.default_rng(0)
+    n = 3_000
+    df = pd.DataFrame({
+        "id": [f"a{i}" for i in range(n)],
+        "duplicateGroupId": [f"g{i}" for i in rng.integers(0, 1_200, n)],
+        "year": rng.integers(2012, 2021, n),
+        "source_name": pd.Series(rng.choice(["Daily", "Weekly", "Trade", None], n), dtype=object),
+    })
+    for frame in load_frames():
+        df[frame] = rng.random(n) < 0.3
+    (tmp_path / DATASET_ID).mkdir()
+    df.to_parquet(tmp_path / DATASET_ID / "frame_membership.parquet", index=False)
+    monkeypatch.setattr(bq, "_backend", LocalBackend(tmp_path, metrics_log=None))
+    return df
+
+
+def _exact(df, by):
+    if not by:
+        return pd.DataFrame({"count": [df["duplicateGroupId"].nunique()]})
+    counts = df.groupby(list(by), dropna=False)["duplicateGroupId"].nunique()
+    return counts.rename("count").reset_index()
+
+
+def _rows(df):
+    return df.astype(object).where(df.notna(), None).values.tolist()
+
+
+@pytest.mark.parametrize("by", [("year",), ("source_name",), ("year", "source_name"), ()])
+def test_counts_merge_to_exact_locally(membership, by):
+    assert sketches.make_sketch_table() == list(range(2012, 2021))
+    for frame in ["competition", sketches.AI_FRAME]:
+        frame_articles = membership if frame == sketches.AI_FRAME else membership[membership[frame]]
+        result = sketches.approximate_counts(frame, by)
+        expected = _exact(frame_articles, by)
+        sort = list(by) or ["count"]
+        assert _rows(result.sort_values(sort, na_position="first", ignore_index=True)) == _rows(
+            expected.sort_values(sort, na_position="first", ignore_index=True)), frame
+
+
+def test_percent_ai(membership):
+    sketches.make_sketch_table()
+    result = sketches.approximate_percent_ai("killer_robots", ["source_name"])
+    frame_counts = _exact(membership[membership["killer_robots"]], ["source_name"])
+    ai_counts = _exact(membership, ["source_name"]).rename(columns={"count": "ai_count"})
+    expected = frame_counts.merge(ai_counts, on="source_name")
+    result = result.sort_values("source_name", na_position="first", ignore_index=True)
+    expected = expected.sort_values("source_name", na_position="first", ignore_index=True)
+    # NULL sources are joined to their own AI count
+    assert result["source_name"].isna().sum() == 1
+    assert result["count"].tolist() == expected["count"].tolist()
+    assert result["ai_count"].tolist() == expected["ai_count"].tolist()
+    assert np.allclose(result["percent"], expected["count"] / expected["ai_count"])
+
+
+def test_relative_error():
+    assert sketches.relative_error(14) == pytest.approx(0.0081, abs=1e-4)
+    assert sketches.relative_error(16) == pytest.approx(sketches.relative_error(14) / 2)
+
+
+def test_unknown_dimension():
+    with pytest.raises(ValueError):
+        sketches.approximate_counts("competition", ["author"])
+
+
+def test_sketch_sql_marks_its_year_filter():
+    assert bq.year_sql(sketches.sketch_table_sql(["competition"]), 2019) != sketches.sketch_table_sql(["competition"])
+    assert "(membership.year) = 2019" in bq.year_sql(sketches.sketch_table_sql(["competition"]), 2019)
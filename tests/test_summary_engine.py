@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from summary_engine import FrameExtract, distinct_counts
+
+
+def _expected(keys, ids, name):
+    df = pd.DataFrame({name: keys, "id": ids}).groupby(name, dropna=False)["id"].nunique()
+    return df.rename("count").reset_index()
+
+
+def _rows(df):
+    # NULL keys come back as NaN
+    return df.astype(object).where(df.notna(), None).values.tolist()
+
+
+def _sorted(df, name):
+    df = df.assign(**{name: df[name].astype(object)})
+    return df.sort_values(name, na_position="first", ignore_index=True).astype({"count": np.int64})
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_distinct_counts_matches_nunique(seed):
+    rng = np.random.default_rng(seed)
+    n = 2_000
+    keys = pd.Series(rng.choice(["a", "b", "c", "d", None], n), dtype=object)
+    ids = pd.Series(rng.choice([f"g{i}" for i in range(300)] + [None] * 30, n), dtype=object)
+    result = distinct_counts(keys.astype("category"), ids.astype("category"), "key")
+    assert list(result.columns) == ["key", "count"]
+    pd.testing.assert_frame_equal(_sorted(result, "key"), _sorted(_expected(keys, ids, "key"), "key"))
+
+
+def test_distinct_counts_nulls():
+    keys = pd.Series(["a", "a", None, None, "b", "c"], dtype="category")
+    ids = pd.Series(["g1", "g1", "g1", "g2", None, None], dtype="category")
+    result = distinct_counts(keys, ids, "key")
+    # NULL keys are a group; NULL ids aren't counted, so a group of only NULL ids counts 0
+    assert _rows(_sorted(result, "key")) == [[None, 2], ["a", 1], ["b", 0], ["c", 0]]
+
+
+def test_distinct_counts_unused_categories_and_empty():
+    keys = pd.Series(["a", "a"], dtype=pd.CategoricalDtype(["a", "b"]))
+    ids = pd.Series(["g1", "g2"], dtype=pd.CategoricalDtype(["g1", "g2", "g3"]))
+    assert distinct_counts(keys, ids, "key").values.tolist() == [["a", 2]]
+    empty = pd.Series([], dtype="category")
+    result = distinct_counts(empty, empty, "key")
+    assert result.empty and list(result.columns) == ["key", "count"]
+
+
+def test_frame_extract_summaries():
+    articles = pd.DataFrame({
+        "duplicateGroupId": ["g1", "g1", "g2", "g3", "g4"],
+        "year": [2019, 2019, 2019, 2020, 2020],
+        "source_name": ["Daily", "Weekly", "Daily", "Daily", None],
+        "author": ["By Jane Doe and John Roe", "jane doe", None, "JOHN ROE", "john roe"],
+    })
+    mentions = pd.DataFrame({"duplicateGroupId": ["g1"], "entity_type": ["Person"], "value": ["Jane Doe"]})
+    ai_counts = pd.DataFrame({"year": [2019, 2020], "ai_count": [10, 4]})
+    extract = FrameExtract(articles, mentions, ai_counts)
+    assert extract.by_year().values.tolist() == [[2019, 2, 0.5], [2020, 2, 0.5]]
+    assert extract.percent_ai_by_year()["percent"].tolist() == [0.2, 0.5]
+    assert _rows(extract.by_source()) == [["Daily", 3], ["Weekly", 1], [None, 1]]
+    assert extract.by_person_mention().values.tolist() == [["Jane Doe", 1]]
+    assert extract.by_clean_author().values.tolist() == [["john roe", 3], ["jane doe", 2],
+                                                         ["No author information", 1]]